@@ -1,36 +1,52 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_community.utilities import SQLDatabase
-from sqlalchemy import create_engine, inspect
+from sqlalchemy import inspect
+from sqlalchemy.pool import StaticPool, SingletonThreadPool
+from concurrent.futures import ThreadPoolExecutor
+from app.database import get_engine
+from app import schema_cache
+from app.schema_index import build_schema_index, pruning_settings
+from app.llm_cache import get_llm_cache, fingerprint
+from app.result_cache import get_result_cache, is_read_only
+from app.sql_results import run_query, dumps, get_result_handles
+from app.context_builder import build_history_context
+from app.llm_clients import get_llm, sql_chat_model
 import os
 import json
-import ast
+import time
 
-def get_schema_info(db):
+def get_schema_info(db, db_uri: str = None, user_query: str = None, history=[]):
     """
-    Retrieves schema information (tables and columns) from the database.
+    Retrieves schema information (tables, columns and sample rows) from the database.
+    Cached per database URI; executor_stage invalidates it after DDL.
+    On databases with more than SCHEMA_TOP_K tables, only the tables relevant
+    to user_query (and their foreign-key neighbours) are included.
     """
-    schema_info = ""
-    table_names = db.get_usable_table_names()
-    for table in table_names:
-        schema_info += f"Table: {table}\n"
-        # We can get more detailed info if needed, but table names + create statements 
-        # or sample rows are usually enough. SQLDatabase.get_table_info() does this well.
-    
-    return db.get_table_info()
+    if db_uri is None:
+        return db.get_table_info()
+
+    settings = pruning_settings()
+    if settings["enabled"] and user_query:
+        index = schema_cache.get_or_load(db_uri, "schema_index", lambda: build_schema_index(get_engine(db_uri)))
+        if len(index.tables) > settings["top_k"]:
+            # Recent user turns keep follow-ups ("now sort them") on the same tables
+            recent = [msg["content"] for msg in history[-4:] if msg["role"] == "user"]
+            tables = index.select_tables(" ".join([user_query] + recent), settings["top_k"], settings["token_budget"])
+            return schema_cache.get_or_load(
+                db_uri,
+                "table_info:" + ",".join(sorted(tables)),
+                lambda: db.get_table_info(table_names=tables)
+            )
+
+    return schema_cache.get_or_load(db_uri, "table_info", db.get_table_info)
 
-def planner_stage(llm, user_query, schema_info, history=[]):
+def planner_stage(llm, user_query, schema_info, history=[], use_cache=True):
     """
     Part 1: Planner
     Takes natural language input and schema info.
     Outputs a plan (list of SQL queries) to achieve the user's goal.
     """
     
-    history_context = ""
-    if history:
-        history_context = "Previous conversation history:\n"
-        for msg in history:
-            role = "User" if msg['role'] == 'user' else "Assistant"
-            history_context += f"{role}: {msg['content']}\n"
+    # Compacted: recent turns verbatim, older ones summarized
+    history_context = build_history_context(history)
     
     prompt = f"""
     You are a SQL Expert Planner.
@@ -60,8 +76,10 @@ def planner_stage(llm, user_query, schema_info, history=[]):
     }}
     """
     
-    response = llm.invoke(prompt)
-    content = response.content.strip()
+    # Repeated questions on an unchanged schema reuse the cached plan
+    cache = get_llm_cache()
+    cache_key = cache.make_key(llm, user_query, fingerprint(schema_info), history)
+    content = cache.invoke(llm, prompt, cache_key, bypass=not use_cache).strip()
     
     # Clean up markdown code blocks if present
     if content.startswith("```json"):
@@ -75,69 +93,184 @@ def planner_stage(llm, user_query, schema_info, history=[]):
         plan = json.loads(content)
         return plan
     except json.JSONDecodeError:
+        # Don't serve an unparseable plan again
+        cache.discard(cache_key)
         # Fallback: try to extract just the queries if JSON parsing fails
         return {
             "plan_description": "Error parsing plan, attempting raw execution",
             "queries": []
         }
 
-def executor_stage(db, plan):
+def _result_handle(db_uri, query, result):
+    # Only read-only statements are safe to re-run for later pages
+    if db_uri is None or not result["truncated"]:
+        return None
+    return get_result_handles().register(db_uri, query)
+
+def _is_unsafe(query):
+    lower_query = query.lower()
+    if "chat_sessions" in lower_query or "chat_messages" in lower_query:
+        return "drop" in lower_query or "truncate" in lower_query or "alter" in lower_query
+    return False
+
+def _plan_batches(queries, db_uri):
     """
-    Part 2: Executor
-    Executes the SQL queries from the plan.
-    Returns a log of execution results.
+    Groups consecutive read-only statements, which cannot affect each other;
+    every other statement is a batch of its own.
+    """
+    batch = []
+    for query in queries:
+        if db_uri is not None and is_read_only(query) and not _is_unsafe(query):
+            batch.append(query)
+            continue
+        if batch:
+            yield batch
+            batch = []
+        yield [query]
+    if batch:
+        yield batch
+
+def _timed_run(engine, query):
+    start = time.perf_counter()
+    try:
+        result, error = run_query(engine, query), None
+    except Exception as e:
+        result, error = None, e
+    return result, error, round((time.perf_counter() - start) * 1000, 1)
+
+def iter_executor_stage(db, plan, db_uri: str = None, use_cache: bool = True):
+    """
+    Part 2: Executor (incremental)
+    Executes the SQL queries from the plan, yielding each log entry (in plan
+    order, with "elapsed_ms") as soon as its query finishes. Consecutive
+    read-only statements run concurrently on separate pooled connections
+    (up to EXECUTOR_PARALLELISM); other statements run one at a time and
+    stop the plan on error. Successful entries carry a typed result set
+    (see sql_results.run_query) holding the first page of rows; read-only
+    results with more rows also get a "result_id" for /api/results paging.
+    Read-only results may be served from the result cache ("cached": True);
+    any other statement invalidates it.
     """
-    execution_log = []
-    
     queries = plan.get("queries", [])
     if not queries:
-        return [{"status": "error", "message": "No queries generated by planner."}]
+        yield {"status": "error", "message": "No queries generated by planner."}
+        return
 
-    for query in queries:
-        # Safety check
-        lower_query = query.lower()
-        if "chat_sessions" in lower_query or "chat_messages" in lower_query:
-            if "drop" in lower_query or "truncate" in lower_query or "alter" in lower_query:
-                execution_log.append({
+    result_cache = get_result_cache()
+    engine = get_engine(db_uri) if db_uri else db._engine
+    parallelism = int(os.getenv("EXECUTOR_PARALLELISM", "4"))
+    if isinstance(engine.pool, (StaticPool, SingletonThreadPool)):
+        # In-memory SQLite: every thread would share one connection
+        parallelism = 1
+
+    for batch in _plan_batches(queries, db_uri):
+        ready = {}  # batch position -> finished entry (skipped or cached)
+        for position, query in enumerate(batch):
+            # Safety check
+            if _is_unsafe(query):
+                ready[position] = {
                     "query": query,
                     "status": "skipped",
-                    "result": "Safety violation: Cannot modify system tables."
-                })
-                continue
+                    "result": "Safety violation: Cannot modify system tables.",
+                    "cached": False,
+                    "elapsed_ms": 0.0
+                }
+            elif use_cache and db_uri is not None and is_read_only(query):
+                start = time.perf_counter()
+                cached = result_cache.get(db_uri, query)
+                if cached is not None:
+                    ready[position] = {
+                        "query": query,
+                        "status": "success",
+                        "result": cached,
+                        "cached": True,
+                        "result_id": _result_handle(db_uri, query, cached),
+                        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)
+                    }
+
+        misses = [position for position in range(len(batch)) if position not in ready]
+        pool = None
+        futures = {}
+        if len(misses) > 1 and parallelism > 1:
+            pool = ThreadPoolExecutor(max_workers=min(parallelism, len(misses)))
+            futures = {position: pool.submit(_timed_run, engine, batch[position]) for position in misses}
 
         try:
-            # db.run returns a string representation of the result
-            result = db.run(query)
-            execution_log.append({
-                "query": query,
-                "status": "success",
-                "result": result
-            })
-        except Exception as e:
-            execution_log.append({
-                "query": query,
-                "status": "error",
-                "result": str(e)
-            })
-            # Stop execution on error? Or continue? 
-            # Usually better to stop if it's a sequence.
-            break
-            
-    return execution_log
+            for position, query in enumerate(batch):
+                if position in ready:
+                    yield ready[position]
+                    continue
 
-def responder_stage(llm, user_query, execution_log):
+                read_only = db_uri is not None and is_read_only(query)
+                if position in futures:
+                    result, error, elapsed_ms = futures[position].result()
+                else:
+                    result, error, elapsed_ms = _timed_run(engine, query)
+
+                if error is not None:
+                    # A failed write may still have had effects
+                    if db_uri and not read_only:
+                        result_cache.invalidate(db_uri)
+                    yield {
+                        "query": query,
+                        "status": "error",
+                        "result": str(error),
+                        "cached": False,
+                        "elapsed_ms": elapsed_ms
+                    }
+                    # Stop on the first error, in plan order
+                    return
+
+                if read_only:
+                    result_cache.put(db_uri, query, result)
+                elif db_uri:
+                    # Data may have changed: drop cached results for this database
+                    result_cache.invalidate(db_uri)
+                    # Schema changed: drop cached reflection for this database
+                    if schema_cache.is_ddl(query):
+                        schema_cache.invalidate(db_uri)
+                yield {
+                    "query": query,
+                    "status": "success",
+                    "result": result,
+                    "cached": False,
+                    "result_id": _result_handle(db_uri, query, result) if read_only else None,
+                    "elapsed_ms": elapsed_ms
+                }
+        finally:
+            if pool is not None:
+                # Reads still running after an error just finish in the background
+                pool.shutdown(wait=False, cancel_futures=True)
+
+def executor_stage(db, plan, db_uri: str = None, use_cache: bool = True):
     """
-    Part 3: Responder
-    Synthesizes the execution results into a natural language response.
+    Part 2: Executor
+    Executes the SQL queries from the plan.
+    Returns a log of execution results.
     """
-    
+    return list(iter_executor_stage(db, plan, db_uri, use_cache))
+
+def _prompt_log(execution_log):
+    # The responder only needs a sample of large results, not every fetched row
+    max_rows = int(os.getenv("RESPONDER_MAX_ROWS", "50"))
+    log = []
+    for entry in execution_log:
+        result = entry.get("result")
+        if isinstance(result, dict) and (result["row_count"] > max_rows or result["truncated"]):
+            rows = result["rows"][:max_rows]
+            total = f"more than {result['row_count']}" if result["truncated"] else str(result["row_count"])
+            entry = {**entry, "result": {**result, "rows": rows, "note": f"{len(rows)} of {total} rows shown"}}
+        log.append({key: value for key, value in entry.items() if key not in ("result_id", "elapsed_ms")})
+    return log
+
+def _responder_prompt(user_query, execution_log):
     prompt = f"""
     You are a helpful Data Assistant.
     
     User Question: {user_query}
     
     Execution Log (SQL queries run and their results):
-    {json.dumps(execution_log, indent=2)}
+    {dumps(_prompt_log(execution_log), indent=True)}
     
     Based on the execution log, provide a helpful, natural language answer to the user.
     - If data was retrieved, summarize it or present it clearly.
@@ -155,23 +288,67 @@ def responder_stage(llm, user_query, execution_log):
     Incorrect Format:
     | ID | Name | |---|---| | 1 | Alice | | 2 | Bob |
     """
-    
+    return prompt
+
+def responder_stage(llm, user_query, execution_log):
+    """
+    Part 3: Responder
+    Synthesizes the execution results into a natural language response.
+    """
+    prompt = _responder_prompt(user_query, execution_log)
     response = llm.invoke(prompt)
     print(f"DEBUG: Raw Responder Output:\n{repr(response.content)}")
     return response.content
 
-def get_agent_response(message: str, db_uri: str, google_api_key: str, history: list = []) -> dict:
-    # Initialize LLM
-    llm = ChatGoogleGenerativeAI(
-        model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
-        google_api_key=google_api_key,
-        temperature=0
-    )
+def stream_responder_stage(llm, user_query, execution_log):
+    """
+    Part 3: Responder (streaming)
+    Yields the answer text chunk by chunk as the LLM produces it.
+    """
+    prompt = _responder_prompt(user_query, execution_log)
+    for chunk in llm.stream(prompt):
+        if chunk.content:
+            yield chunk.content
+
+def _format_output(execution_log, final_answer):
+    """
+    Format output for frontend.
+    We take the LAST successful query/result to show in the UI "SQL" and "Results" blocks.
+    Results are the first page of typed rows (RESULT_MAX_ROWS) with their column
+    names; result_id pages through the rest via /api/results.
+    """
+    last_query = ""
+    last_result = {"columns": [], "rows": [], "row_count": 0, "truncated": False}
+    last_result_id = None
+    cached = False
+    
+    for entry in execution_log:
+        if entry["status"] == "success":
+            last_query = entry["query"]
+            cached = entry.get("cached", False)
+            last_result = entry["result"]
+            last_result_id = entry.get("result_id")
+
+    return {
+        "sql_query": last_query,
+        "results": last_result["rows"],
+        "columns": last_result["columns"],
+        "truncated": last_result["truncated"],
+        "result_id": last_result_id,
+        "answer": final_answer,
+        "cached": cached
+    }
+
+def get_agent_response(message: str, db_uri: str, google_api_key: str, history: list = [], use_cache: bool = True, model: str = None) -> dict:
+    # Shared client for this key and model (SQL_CHAT_MODEL unless given)
+    llm = get_llm(google_api_key, model or sql_chat_model())
 
     # Initialize Database
+    from langchain_community.utilities import SQLDatabase
     try:
-        engine = create_engine(db_uri)
-        db = SQLDatabase(engine)
+        engine = get_engine(db_uri)
+        # Tables are reflected lazily; get_table_info() goes through the schema cache
+        db = SQLDatabase(engine, lazy_table_reflection=True)
     except Exception as e:
         return {
             "sql_query": "",
@@ -181,8 +358,8 @@ def get_agent_response(message: str, db_uri: str, google_api_key: str, history:
 
     # --- STAGE 1: PLANNER ---
     try:
-        schema_info = get_schema_info(db)
-        plan = planner_stage(llm, message, schema_info, history)
+        schema_info = get_schema_info(db, db_uri, message, history)
+        plan = planner_stage(llm, message, schema_info, history, use_cache)
     except Exception as e:
         return {
             "sql_query": "",
@@ -192,7 +369,7 @@ def get_agent_response(message: str, db_uri: str, google_api_key: str, history:
 
     # --- STAGE 2: EXECUTOR ---
     try:
-        execution_log = executor_stage(db, plan)
+        execution_log = executor_stage(db, plan, db_uri, use_cache)
     except Exception as e:
         return {
             "sql_query": str(plan.get("queries", [])),
@@ -206,25 +383,53 @@ def get_agent_response(message: str, db_uri: str, google_api_key: str, history:
     except Exception as e:
         final_answer = f"Responder stage failed: {str(e)}"
 
-    # Format output for frontend
-    # We'll take the LAST successful query/result to show in the UI "SQL" and "Results" blocks
-    last_query = ""
-    last_result = []
-    
-    for entry in execution_log:
-        if entry["status"] == "success":
-            last_query = entry["query"]
-            # Try to parse string result back to list/dict if possible for UI table
-            raw_result = entry["result"]
-            try:
-                # SQLDatabase.run returns stringified list of tuples usually
-                # e.g. "[(1, 'A'), (2, 'B')]"
-                last_result = ast.literal_eval(raw_result)
-            except:
-                last_result = raw_result # Keep as string if parsing fails
+    return _format_output(execution_log, final_answer)
 
-    return {
-        "sql_query": last_query,
-        "results": last_result,
-        "answer": final_answer
-    }
+def stream_agent_response(message: str, db_uri: str, google_api_key: str, history: list = [], llm=None, use_cache: bool = True, model: str = None):
+    """
+    Streaming variant of get_agent_response. Yields (event, data) pairs:
+    "plan" once the planner finishes, "query" per executed statement,
+    "token" per responder chunk, then "done" with the same payload
+    get_agent_response returns. Failures yield "error" and stop.
+    """
+    if llm is None:
+        llm = get_llm(google_api_key, model or sql_chat_model())
+
+    from langchain_community.utilities import SQLDatabase
+    try:
+        engine = get_engine(db_uri)
+        db = SQLDatabase(engine, lazy_table_reflection=True)
+    except Exception as e:
+        yield "error", {"message": f"Database connection failed: {str(e)}"}
+        return
+
+    # --- STAGE 1: PLANNER ---
+    try:
+        schema_info = get_schema_info(db, db_uri, message, history)
+        plan = planner_stage(llm, message, schema_info, history, use_cache)
+    except Exception as e:
+        yield "error", {"message": f"Planning stage failed: {str(e)}"}
+        return
+    yield "plan", plan
+
+    # --- STAGE 2: EXECUTOR ---
+    execution_log = []
+    try:
+        for entry in iter_executor_stage(db, plan, db_uri, use_cache):
+            execution_log.append(entry)
+            yield "query", entry
+    except Exception as e:
+        yield "error", {"message": f"Execution stage failed: {str(e)}"}
+        return
+
+    # --- STAGE 3: RESPONDER ---
+    chunks = []
+    try:
+        for text in stream_responder_stage(llm, message, execution_log):
+            chunks.append(text)
+            yield "token", {"text": text}
+        final_answer = "".join(chunks)
+    except Exception as e:
+        final_answer = "".join(chunks) + f"Responder stage failed: {str(e)}"
+
+    yield "done", _format_output(execution_log, final_answer)
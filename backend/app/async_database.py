@@ -0,0 +1,353 @@
+from sqlalchemy import text, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.dialects.postgresql.base import PGDialect
+from app.database import (
+    _pool_options, insert_messages_statement, session_retention,
+    RETENTION_SQL, RECENT_MESSAGES_SQL, ALL_MESSAGES_SQL
+)
+from app.pagination import encode_cursor, decode_cursor
+from app.history_cache import get_history_cache, select_history, covers
+from app import schema_cache
+import re
+import ssl
+import threading
+
+# Async counterparts of the helpers in app/database.py, used by the FastAPI
+# handlers so a slow query no longer blocks the event loop.
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+# Sync driver -> asyncio driver
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+# libpq connection parameters that asyncpg.connect() does not accept; the
+# ones with an asyncpg equivalent are converted by _asyncpg_connect_args
+LIBPQ_PARAMS = {
+    "sslmode", "sslrootcert", "sslcert", "sslkey", "sslpassword", "sslcrl",
+    "sslcompression", "sslsni", "ssl_min_protocol_version", "ssl_max_protocol_version",
+    "connect_timeout", "application_name", "fallback_application_name", "options",
+    "client_encoding", "gssencmode", "requirepeer", "krbsrvname", "channel_binding",
+    "keepalives", "keepalives_idle", "keepalives_interval", "keepalives_count",
+    "tcp_user_timeout", "target_session_attrs", "service", "passfile",
+}
+
+def _asyncpg_ssl(params):
+    mode = params.get("sslmode")
+    if not any(params.get(key) for key in ("sslrootcert", "sslcert", "sslkey")):
+        # asyncpg takes the libpq sslmode names as they are
+        return mode
+    if mode == "disable":
+        return False
+    context = ssl.create_default_context(cafile=params.get("sslrootcert"))
+    # As in libpq, a root certificate makes require behave like verify-ca
+    context.check_hostname = mode == "verify-full"
+    if not params.get("sslrootcert") and mode not in ("verify-ca", "verify-full"):
+        context.verify_mode = ssl.CERT_NONE
+    if params.get("sslcert"):
+        context.load_cert_chain(params["sslcert"], params.get("sslkey"), params.get("sslpassword"))
+    return context
+
+def _asyncpg_connect_args(params):
+    connect_args = {}
+    ssl_arg = _asyncpg_ssl(params)
+    if ssl_arg is not None:
+        connect_args["ssl"] = ssl_arg
+    if params.get("connect_timeout"):
+        connect_args["timeout"] = float(params["connect_timeout"])
+    server_settings = {}
+    application_name = params.get("application_name") or params.get("fallback_application_name")
+    if application_name:
+        server_settings["application_name"] = application_name
+    # options="-c search_path=app -c statement_timeout=5000"
+    for setting in re.findall(r"-c\s*(\S+?=\S+)", params.get("options", "")):
+        name, value = setting.split("=", 1)
+        server_settings[name] = value
+    if server_settings:
+        connect_args["server_settings"] = server_settings
+    return connect_args
+
+def to_async_url(db_uri: str):
+    """
+    Rewrites a sync database URI (e.g. postgresql://, postgresql+psycopg2://)
+    to use the matching asyncio driver. Returns (url, connect_args): libpq
+    query parameters such as sslmode are moved into asyncpg's connect
+    arguments, or dropped when asyncpg has no equivalent.
+    """
+    url = make_url(db_uri)
+    backend = url.get_backend_name()
+    if backend in ASYNC_DRIVERS and url.drivername != ASYNC_DRIVERS[backend]:
+        url = url.set(drivername=ASYNC_DRIVERS[backend])
+    if backend != "postgresql":
+        return url, {}
+    params = {key: value if isinstance(value, str) else value[-1] for key, value in url.query.items()}
+    url = url.difference_update_query([key for key in params if key in LIBPQ_PARAMS])
+    return url, _asyncpg_connect_args(params)
+
+def get_async_engine(db_uri: str):
+    """
+    Returns the shared AsyncEngine for db_uri, creating it on first use.
+    """
+    engine = _engines.get(db_uri)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(db_uri)
+        if engine is None:
+            url, connect_args = to_async_url(db_uri)
+            engine = create_async_engine(url, connect_args=connect_args, **_pool_options(db_uri))
+            _engines[db_uri] = engine
+        return engine
+
+async def dispose_async_engines():
+    """
+    Closes every pooled async connection and empties the registry.
+    """
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for engine in engines:
+        await engine.dispose()
+
+async def create_session(db_uri: str, title: str = "New Chat", session_type: str = "sql", filename: str = None):
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        # Create new session
+        result = await conn.execute(text(
+            "INSERT INTO chat_sessions (title, session_type, filename) VALUES (:title, :type, :filename) RETURNING id"
+        ), {"title": title, "type": session_type, "filename": filename})
+        session_id = result.scalar()
+
+        # Keep only the newest sessions of this type
+        keep = session_retention()
+        if keep:
+            result = await conn.execute(text(RETENTION_SQL), {"type": session_type, "keep": keep})
+            get_history_cache().invalidate(db_uri, [row[0] for row in result])
+        await conn.commit()
+        return session_id
+
+async def get_sessions(db_uri: str, session_type: str = None):
+    where, params = ("WHERE session_type = :type", {"type": session_type}) if session_type else ("", {})
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        result = await conn.execute(text(
+            f"SELECT id, title, session_type, filename, created_at FROM chat_sessions {where} "
+            "ORDER BY created_at DESC, id DESC"
+        ), params)
+        return [dict(row._mapping) for row in result]
+
+async def get_sessions_page(db_uri: str, limit: int, cursor: str = None, session_type: str = None):
+    """
+    One page of sessions, newest first, and the cursor for the next page
+    (None on the last page).
+    """
+    clauses, params = [], {"limit": limit + 1}
+    if session_type:
+        clauses.append("session_type = :type")
+        params["type"] = session_type
+    if cursor:
+        params["cursor_at"], params["cursor_id"] = decode_cursor(cursor)
+        clauses.append("(created_at, id) < (:cursor_at, :cursor_id)")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        result = await conn.execute(text(
+            f"SELECT id, title, session_type, filename, created_at FROM chat_sessions {where} "
+            "ORDER BY created_at DESC, id DESC LIMIT :limit"
+        ), params)
+        rows = [dict(row._mapping) for row in result]
+
+    next_cursor = encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+async def get_messages_page(db_uri: str, session_id: int, limit: int, cursor: str = None):
+    """
+    The newest page of a session's messages (oldest first within the page),
+    and the cursor for the page of older messages before it.
+    """
+    params = {"session_id": session_id, "limit": limit + 1}
+    keyset = ""
+    if cursor:
+        params["cursor_at"], params["cursor_id"] = decode_cursor(cursor)
+        keyset = "AND (created_at, id) < (:cursor_at, :cursor_id)"
+
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        result = await conn.execute(text(
+            f"SELECT id, role, content, created_at FROM chat_messages WHERE session_id = :session_id {keyset} "
+            "ORDER BY created_at DESC, id DESC LIMIT :limit"
+        ), params)
+        rows = [dict(row._mapping) for row in result]
+
+    next_cursor = encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
+    messages = [{"role": row["role"], "content": row["content"]} for row in reversed(rows[:limit])]
+    return messages, next_cursor
+
+async def insert_messages(db_uri: str, rows):
+    """
+    Saves rows of (session_id, role, content) in one multi-row INSERT,
+    without touching the history cache (see message_writer).
+    """
+    if not rows:
+        return
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        await conn.execute(*insert_messages_statement(rows))
+        await conn.commit()
+
+async def add_messages(db_uri: str, rows):
+    """
+    See database.add_messages.
+    """
+    await insert_messages(db_uri, rows)
+    cache = get_history_cache()
+    for session_id, role, content in rows:
+        cache.append(db_uri, session_id, [{"role": role, "content": content}])
+
+async def add_message(db_uri: str, session_id: int, role: str, content: str):
+    await add_messages(db_uri, [(session_id, role, content)])
+
+async def get_chat_history(db_uri: str, session_id: int, limit: int = None, token_budget: int = None):
+    """
+    See database.get_chat_history.
+    """
+    cache = get_history_cache()
+    history = cache.get(db_uri, session_id, limit, token_budget)
+    if history is not None:
+        return history
+    version = cache.version(db_uri, session_id)
+
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        window = cache.max_messages
+        result = await conn.execute(text(RECENT_MESSAGES_SQL), {"session_id": session_id, "limit": window + 1})
+        rows = [dict(row._mapping) for row in result]
+        recent = rows[:window][::-1]
+        cache.put(db_uri, session_id, recent, complete=len(rows) <= window, version=version)
+
+        history = select_history(recent, limit, token_budget)
+        if covers(recent, len(rows) <= window, history, limit):
+            return history
+        result = await conn.execute(text(ALL_MESSAGES_SQL), {"session_id": session_id})
+        return select_history([dict(row._mapping) for row in result], limit, token_budget)
+
+async def get_all_messages(db_uri: str, session_id: int):
+    """
+    Every message of a session, oldest first, read from the database
+    (the history cache is for building prompts, not for listings).
+    """
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        result = await conn.execute(text(ALL_MESSAGES_SQL), {"session_id": session_id})
+        return [dict(row._mapping) for row in result]
+
+async def delete_all_sessions(db_uri: str):
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        # Cascading delete will handle messages
+        await conn.execute(text("TRUNCATE TABLE chat_sessions CASCADE"))
+        await conn.commit()
+    get_history_cache().invalidate(db_uri)
+
+async def get_workspace_references(db_uri: str):
+    """
+    Upload filenames of all sessions, and the contents of messages that
+    link plots (see app/storage.py).
+    """
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        result = await conn.execute(text("SELECT DISTINCT filename FROM chat_sessions WHERE filename IS NOT NULL"))
+        filenames = [row[0] for row in result]
+        result = await conn.execute(text(
+            "SELECT content FROM chat_messages WHERE role = 'assistant' AND content LIKE '%/static/plots/%'"
+        ))
+        contents = [row[0] for row in result]
+    return filenames, contents
+
+def _reflect_schema(sync_conn):
+    inspector = inspect(sync_conn)
+    tables = []
+    for table_name in inspector.get_table_names():
+        columns = []
+        for column in inspector.get_columns(table_name):
+            columns.append({
+                "name": column["name"],
+                "type": str(column["type"])
+            })
+        tables.append({
+            "name": table_name,
+            "columns": columns
+        })
+    return {"tables": tables}
+
+# pg_catalog names (information_schema udt_name) -> information_schema
+# data_type names, which are what the dialect's ischema_names is keyed by
+PG_UDT_NAMES = {
+    "int2": "smallint", "int4": "integer", "int8": "bigint",
+    "float4": "real", "float8": "double precision", "bool": "boolean",
+    "varchar": "character varying", "bpchar": "character",
+    "timestamptz": "timestamp with time zone", "timetz": "time with time zone",
+}
+
+def _pg_type_name(name):
+    type_class = PGDialect.ischema_names.get(PG_UDT_NAMES.get(name, name))
+    return str(type_class()) if type_class is not None else name.upper()
+
+def _format_column_type(data_type, udt_name, max_length, precision, scale):
+    # Spelled the way the inspector spells them on other dialects:
+    # VARCHAR(50), TIMESTAMP, NUMERIC(10, 2), INTEGER[]
+    if data_type == "ARRAY":
+        return _pg_type_name(udt_name.lstrip("_")) + "[]"
+    if data_type == "USER-DEFINED":
+        # Enums, domains and extension types such as citext
+        return _pg_type_name(udt_name)
+    column_type = _pg_type_name(data_type)
+    if max_length and data_type in ("character varying", "character"):
+        column_type += f"({max_length})"
+    elif data_type == "numeric" and precision is not None:
+        column_type += f"({precision}, {scale or 0})"
+    return column_type
+
+async def _load_schema(conn):
+    if conn.dialect.name != "postgresql":
+        return await conn.run_sync(_reflect_schema)
+
+    # One round trip for every column of every base table, instead of
+    # one inspector.get_columns() call per table
+    result = await conn.execute(text("""
+        SELECT c.table_name, c.column_name, c.data_type, c.udt_name,
+               c.character_maximum_length, c.numeric_precision, c.numeric_scale
+        FROM information_schema.columns c
+        JOIN information_schema.tables t
+          ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+        WHERE c.table_schema = current_schema() AND t.table_type = 'BASE TABLE'
+        ORDER BY c.table_name, c.ordinal_position
+    """))
+    tables = {}
+    for table_name, column_name, data_type, udt_name, max_length, precision, scale in result:
+        tables.setdefault(table_name, []).append({
+            "name": column_name,
+            "type": _format_column_type(data_type, udt_name, max_length, precision, scale)
+        })
+    return {"tables": [{"name": name, "columns": columns} for name, columns in tables.items()]}
+
+async def get_schema(db_uri: str):
+    """
+    Returns tables and columns, served from the schema cache when fresh.
+    Postgres is read from information_schema in a single query; other
+    dialects fall back to the (sync-only) inspector through run_sync.
+    """
+    schema = schema_cache.get_cached(db_uri, "schema")
+    if schema is not None:
+        return schema
+
+    engine = get_async_engine(db_uri)
+    async with engine.connect() as conn:
+        schema = await _load_schema(conn)
+    return schema_cache.set_cached(db_uri, "schema", schema)
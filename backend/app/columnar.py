@@ -0,0 +1,98 @@
+import os
+import pandas as pd
+
+# Columnar Uploads
+# Each CSV upload is also written to Parquet at ingest time, with column
+# types inferred once and low-cardinality text columns dictionary-encoded
+# (loaded as pandas categoricals). EDA turns then load the Parquet file,
+# memory-mapped, instead of re-parsing CSV text.
+#
+# pyarrow is optional: without it uploads stay CSV-only.
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+# String columns whose first block has at most this share of distinct
+# values are stored dictionary-encoded
+CATEGORICAL_RATIO = 0.5
+
+def columnar_path(csv_path: str):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+def _dictionary_columns(batch):
+    columns = []
+    for i, field in enumerate(batch.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            column = batch.column(i)
+            if len(column) and pc.count_distinct(column).as_py() <= CATEGORICAL_RATIO * len(column):
+                columns.append(field.name)
+    return columns
+
+def convert_to_parquet(csv_path: str):
+    """
+    Streams csv_path into a Parquet file next to it, one record batch at a
+    time. Returns the Parquet path, or None if pyarrow is missing or the
+    file could not be converted (callers then keep using the CSV).
+    """
+    if pa is None:
+        return None
+
+    target = columnar_path(csv_path)
+    partial = target + ".partial"
+    try:
+        reader = pa_csv.open_csv(
+            csv_path,
+            # Match pandas: empty text cells are missing values, not ""
+            convert_options=pa_csv.ConvertOptions(strings_can_be_null=True)
+        )
+        writer = None
+        dictionary_columns = []
+        try:
+            for batch in reader:
+                if writer is None:
+                    # Types come from the first block and stay fixed from here on
+                    dictionary_columns = _dictionary_columns(batch)
+                    schema = pa.schema([
+                        pa.field(f.name, pa.dictionary(pa.int32(), f.type)) if f.name in dictionary_columns else f
+                        for f in batch.schema
+                    ])
+                    writer = pq.ParquetWriter(partial, schema)
+                arrays = [
+                    pc.dictionary_encode(batch.column(i)) if name in dictionary_columns else batch.column(i)
+                    for i, name in enumerate(batch.schema.names)
+                ]
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if writer is None:
+            return None
+        os.replace(partial, target)
+        return target
+    except Exception as e:
+        # e.g. a later block that doesn't fit the inferred types
+        print(f"Columnar conversion skipped for {csv_path}: {e}")
+        if os.path.exists(partial):
+            os.remove(partial)
+        return None
+
+def upload_source(csv_path: str):
+    """
+    Returns the file an EDA turn should load: the Parquet copy when it is
+    present and at least as new as the CSV, otherwise the CSV itself.
+    """
+    parquet_path = columnar_path(csv_path)
+    if pa is not None and os.path.exists(parquet_path):
+        if os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path):
+            return parquet_path
+    return csv_path
+
+def read_upload(path: str):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, engine="pyarrow", memory_map=True)
+    return pd.read_csv(path)
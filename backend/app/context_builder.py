@@ -0,0 +1,151 @@
+from collections import OrderedDict
+from app.tokens import estimate_tokens
+from app.llm_cache import fingerprint
+import json
+import os
+import re
+import threading
+
+# Conversation Context Builder
+# Turns chat history into the "Previous conversation history" block of the
+# planner prompts. EDA answers are stored as JSON with code, stdout, plot
+# URLs and tracebacks; only what helps the next plan is kept. The newest
+# messages go in verbatim (after compaction); once the whole history no
+# longer fits the token budget, older ones are folded into a rolling summary
+# of one-line digests, oldest dropped first when over budget.
+# Digests are cached per message, so each turn only digests what is new.
+
+PLOT_URL_PATTERN = re.compile(r"!?\[[^\]]*\]\([^)]*/static/plots/[^)]*\)|\S*/static/plots/\S+")
+TABLE_PATTERN = re.compile(r"(?:^\|.*\|[ \t]*(?:\n|$))+", re.MULTILINE)
+
+def context_settings():
+    return {
+        "recent_messages": int(os.getenv("CONTEXT_RECENT_MESSAGES", "6")),
+        "token_budget": int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+        "output_chars": int(os.getenv("CONTEXT_OUTPUT_CHARS", "600")),
+    }
+
+def truncate(text: str, max_chars: int):
+    # Head and tail: the start of output and the end of a traceback both matter
+    if len(text) <= max_chars:
+        return text
+    half = max_chars // 2
+    return f"{text[:half]}\n...[{len(text) - 2 * half} chars omitted]...\n{text[-half:]}"
+
+def _parse_rich(content: str):
+    # EDA assistant messages are JSON objects (see /api/eda_chat)
+    if not content or not content.lstrip().startswith("{"):
+        return None
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        return None
+    return data if isinstance(data, dict) and "answer" in data else None
+
+def compact_message(msg, output_chars: int = 600):
+    """
+    Prompt text for one message: plot URLs replaced by a count, stdout and
+    tracebacks truncated.
+    """
+    rich = _parse_rich(msg["content"])
+    if rich is None:
+        return PLOT_URL_PATTERN.sub("[plot]", msg["content"] or "").strip()
+
+    parts = [PLOT_URL_PATTERN.sub("[plot]", rich.get("answer") or "").strip()]
+    if rich.get("code"):
+        parts.append("Code:\n" + truncate(rich["code"].strip(), output_chars * 2))
+    if rich.get("stdout"):
+        parts.append("Output:\n" + truncate(rich["stdout"].strip(), output_chars))
+    if rich.get("plots"):
+        parts.append(f"[{len(rich['plots'])} plot(s) generated]")
+    if rich.get("error"):
+        parts.append("Error:\n" + truncate(rich["error"].strip(), output_chars // 2))
+    return "\n".join(part for part in parts if part)
+
+def _first_sentence(text: str, max_chars: int):
+    text = " ".join(text.split())
+    match = re.match(r"(.+?[.!?])(\s|$)", text)
+    sentence = match.group(1) if match else text
+    return sentence if len(sentence) <= max_chars else sentence[: max_chars - 3] + "..."
+
+class DigestCache:
+    """
+    LRU of one-line message digests, keyed by a hash of role and content.
+    """
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def digest(self, msg):
+        key = fingerprint(msg["role"] + "\0" + (msg["content"] or ""))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        rich = _parse_rich(msg["content"])
+        if msg["role"] == "user":
+            line = "User asked: " + _first_sentence(msg["content"] or "", 160)
+        else:
+            text = (rich.get("answer") if rich is not None else msg["content"]) or ""
+            text = TABLE_PATTERN.sub(lambda m: f"[table, {max(m.group(0).count(chr(10)) - 2, 0)} rows] ", text)
+            line = "Assistant: " + _first_sentence(PLOT_URL_PATTERN.sub("[plot]", text), 200)
+            if rich is not None and rich.get("error"):
+                line += " (code failed)"
+
+        with self._lock:
+            self._entries[key] = line
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return line
+
+_digests = None
+_digests_lock = threading.Lock()
+
+def get_digest_cache():
+    global _digests
+    with _digests_lock:
+        if _digests is None:
+            _digests = DigestCache(max_entries=int(os.getenv("CONTEXT_DIGEST_CACHE_SIZE", "4096")))
+        return _digests
+
+def build_history_context(history):
+    """
+    The history block for a planner prompt ("" for no history), within
+    CONTEXT_TOKEN_BUDGET estimated tokens where possible.
+    """
+    if not history:
+        return ""
+    settings = context_settings()
+    lines = []
+    for msg in history:
+        role = "User" if msg["role"] == "user" else "Assistant"
+        lines.append(f"{role}: {compact_message(msg, settings['output_chars'])}")
+    tokens = [estimate_tokens(line) for line in lines]
+
+    recent_count = max(settings["recent_messages"], 0)
+    if sum(tokens) <= settings["token_budget"] or len(history) <= recent_count:
+        return "Previous conversation history:\n" + "\n".join(lines) + "\n"
+
+    split = len(history) - recent_count
+    older, recent_lines = history[:split], lines[split:]
+    used = sum(tokens[split:])
+
+    # Newest digests first, until the budget runs out
+    summary = []
+    cache = get_digest_cache()
+    for msg in reversed(older):
+        line = "- " + cache.digest(msg)
+        used += estimate_tokens(line)
+        if used > settings["token_budget"]:
+            break
+        summary.append(line)
+    summary.reverse()
+
+    context = "Previous conversation history:\n"
+    if summary:
+        omitted = len(older) - len(summary)
+        header = f"Summary of earlier turns{f' ({omitted} older messages omitted)' if omitted else ''}:\n"
+        context += header + "\n".join(summary) + "\n\nRecent messages:\n"
+    return context + "\n".join(recent_lines) + "\n"
@@ -1,6 +1,14 @@
 from sqlalchemy import create_engine, text
 from datetime import datetime
+from app.history_cache import get_history_cache, select_history, covers
 import os
+import threading
+
+# Engine Registry
+# One engine (and therefore one connection pool) per database URI, shared by
+# every helper in this module, the agent and the API handlers.
+_engines = {}
+_engines_lock = threading.Lock()
 
 def get_database_url():
     user = os.getenv("DB_USER", "postgres")
@@ -10,8 +18,47 @@ def get_database_url():
     name = os.getenv("DB_NAME", "postgres")
     return f"postgresql://{user}:{password}@{host}:{port}/{name}"
 
+def _pool_options(db_uri: str):
+    """
+    Pool settings for a new engine, read from the environment.
+    SQLite uses its own single-file pools, so only pre-ping applies there.
+    """
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    }
+    if not db_uri.startswith("sqlite"):
+        options["pool_size"] = int(os.getenv("DB_POOL_SIZE", "5"))
+        options["max_overflow"] = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        options["pool_recycle"] = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    return options
+
+def get_engine(db_uri: str):
+    """
+    Returns the shared engine for db_uri, creating it on first use.
+    """
+    engine = _engines.get(db_uri)
+    if engine is not None:
+        return engine
+
+    with _engines_lock:
+        engine = _engines.get(db_uri)
+        if engine is None:
+            engine = create_engine(db_uri, **_pool_options(db_uri))
+            _engines[db_uri] = engine
+        return engine
+
+def dispose_engines():
+    """
+    Closes every pooled connection and empties the registry.
+    Called from the FastAPI lifespan on shutdown.
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
 def init_db(db_uri: str):
-    engine = create_engine(db_uri)
+    engine = get_engine(db_uri)
     
     with engine.connect() as connection:
         # Create tables
@@ -51,6 +98,15 @@ def init_db(db_uri: str):
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """))
+
+        # Migration: history reads filter by session and order by time
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_chat_messages_session_created ON chat_messages (session_id, created_at)"
+        ))
+        # Migration: session retention and listings filter by type and order by time
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS idx_chat_sessions_type_created ON chat_sessions (session_type, created_at)"
+        ))
         
         # Check if data exists
         result = connection.execute(text("SELECT COUNT(*) FROM students"))
@@ -79,62 +135,114 @@ def init_db(db_uri: str):
             print("Database already contains data.")
             connection.commit()
 
+def session_retention():
+    """
+    Sessions kept per session type (SESSION_RETENTION, 0 = keep all).
+    """
+    return int(os.getenv("SESSION_RETENTION", "5"))
+
+# One set-based statement; the (session_type, created_at) index serves the subquery
+RETENTION_SQL = """
+    DELETE FROM chat_sessions
+    WHERE session_type = :type AND id NOT IN (
+        SELECT id FROM chat_sessions WHERE session_type = :type
+        ORDER BY created_at DESC, id DESC LIMIT :keep
+    )
+    RETURNING id
+"""
+
 def create_session(db_uri: str, title: str = "New Chat", session_type: str = "sql", filename: str = None):
-    engine = create_engine(db_uri)
+    engine = get_engine(db_uri)
     with engine.connect() as conn:
-        # Check current session count for this type
-        result = conn.execute(text(
-            "SELECT id FROM chat_sessions WHERE session_type = :type ORDER BY created_at ASC"
-        ), {"type": session_type})
-        sessions = [row[0] for row in result]
-        
-        # Limit to 5 sessions per type
-        if len(sessions) >= 5:
-            # Calculate how many to delete
-            num_to_delete = len(sessions) - 4
-            ids_to_delete = sessions[:num_to_delete]
-            
-            # Delete them
-            conn.execute(text(
-                "DELETE FROM chat_sessions WHERE id IN :ids"
-            ), {"ids": tuple(ids_to_delete)})
-            
         # Create new session
         result = conn.execute(text(
             "INSERT INTO chat_sessions (title, session_type, filename) VALUES (:title, :type, :filename) RETURNING id"
         ), {"title": title, "type": session_type, "filename": filename})
         session_id = result.scalar()
+
+        # Keep only the newest sessions of this type
+        keep = session_retention()
+        if keep:
+            deleted = [row[0] for row in conn.execute(text(RETENTION_SQL), {"type": session_type, "keep": keep})]
+            get_history_cache().invalidate(db_uri, deleted)
         conn.commit()
         return session_id
 
 def get_sessions(db_uri: str):
-    engine = create_engine(db_uri)
+    engine = get_engine(db_uri)
     with engine.connect() as conn:
         result = conn.execute(text(
             "SELECT id, title, session_type, filename, created_at FROM chat_sessions ORDER BY created_at DESC"
         ))
         return [dict(row._mapping) for row in result]
 
-def add_message(db_uri: str, session_id: int, role: str, content: str):
-    engine = create_engine(db_uri)
+def insert_messages_statement(rows):
+    """
+    One multi-row INSERT for rows of (session_id, role, content), in order.
+    """
+    values = ", ".join(f"(:session_id_{i}, :role_{i}, :content_{i})" for i in range(len(rows)))
+    params = {}
+    for i, (session_id, role, content) in enumerate(rows):
+        params.update({f"session_id_{i}": session_id, f"role_{i}": role, f"content_{i}": content})
+    return text(f"INSERT INTO chat_messages (session_id, role, content) VALUES {values}"), params
+
+def add_messages(db_uri: str, rows):
+    """
+    Saves rows of (session_id, role, content) in one statement and commit,
+    e.g. the user and assistant messages of a turn.
+    """
+    if not rows:
+        return
+    engine = get_engine(db_uri)
     with engine.connect() as conn:
-        conn.execute(text(
-            "INSERT INTO chat_messages (session_id, role, content) VALUES (:session_id, :role, :content)"
-        ), {"session_id": session_id, "role": role, "content": content})
+        conn.execute(*insert_messages_statement(rows))
         conn.commit()
+    cache = get_history_cache()
+    for session_id, role, content in rows:
+        cache.append(db_uri, session_id, [{"role": role, "content": content}])
+
+def add_message(db_uri: str, session_id: int, role: str, content: str):
+    add_messages(db_uri, [(session_id, role, content)])
+
+# Newest first, so a limited read only touches the tail of the session index
+RECENT_MESSAGES_SQL = """
+    SELECT role, content FROM chat_messages WHERE session_id = :session_id
+    ORDER BY created_at DESC, id DESC LIMIT :limit
+"""
+ALL_MESSAGES_SQL = "SELECT role, content FROM chat_messages WHERE session_id = :session_id ORDER BY created_at ASC, id ASC"
+
+def get_chat_history(db_uri: str, session_id: int, limit: int = None, token_budget: int = None):
+    """
+    Messages of a session, oldest first. limit keeps only the last N and
+    token_budget the newest that fit in that many estimated tokens.
+    Served from the history cache when possible.
+    """
+    cache = get_history_cache()
+    history = cache.get(db_uri, session_id, limit, token_budget)
+    if history is not None:
+        return history
+    version = cache.version(db_uri, session_id)
 
-def get_chat_history(db_uri: str, session_id: int):
-    engine = create_engine(db_uri)
+    engine = get_engine(db_uri)
     with engine.connect() as conn:
-        result = conn.execute(text(
-            "SELECT role, content FROM chat_messages WHERE session_id = :session_id ORDER BY created_at ASC"
-        ), {"session_id": session_id})
-        return [dict(row._mapping) for row in result]
+        window = cache.max_messages
+        result = conn.execute(text(RECENT_MESSAGES_SQL), {"session_id": session_id, "limit": window + 1})
+        rows = [dict(row._mapping) for row in result]
+        recent = rows[:window][::-1]
+        cache.put(db_uri, session_id, recent, complete=len(rows) <= window, version=version)
+
+        history = select_history(recent, limit, token_budget)
+        if covers(recent, len(rows) <= window, history, limit):
+            return history
+        # Longer than the cached window: read the whole session
+        result = conn.execute(text(ALL_MESSAGES_SQL), {"session_id": session_id})
+        return select_history([dict(row._mapping) for row in result], limit, token_budget)
 
 def delete_all_sessions(db_uri: str):
-    engine = create_engine(db_uri)
+    engine = get_engine(db_uri)
     with engine.connect() as conn:
         # Cascading delete will handle messages
         conn.execute(text("TRUNCATE TABLE chat_sessions CASCADE"))
         conn.commit()
+    get_history_cache().invalidate(db_uri)
 
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+import os
+import threading
+import pandas as pd
+
+# DataFrame Cache
+# Parsed uploads kept in memory across EDA turns (one cache per sandbox
+# worker process, see app/sandbox.py), keyed by path and mtime so
+# a replaced file is re-read. Least recently used frames are evicted once
+# the total deep memory usage passes DF_CACHE_MAX_MB.
+
+def _copy_on_write_enabled():
+    # Always on from pandas 3.0; opt-in ("mode.copy_on_write") on 2.x
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+class DataFrameCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._frames = OrderedDict()  # (path, mtime_ns) -> (df, nbytes)
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def get(self, path: str, loader=pd.read_csv):
+        """
+        Returns a private view of the frame at path, parsing it with loader
+        on a miss. Callers may mutate the result freely: with copy-on-write
+        it is a shallow copy, otherwise a deep copy.
+        """
+        key = (os.path.abspath(path), os.stat(path).st_mtime_ns)
+        with self._lock:
+            entry = self._frames.get(key)
+            if entry is not None:
+                self._frames.move_to_end(key)
+                self._stats["hits"] += 1
+                return self._private_copy(entry[0])
+            self._stats["misses"] += 1
+
+        # Parse outside the lock so other sessions aren't held up
+        df = loader(path)
+        nbytes = int(df.memory_usage(deep=True).sum())
+        with self._lock:
+            self._store(key, df, nbytes)
+        return self._private_copy(df)
+
+    def _store(self, key, df, nbytes):
+        # Older versions of the same file can never be hit again
+        for stale in [k for k in self._frames if k[0] == key[0] and k != key]:
+            self._remove(stale)
+        if key in self._frames or nbytes > self.max_bytes:
+            return
+        self._frames[key] = (df, nbytes)
+        self._total_bytes += nbytes
+        while self._total_bytes > self.max_bytes:
+            self._remove(next(iter(self._frames)))
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, nbytes = self._frames.pop(key)
+        self._total_bytes -= nbytes
+
+    def _private_copy(self, df):
+        return df.copy(deep=not _copy_on_write_enabled())
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._frames),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self._total_bytes = 0
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_dataframe_cache():
+    """
+    Returns the process-wide cache, sized from DF_CACHE_MAX_MB.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DataFrameCache(max_bytes=int(float(os.getenv("DF_CACHE_MAX_MB", "1024")) * 1024 * 1024))
+        return _cache
@@ -1,25 +1,20 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
-import pandas as pd
 import os
 import json
-import sys
-import io
-import contextlib
-import matplotlib.pyplot as plt
-import uuid
-import traceback
+from app.sandbox import get_sandbox_pool
+from app.columnar import upload_source
+from app.storage import mark_used
+from app.profiling import load_profile, format_profile
+from app.llm_cache import get_llm_cache, fingerprint
+from app.context_builder import build_history_context
+from app.llm_clients import get_llm, eda_model
 
 # --- STAGE 1: PLANNER ---
-def planner_stage(llm, user_query, df_info, history=[]):
+def planner_stage(llm, user_query, df_info, history=[], use_cache=True):
     """
     Generates Python code to answer the user query based on the dataframe info.
     """
-    history_context = ""
-    if history:
-        history_context = "Previous conversation history:\n"
-        for msg in history:
-            role = "User" if msg['role'] == 'user' else "Assistant"
-            history_context += f"{role}: {msg['content']}\n"
+    # Compacted: recent turns verbatim, older ones summarized
+    history_context = build_history_context(history)
 
     prompt = f"""
     You are a Python Data Analysis Expert.
@@ -56,8 +51,10 @@ def planner_stage(llm, user_query, df_info, history=[]):
     plt.clf()
     """
     
-    response = llm.invoke(prompt)
-    content = response.content.strip()
+    # Repeated questions on an unchanged dataset reuse the cached plan
+    cache = get_llm_cache()
+    cache_key = cache.make_key(llm, user_query, fingerprint(df_info), history)
+    content = cache.invoke(llm, prompt, cache_key, bypass=not use_cache).strip()
     
     # Clean up markdown code blocks if present
     if content.startswith("```python"):
@@ -70,73 +67,13 @@ def planner_stage(llm, user_query, df_info, history=[]):
     return content
 
 # --- STAGE 2: EXECUTOR ---
-def executor_stage(code, df):
+def executor_stage(code, source):
     """
-    Executes the generated Python code in a temporary directory.
+    Executes the generated Python code against the upload at source in a
+    sandbox worker process (see app/sandbox.py).
     Captures stdout and any saved plots.
     """
-    import tempfile
-    import shutil
-    
-    # Create a buffer to capture stdout
-    output_buffer = io.StringIO()
-    
-    # Directory to save final plots
-    final_plot_dir = os.path.abspath("workspace/plots")
-    os.makedirs(final_plot_dir, exist_ok=True)
-    
-    results = {
-        "stdout": "",
-        "error": None,
-        "plots": []
-    }
-    
-    # Create a temporary directory for execution
-    with tempfile.TemporaryDirectory() as temp_dir:
-        # Save current CWD
-        original_cwd = os.getcwd()
-        
-        try:
-            # Change to temp dir
-            os.chdir(temp_dir)
-            
-            # Redirect stdout
-            with contextlib.redirect_stdout(output_buffer):
-                # Execute code in a restricted namespace
-                local_vars = {
-                    "df": df,
-                    "pd": pd,
-                    "plt": plt,
-                    "print": print,
-                    "sns": __import__("seaborn"),
-                    "np": __import__("numpy")
-                }
-                
-                # Execute the code
-                exec(code, {}, local_vars)
-                
-            results["stdout"] = output_buffer.getvalue()
-            
-            # Scan temp dir for any PNG files generated
-            for filename in os.listdir(temp_dir):
-                if filename.lower().endswith('.png'):
-                    # Generate unique name for permanent storage
-                    unique_name = f"plot_{uuid.uuid4()}.png"
-                    dest_path = os.path.join(final_plot_dir, unique_name)
-                    
-                    # Move file from temp dir to static/plots
-                    shutil.move(os.path.join(temp_dir, filename), dest_path)
-                    
-                    # Add web-accessible path to results
-                    results["plots"].append(f"/static/plots/{unique_name}")
-
-        except Exception as e:
-            results["error"] = f"{str(e)}\n{traceback.format_exc()}"
-        finally:
-            # Always restore CWD
-            os.chdir(original_cwd)
-        
-    return results
+    return get_sandbox_pool().run(source, code)
 
 # --- STAGE 3: RESPONDER ---
 def responder_stage(llm, user_query, execution_results):
@@ -165,13 +102,9 @@ def responder_stage(llm, user_query, execution_results):
     response = llm.invoke(prompt)
     return response.content
 
-def get_eda_response(message: str, filename: str, google_api_key: str, history: list = []) -> dict:
-    # Initialize LLM
-    llm = ChatGoogleGenerativeAI(
-        model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"),
-        google_api_key=google_api_key,
-        temperature=0
-    )
+def get_eda_response(message: str, filename: str, google_api_key: str, history: list = [], use_cache: bool = True, model: str = None) -> dict:
+    # Shared client for this key and model (GEMINI_MODEL unless given)
+    llm = get_llm(google_api_key, model or eda_model())
     
     # Load Dataframe
     file_path = f"workspace/uploads/{filename}"
@@ -182,23 +115,25 @@ def get_eda_response(message: str, filename: str, google_api_key: str, history:
             "code": ""
         }
         
+    # Prefer the Parquet copy written at upload time. The sandbox worker
+    # parses it once and keeps the frame resident for follow-up turns.
+    source = upload_source(file_path)
+    # Recently used uploads are the last to go under the storage quota
+    mark_used(file_path)
+        
+    # DF Info for Planner, from the profile computed at upload time
     try:
-        df = pd.read_csv(file_path)
+        df_info = format_profile(load_profile(file_path))
     except Exception as e:
         return {
-            "answer": f"Error loading CSV: {str(e)}",
+            "answer": f"Error profiling CSV: {str(e)}",
             "plots": [],
             "code": ""
         }
-        
-    # Get DF Info for Planner
-    buffer = io.StringIO()
-    df.info(buf=buffer)
-    df_info = f"Columns: {list(df.columns)}\n\nShape: {df.shape}\n\nInfo:\n{buffer.getvalue()}\n\nHead:\n{df.head().to_string()}"
     
     # --- STAGE 1: PLANNER ---
     try:
-        code = planner_stage(llm, message, df_info, history)
+        code = planner_stage(llm, message, df_info, history, use_cache)
     except Exception as e:
         return {
             "answer": f"Planning stage failed: {str(e)}",
@@ -208,7 +143,7 @@ def get_eda_response(message: str, filename: str, google_api_key: str, history:
         
     # --- STAGE 2: EXECUTOR ---
     try:
-        exec_results = executor_stage(code, df)
+        exec_results = executor_stage(code, source)
     except Exception as e:
         return {
             "answer": f"Execution stage failed: {str(e)}",
@@ -225,6 +160,7 @@ def get_eda_response(message: str, filename: str, google_api_key: str, history:
     return {
         "answer": final_answer,
         "plots": exec_results["plots"],
+        "plot_details": exec_results["plot_details"],
         "code": code,
         "stdout": exec_results["stdout"],
         "error": exec_results["error"]
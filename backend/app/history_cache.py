@@ -0,0 +1,171 @@
+from collections import OrderedDict
+from app.tokens import estimate_tokens
+import os
+import threading
+import time
+
+# Chat History Cache
+# Write-through cache of recent messages per (database URI, session id), so a
+# turn does not re-read the whole session. Entries are filled from the
+# database on a miss and appended to by add_message after its insert
+# commits. Each entry keeps at most max_messages of the newest messages and
+# records whether that is the whole session; a TTL bounds staleness when
+# another process writes to the same session. Readers take version() before
+# their query and pass it to put(), which is skipped if an append or
+# invalidation came in between, so a slow read never overwrites newer
+# messages. Only prompt building reads through the cache; the message
+# listing endpoint always reads the database.
+
+def select_history(messages, limit: int = None, token_budget: int = None):
+    """
+    The newest messages that fit: at most limit messages and, if given,
+    token_budget estimated tokens. Returned oldest first.
+    """
+    if limit is not None:
+        messages = messages[-limit:] if limit > 0 else []
+    if token_budget is None:
+        return list(messages)
+
+    selected = []
+    used = 0
+    for message in reversed(messages):
+        used += estimate_tokens(message["content"] or "")
+        if used > token_budget:
+            break
+        selected.append(message)
+    selected.reverse()
+    return selected
+
+def covers(messages, complete: bool, selected, limit: int = None):
+    """
+    Whether a selection from messages (the newest messages of a session,
+    all of them if complete) is the same as selecting from the full history.
+    """
+    return complete or len(selected) < len(messages) or (limit is not None and len(selected) == limit)
+
+def history_limits():
+    """
+    Limits applied when building agent prompts, from CHAT_HISTORY_MAX_MESSAGES
+    and CHAT_HISTORY_TOKEN_BUDGET (0 disables either).
+    """
+    limit = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "50"))
+    token_budget = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "8000"))
+    return {"limit": limit or None, "token_budget": token_budget or None}
+
+class HistoryCache:
+    def __init__(self, max_sessions: int, max_messages: int, ttl: float):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # (db_uri, session_id) -> [expires_at, messages, complete]
+        # (db_uri, session_id) or (db_uri, None) for the whole database -> generation
+        # of its last change; generations are never reused, so a forgotten key is safe
+        self._versions = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, db_uri: str, session_id: int, limit: int = None, token_budget: int = None):
+        """
+        Returns the selected history, or None if the cache cannot answer
+        (unknown session, expired, or older messages than it holds are needed).
+        """
+        key = (db_uri, session_id)
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is not None and time.monotonic() >= entry[0]:
+                del self._sessions[key]
+                entry = None
+            if entry is not None:
+                selected = select_history(entry[1], limit, token_budget)
+                # A partial tail only answers requests that stop inside it
+                if covers(entry[1], entry[2], selected, limit):
+                    self._sessions.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return selected
+            self._stats["misses"] += 1
+            return None
+
+    def _bump(self, key):
+        self._generation += 1
+        self._versions[key] = self._generation
+        self._versions.move_to_end(key)
+        while len(self._versions) > 4 * self.max_sessions:
+            self._versions.popitem(last=False)
+
+    def _current(self, db_uri: str, session_id: int):
+        return self._versions.get((db_uri, None), 0), self._versions.get((db_uri, session_id), 0)
+
+    def version(self, db_uri: str, session_id: int):
+        """
+        Token to pass to put() for a read that starts now.
+        """
+        with self._lock:
+            return self._current(db_uri, session_id)
+
+    def put(self, db_uri: str, session_id: int, messages, complete: bool = True, version=None):
+        """
+        Stores the newest messages of a session, as read from the database;
+        complete says whether they are all of its messages. Skipped when
+        the session changed since version() was taken.
+        """
+        complete = complete and len(messages) <= self.max_messages
+        with self._lock:
+            if version is not None and version != self._current(db_uri, session_id):
+                return
+            self._sessions[(db_uri, session_id)] = [
+                time.monotonic() + self.ttl, list(messages[-self.max_messages:]), complete
+            ]
+            self._sessions.move_to_end((db_uri, session_id))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def append(self, db_uri: str, session_id: int, messages):
+        """
+        Write-through after an insert; sessions not in the cache are left to
+        be loaded on their next read.
+        """
+        with self._lock:
+            self._bump((db_uri, session_id))
+            entry = self._sessions.get((db_uri, session_id))
+            if entry is None:
+                return
+            entry[1].extend(messages)
+            if len(entry[1]) > self.max_messages:
+                del entry[1][:-self.max_messages]
+                entry[2] = False
+
+    def invalidate(self, db_uri: str, session_ids=None):
+        with self._lock:
+            for session_id in session_ids if session_ids is not None else [None]:
+                self._bump((db_uri, session_id))
+            for key in list(self._sessions):
+                if key[0] == db_uri and (session_ids is None or key[1] in session_ids):
+                    del self._sessions[key]
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "sessions": len(self._sessions),
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_history_cache():
+    """
+    Returns the process-wide cache, configured from HISTORY_CACHE_SESSIONS,
+    HISTORY_CACHE_MAX_MESSAGES and HISTORY_CACHE_TTL.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = HistoryCache(
+                max_sessions=int(os.getenv("HISTORY_CACHE_SESSIONS", "256")),
+                max_messages=int(os.getenv("HISTORY_CACHE_MAX_MESSAGES", "200")),
+                ttl=float(os.getenv("HISTORY_CACHE_TTL", "300")),
+            )
+        return _cache
@@ -0,0 +1,55 @@
+from fastapi import Request, Response
+from fastapi.staticfiles import StaticFiles
+from app.sql_results import dumps
+import hashlib
+import os
+
+# HTTP Caching and Compression
+# Plot files are content-addressed (see app/storage.py): a URL always names
+# the same bytes, so browsers may keep them for a year without asking again.
+# Listings the frontend re-fetches (sessions, a session's messages, the
+# schema) carry an ETag of their body; a client sending it back in
+# If-None-Match gets an empty 304 when nothing changed. JSON bodies of at
+# least GZIP_MIN_SIZE bytes are gzip-compressed (see main.py).
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+def compression_settings():
+    return {
+        "minimum_size": int(os.getenv("GZIP_MIN_SIZE", "1024")),
+        "compresslevel": int(os.getenv("GZIP_LEVEL", "6")),
+    }
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for content-addressed files: adds a long-lived immutable
+    Cache-Control to every file response (ETag and 304 are built in).
+    """
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+def etag_for(body: bytes):
+    # Weak: the gzip middleware may change the bytes on the wire
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def _matches(if_none_match: str, etag: str):
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/ prefixes are ignored
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag.removeprefix("W/") in tags
+
+def json_with_etag(request: Request, content):
+    """
+    content as a JSON response with an ETag, or an empty 304 if the
+    request's If-None-Match already names it. Clients revalidate each time.
+    """
+    body = dumps(content).encode("utf-8")
+    etag = etag_for(body)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
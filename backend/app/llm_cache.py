@@ -0,0 +1,190 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+# LLM Response Cache
+# Planner completions are reused for repeated questions. Two tiers: an
+# in-memory LRU in front of a SQLite file that survives restarts. Keys
+# combine the model, the normalized question, a fingerprint of the schema
+# (or dataset profile) and the last few history messages, so a changed
+# database or a different conversation never reuses a stale plan. Expired
+# rows are deleted from the SQLite file every PRUNE_INTERVAL seconds.
+
+PRUNE_INTERVAL = 600
+
+def normalize_text(text: str):
+    # Whitespace and trailing punctuation don't change intent; case can
+    # (quoted values, identifiers), so it is kept
+    return re.sub(r"\s+", " ", (text or "").strip()).rstrip(" ?.!")
+
+def fingerprint(text: str):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+def model_name(llm):
+    return getattr(llm, "model", None) or getattr(llm, "model_name", None) or type(llm).__name__
+
+class LLMCache:
+    def __init__(self, path: str, max_entries: int, ttl: float, history_window: int):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.history_window = history_window
+        self._memory = OrderedDict()  # key -> (created_at, response, latency_ms)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "saved_ms": 0.0}
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, response TEXT, latency_ms REAL, created_at REAL)"
+            )
+            self._execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_created ON llm_cache (created_at)")
+        self._pruned_at = 0.0
+
+    def _execute(self, sql: str, params=()):
+        # Short-lived connections: cheap for SQLite and safe across worker threads
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                return conn.execute(sql, params).fetchone()
+        finally:
+            conn.close()
+
+    def make_key(self, llm, user_query: str, context_fingerprint: str, history=[]):
+        window = history[-self.history_window:] if self.history_window else []
+        parts = [
+            model_name(llm),
+            normalize_text(user_query),
+            context_fingerprint,
+            [[msg["role"], normalize_text(msg["content"])] for msg in window],
+        ]
+        return fingerprint(json.dumps(parts))
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    self._stats["saved_ms"] += entry[2]
+                    return entry[1]
+                del self._memory[key]
+
+        if not self.path:
+            return None
+        row = self._execute("SELECT response, latency_ms, created_at FROM llm_cache WHERE key = ?", (key,))
+        if row is None:
+            return None
+        response, latency_ms, created_at = row
+        if now - created_at >= self.ttl:
+            self._execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            return None
+
+        with self._lock:
+            self._remember(key, (created_at, response, latency_ms))
+            self._stats["disk_hits"] += 1
+            self._stats["saved_ms"] += latency_ms
+        return response
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _put(self, key, response, latency_ms):
+        created_at = time.time()
+        with self._lock:
+            self._remember(key, (created_at, response, latency_ms))
+        if self.path:
+            self._execute(
+                "INSERT OR REPLACE INTO llm_cache (key, response, latency_ms, created_at) VALUES (?, ?, ?, ?)",
+                (key, response, latency_ms, created_at)
+            )
+            if created_at - self._pruned_at >= PRUNE_INTERVAL:
+                self.prune(created_at)
+
+    def prune(self, now: float = None):
+        """
+        Deletes expired rows from the SQLite tier; expired keys that are
+        never looked up again would otherwise stay forever.
+        """
+        now = now or time.time()
+        self._pruned_at = now
+        if self.path:
+            self._execute("DELETE FROM llm_cache WHERE created_at <= ?", (now - self.ttl,))
+
+    def discard(self, key: str):
+        """
+        Drops a stored completion, e.g. one the caller could not parse.
+        """
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.path:
+            self._execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+
+    def invoke(self, llm, prompt: str, key: str, bypass: bool = False):
+        """
+        Returns the completion text for prompt, from cache when possible.
+        With bypass=True the LLM is always called (the fresh answer is still stored).
+        """
+        if bypass:
+            with self._lock:
+                self._stats["bypassed"] += 1
+        else:
+            cached = self._get(key)
+            if cached is not None:
+                return cached
+            with self._lock:
+                self._stats["misses"] += 1
+
+        start = time.perf_counter()
+        response = llm.invoke(prompt).content
+        self._put(key, response, (time.perf_counter() - start) * 1000)
+        return response
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            entries = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        return {
+            **stats,
+            "saved_ms": round(stats["saved_ms"], 1),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "memory_entries": entries,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            self._execute("DELETE FROM llm_cache")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache():
+    """
+    Returns the process-wide cache, configured from LLM_CACHE_PATH (empty
+    for memory only), LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL and
+    LLM_CACHE_HISTORY_WINDOW.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", "workspace/llm_cache.sqlite3"),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+                ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+                history_window=int(os.getenv("LLM_CACHE_HISTORY_WINDOW", "4")),
+            )
+        return _cache
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from app.llm_cache import fingerprint
+import itertools
+import os
+import threading
+
+# LLM Client Registry
+# Chat model clients are built once per (API key, model) and shared by every
+# request using that pair, so their HTTP connections stay open between
+# calls instead of being set up again for each pipeline. The model is
+# chosen per request (the "model" field of the chat endpoints), falling back
+# to SQL_CHAT_MODEL for the SQL agent and GEMINI_MODEL for EDA; nothing is
+# read from or written to the environment per request. The factory that
+# builds clients is pluggable, so tests and benchmarks can run the
+# pipelines against scripted fake models (see fake_factory).
+
+DEFAULT_SQL_CHAT_MODEL = "gemini-2.5-flash-lite-preview-09-2025"
+DEFAULT_EDA_MODEL = "gemini-1.5-flash"
+
+def sql_chat_model():
+    return os.getenv("SQL_CHAT_MODEL", DEFAULT_SQL_CHAT_MODEL)
+
+def eda_model():
+    return os.getenv("GEMINI_MODEL", DEFAULT_EDA_MODEL)
+
+def allowed_models():
+    # Empty LLM_ALLOWED_MODELS: any model may be requested
+    return {m.strip() for m in os.getenv("LLM_ALLOWED_MODELS", "").split(",") if m.strip()}
+
+def check_model(model: str = None):
+    """
+    Raises ValueError if model was requested but is not in LLM_ALLOWED_MODELS.
+    """
+    allowed = allowed_models()
+    if model and allowed and model not in allowed:
+        raise ValueError(f"Model {model} is not allowed")
+
+def google_factory(api_key: str, model: str):
+    # langchain is imported on first use, not when the app starts (see app/warmup.py)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=model, google_api_key=api_key, temperature=0)
+
+def fake_factory(responses):
+    """
+    A factory of fake chat models that answer with responses in turn,
+    starting over after the last one.
+    """
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+
+    def factory(api_key: str, model: str):
+        return GenericFakeChatModel(messages=itertools.cycle([AIMessage(content=r) for r in responses]))
+    return factory
+
+class LLMRegistry:
+    """
+    LRU of chat model clients keyed by a hash of (API key, model).
+    """
+    def __init__(self, max_clients: int, factory=google_factory):
+        self.max_clients = max_clients
+        self._factory = factory
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "created": 0, "evicted": 0}
+
+    def get(self, api_key: str, model: str):
+        """
+        The shared client for api_key and model. Raises ValueError for a
+        model outside LLM_ALLOWED_MODELS.
+        """
+        check_model(model)
+        key = fingerprint(f"{api_key}\0{model}")
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self._stats["hits"] += 1
+                return client
+            factory = self._factory
+
+        # Built outside the lock; a concurrent miss for the same key keeps the first
+        client = factory(api_key, model)
+        with self._lock:
+            if self._factory is not factory:
+                return client
+            if key in self._clients:
+                self._stats["hits"] += 1
+                return self._clients[key]
+            self._clients[key] = client
+            self._stats["created"] += 1
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self._stats["evicted"] += 1
+        return client
+
+    def set_factory(self, factory):
+        """
+        Builds clients with factory(api_key, model) from now on and drops
+        the clients built by the previous one.
+        """
+        with self._lock:
+            self._factory = factory
+            self._clients.clear()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, "clients": len(self._clients), "max_clients": self.max_clients}
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_llm_registry():
+    """
+    Returns the process-wide registry, sized from LLM_CLIENTS_MAX.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LLMRegistry(max_clients=int(os.getenv("LLM_CLIENTS_MAX", "32")))
+        return _registry
+
+def get_llm(api_key: str, model: str):
+    return get_llm_registry().get(api_key, model)
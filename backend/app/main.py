@@ -1,16 +1,28 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
-from app.agent import get_agent_response
-from app.eda_agent import get_eda_response
-from app.database import init_db, create_session, get_sessions, add_message, get_chat_history, get_database_url, delete_all_sessions
-from sqlalchemy import create_engine, inspect
+from app.agent import get_agent_response, stream_agent_response
+from app.database import init_db, get_database_url, get_engine, dispose_engines
+from app import async_database, schema_cache
+from app.sandbox import sandbox_stats, shutdown_sandbox_pool
+from app.llm_cache import get_llm_cache
+from app.history_cache import get_history_cache, history_limits
+from app.message_writer import get_message_writer, write_behind_enabled, save_turn, flush_session
+from app.result_cache import get_result_cache
+from app.pagination import page_size
+from app.sql_results import dumps, fetch_page, get_result_handles, max_result_rows
+from app.storage import store_stream, get_workspace_collector
+from app.http_cache import ImmutableStaticFiles, compression_settings, json_with_etag
+from app.warmup import start_warmup, stop_warmup, readiness
+from app.llm_clients import check_model, get_llm_registry
+from app.worker_pool import get_agent_pool, shutdown_agent_pool, PoolSaturated, PipelineTimeout
 from dotenv import load_dotenv
 import os
 import shutil
-import pandas as pd
-import uuid
+import asyncio
+import json
 from contextlib import asynccontextmanager
 
 # Load environment variables
@@ -27,6 +39,15 @@ async def lifespan(app: FastAPI):
     os.makedirs(UPLOADS_DIR, exist_ok=True)
     os.makedirs(PLOTS_DIR, exist_ok=True)
     print(f"Created workspace at {WORKSPACE_DIR}")
+    # Optional write-behind persistence of chat messages
+    if write_behind_enabled():
+        get_message_writer().start()
+    # Background collection of unreferenced uploads and plots
+    collector = get_workspace_collector((UPLOADS_DIR, PLOTS_DIR))
+    if collector.interval > 0:
+        collector.start()
+    # Optional background warm-up (WARMUP=true); /ready reports when it is done
+    start_warmup()
     yield
     # Shutdown: Clean up workspace
     # We DO NOT want to delete the workspace on shutdown because it deletes uploaded files
@@ -35,6 +56,16 @@ async def lifespan(app: FastAPI):
     #     shutil.rmtree(WORKSPACE_DIR)
     #     print(f"Cleaned up workspace at {WORKSPACE_DIR}")
     print("Shutdown: Workspace preserved.")
+    await stop_warmup()
+    await get_workspace_collector().stop()
+    # Write queued chat messages before the connections go away
+    await get_message_writer().drain()
+    # Release pooled database connections
+    dispose_engines()
+    await async_database.dispose_async_engines()
+    # Stop the agent worker pool and the EDA sandbox workers
+    shutdown_agent_pool()
+    shutdown_sandbox_pool()
 
 app = FastAPI(title="LangChain SQL Chat API", lifespan=lifespan)
 
@@ -42,7 +73,11 @@ app = FastAPI(title="LangChain SQL Chat API", lifespan=lifespan)
 # We mount the plots directory specifically
 # Ensure directory exists before mounting to avoid RuntimeError
 os.makedirs(PLOTS_DIR, exist_ok=True)
-app.mount("/static/plots", StaticFiles(directory=PLOTS_DIR), name="static_plots")
+# Plot names are content hashes, so responses are cacheable forever
+app.mount("/static/plots", ImmutableStaticFiles(directory=PLOTS_DIR), name="static_plots")
+
+# Compress large JSON responses (images and SSE streams are left alone)
+app.add_middleware(GZipMiddleware, **compression_settings())
 
 # Configure CORS
 app.add_middleware(
@@ -53,12 +88,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class FastJSONResponse(JSONResponse):
+    # Query results hold dates, decimals and UUIDs; encode them directly
+    # instead of walking every row through jsonable_encoder
+    def render(self, content) -> bytes:
+        return dumps(content).encode("utf-8")
+
 class ChatRequest(BaseModel):
     message: str
     db_uri: str | None = None
     google_api_key: str | None = None
     session_id: int | None = None
     chatId: str | None = None # For compatibility with new frontend spec
+    no_cache: bool = False # Skip the planner response cache for this request
+    model: str | None = None # LLM for this request (default: SQL_CHAT_MODEL)
 
 class EdaChatRequest(BaseModel):
     message: str
@@ -66,6 +109,8 @@ class EdaChatRequest(BaseModel):
     google_api_key: str | None = None
     session_id: int | None = None
     history: list = []
+    no_cache: bool = False
+    model: str | None = None # LLM for this request (default: GEMINI_MODEL)
 
 class InitDbRequest(BaseModel):
     db_uri: str | None = None
@@ -80,66 +125,110 @@ class CreateSessionRequest(BaseModel):
 async def health_check():
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    200 once the warm-up has finished (immediately without WARMUP), else 503.
+    """
+    status = readiness()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/api/pool_stats")
+async def pool_stats():
+    # Queue depth and wait times for sizing AGENT_WORKERS / AGENT_QUEUE_SIZE
+    return get_agent_pool().stats()
+
+@app.get("/api/cache_stats")
+async def cache_stats():
+    return {
+        "dataframes": sandbox_stats(),
+        "llm": get_llm_cache().stats(),
+        "sql_results": get_result_cache().stats(),
+        "history": get_history_cache().stats(),
+        "workspace": get_workspace_collector().stats(),
+        "llm_clients": get_llm_registry().stats()
+    }
+
 @app.post("/api/upload_csv")
 async def upload_csv(file: UploadFile = File(...)):
+    # The EDA stack (pandas, pyarrow) is imported on first use
+    from app.uploads import scan_csv
+    from app.columnar import convert_to_parquet
+    from app.profiling import save_profile
     try:
         # Ensure uploads directory exists (redundant but safe)
         os.makedirs(UPLOADS_DIR, exist_ok=True)
         
-        # Generate unique filename to prevent overwrites
+        # Stored under its content hash in fixed-size blocks, off the event
+        # loop; a file uploaded before is kept once and reused
         file_ext = os.path.splitext(file.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_ext}"
-        file_path = f"{UPLOADS_DIR}/{unique_filename}"
-        
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        stored_name, created = await asyncio.to_thread(store_stream, file.file, UPLOADS_DIR, file_ext)
+        file_path = f"{UPLOADS_DIR}/{stored_name}"
             
-        # Read CSV to get preview
+        # Validate and preview in one streaming pass (bounded memory)
         try:
-            df = pd.read_csv(file_path)
-            # Replace NaN and Infinity with None for JSON compatibility
-            import numpy as np
-            df = df.replace({np.nan: None, np.inf: None, -np.inf: None})
-            
-            preview = df.head(5).to_dict(orient="records")
-            columns = list(df.columns)
+            summary = await asyncio.to_thread(scan_csv, file_path)
+
+            if created:
+                # Columnar copy for fast EDA loads (skipped if pyarrow is missing)
+                await asyncio.to_thread(convert_to_parquet, file_path)
+                # Dataset profile reused by the EDA planner and the frontend
+                await asyncio.to_thread(save_profile, file_path)
             
             return {
-                "filename": unique_filename,
+                "filename": stored_name,
                 "original_filename": file.filename,
-                "columns": columns,
-                "preview": preview,
-                "row_count": len(df)
+                "columns": summary["columns"],
+                "preview": summary["preview"],
+                "row_count": summary["row_count"]
             }
         except Exception as e:
-            # If reading fails, delete the file
-            if os.path.exists(file_path):
+            # If reading fails, delete the file (unless another upload stored it)
+            if created and os.path.exists(file_path):
                 os.remove(file_path)
             raise HTTPException(status_code=400, detail=f"Invalid CSV file: {str(e)}")
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/uploads/{filename}/profile")
+async def get_upload_profile(filename: str):
+    from app.profiling import load_profile
+    try:
+        # Only bare upload names; no paths outside the uploads directory
+        if os.path.basename(filename) != filename:
+            raise HTTPException(status_code=400, detail="Invalid filename")
+        file_path = f"{UPLOADS_DIR}/{filename}"
+        if not os.path.exists(file_path):
+            raise HTTPException(status_code=404, detail="Upload not found")
+        return await asyncio.to_thread(load_profile, file_path)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/eda_chat")
 async def eda_chat(request: EdaChatRequest):
+    from app.eda_agent import get_eda_response
     try:
         api_key = request.google_api_key or os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise HTTPException(status_code=400, detail="Google API Key is required")
+        _check_model(request.model)
             
         db_uri = get_database_url()
         history = []
         if request.session_id and db_uri:
-             history = get_chat_history(db_uri, request.session_id)
+             await flush_session(db_uri, request.session_id)
+             history = await async_database.get_chat_history(db_uri, request.session_id, **history_limits())
         else:
              history = request.history
             
-        response = get_eda_response(request.message, request.filename, api_key, history)
+        # Run the pipeline on the bounded worker pool, off the event loop
+        response = await get_agent_pool().run(get_eda_response, request.message, request.filename, api_key, history, not request.no_cache, request.model)
         
         # Save to history if session_id is provided
         if request.session_id and db_uri:
-            add_message(db_uri, request.session_id, "user", request.message)
-            
             # Serialize the rich response
             import json
             rich_content = {
@@ -147,11 +236,18 @@ async def eda_chat(request: EdaChatRequest):
                 "code": response["code"],
                 "stdout": response["stdout"],
                 "plots": response["plots"],
+                "plot_details": response.get("plot_details", []),
                 "error": response["error"]
             }
-            add_message(db_uri, request.session_id, "assistant", json.dumps(rich_content))
+            await save_turn(db_uri, request.session_id, [("user", request.message), ("assistant", json.dumps(rich_content))])
             
         return response
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PipelineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -161,7 +257,9 @@ async def create_new_session(request: CreateSessionRequest):
         db_uri = request.db_uri or get_database_url()
         if not db_uri:
             raise HTTPException(status_code=400, detail="Database URI required")
-        session_id = create_session(db_uri, request.title, request.session_type, request.filename)
+        # Queued messages go in before retention may delete their sessions
+        await flush_session(db_uri)
+        session_id = await async_database.create_session(db_uri, request.title, request.session_type, request.filename)
         return {
             "id": session_id,  # Standardize on "id" to match get_sessions
             "session_id": session_id, # Keep for backward compat if needed, but primary is id
@@ -173,13 +271,25 @@ async def create_new_session(request: CreateSessionRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/sessions")
-async def list_sessions(db_uri: str | None = None):
+async def list_sessions(http_request: Request, db_uri: str | None = None, limit: int | None = None, cursor: str | None = None, session_type: str | None = None):
+    """
+    Sessions newest first, all of them by default. With limit (or a
+    cursor), one page at a time: pass the returned nextCursor back as
+    cursor for the next page.
+    """
     try:
         uri = db_uri or get_database_url()
         if not uri:
              raise HTTPException(status_code=400, detail="Database URI required")
-        sessions = get_sessions(uri)
-        return {"sessions": sessions}
+        if limit is None and cursor is None:
+            sessions = await async_database.get_sessions(uri, session_type)
+            return json_with_etag(http_request, {"sessions": sessions, "nextCursor": None})
+        sessions, next_cursor = await async_database.get_sessions_page(uri, page_size(limit), cursor, session_type)
+        return json_with_etag(http_request, {"sessions": sessions, "nextCursor": next_cursor})
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -189,47 +299,43 @@ async def clear_all_sessions(db_uri: str | None = None):
         uri = db_uri or get_database_url()
         if not uri:
              raise HTTPException(status_code=400, detail="Database URI required")
-        delete_all_sessions(uri)
+        await flush_session(uri)
+        await async_database.delete_all_sessions(uri)
         return {"status": "History cleared"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/sessions/{session_id}/messages")
-async def get_session_messages(session_id: int, db_uri: str | None = None):
+async def get_session_messages(http_request: Request, session_id: int, db_uri: str | None = None, limit: int | None = None, cursor: str | None = None):
+    """
+    The whole session by default. With limit (or a cursor), the newest page
+    of messages; nextCursor then fetches the page of older messages.
+    """
     try:
         uri = db_uri or get_database_url()
         if not uri:
              raise HTTPException(status_code=400, detail="Database URI required")
-        history = get_chat_history(uri, session_id)
-        return {"messages": history}
+        await flush_session(uri, session_id)
+        if limit is None and cursor is None:
+            messages = await async_database.get_all_messages(uri, session_id)
+            return json_with_etag(http_request, {"messages": messages, "nextCursor": None})
+        messages, next_cursor = await async_database.get_messages_page(uri, session_id, page_size(limit), cursor)
+        return json_with_etag(http_request, {"messages": messages, "nextCursor": next_cursor})
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/schema")
-async def get_database_schema(db_uri: str | None = None):
+async def get_database_schema(http_request: Request, db_uri: str | None = None):
     try:
         uri = db_uri or get_database_url()
         if not uri:
              raise HTTPException(status_code=400, detail="Database URI required")
         
-        engine = create_engine(uri)
-        inspector = inspect(engine)
-        
-        schema_info = {"tables": []}
-        
-        for table_name in inspector.get_table_names():
-            columns = []
-            for column in inspector.get_columns(table_name):
-                columns.append({
-                    "name": column["name"],
-                    "type": str(column["type"])
-                })
-            schema_info["tables"].append({
-                "name": table_name,
-                "columns": columns
-            })
-            
-        return schema_info
+        return json_with_etag(http_request, await async_database.get_schema(uri))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -238,16 +344,13 @@ async def chat(request: ChatRequest):
     try:
         # Use provided values or fallback to environment variables
         api_key = request.google_api_key or os.getenv("GOOGLE_API_KEY")
-        
-        # Set model as requested by user
-        os.environ["GEMINI_MODEL"] = "gemini-2.5-flash-lite-preview-09-2025"
-
         db_uri = request.db_uri or get_database_url()
 
         if not api_key:
             raise HTTPException(status_code=400, detail="Google API Key is required (provide in settings or .env)")
         if not db_uri:
             raise HTTPException(status_code=400, detail="Database URI is required (provide in settings or .env)")
+        _check_model(request.model)
 
         # Handle session_id or chatId
         session_id = request.session_id
@@ -258,28 +361,141 @@ async def chat(request: ChatRequest):
         # Get history if session_id is provided
         history = []
         if session_id:
-            history = get_chat_history(db_uri, session_id)
+            await flush_session(db_uri, session_id)
+            history = await async_database.get_chat_history(db_uri, session_id, **history_limits())
 
         # Get Agent Response (Structured)
-        agent_output = get_agent_response(request.message, db_uri, api_key, history)
+        agent_output = await get_agent_pool().run(get_agent_response, request.message, db_uri, api_key, history, not request.no_cache, request.model)
         
         # agent_output is now a dict: { "sql_query": ..., "results": ..., "answer": ... }
 
         # Save to history if session_id is provided
         if session_id:
-            add_message(db_uri, session_id, "user", request.message)
             # We save the markdown answer to history for context
-            add_message(db_uri, session_id, "assistant", agent_output["answer"])
+            await save_turn(db_uri, session_id, [("user", request.message), ("assistant", agent_output["answer"])])
 
-        return {
+        return FastJSONResponse({
             "sqlQuery": agent_output["sql_query"],
-            "results": agent_output["results"],
+            "results": agent_output.get("results", []),
+            "columns": agent_output.get("columns", []),
+            "truncated": agent_output.get("truncated", False),
+            "resultId": agent_output.get("result_id"),
             "answer": agent_output["answer"],
+            "cached": agent_output.get("cached", False),
             "chatId": str(session_id) if session_id else None
-        }
+        })
+    except HTTPException:
+        raise
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except PipelineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _check_model(model: str | None):
+    try:
+        check_model(model)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _sse(event: str, data):
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Server-sent events version of /api/chat: "plan", then one "query" per
+    executed statement, then responder "token"s, then "done" with the same
+    payload /api/chat returns. Messages are saved once the stream completes.
+    """
+    api_key = request.google_api_key or os.getenv("GOOGLE_API_KEY")
+    db_uri = request.db_uri or get_database_url()
+
+    if not api_key:
+        raise HTTPException(status_code=400, detail="Google API Key is required (provide in settings or .env)")
+    if not db_uri:
+        raise HTTPException(status_code=400, detail="Database URI is required (provide in settings or .env)")
+    _check_model(request.model)
+
+    session_id = request.session_id
+    if request.chatId and request.chatId.isdigit():
+        session_id = int(request.chatId)
+
+    try:
+        history = []
+        if session_id:
+            await flush_session(db_uri, session_id)
+            history = await async_database.get_chat_history(db_uri, session_id, **history_limits())
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    # The pipeline blocks on LLM and SQL calls, so it runs on the agent pool,
+    # holding a worker until the last event; a full pool is refused up front
+    try:
+        pipeline = get_agent_pool().stream(stream_agent_response, request.message, db_uri, api_key, history, use_cache=not request.no_cache, model=request.model)
+    except PoolSaturated as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+    async def events():
+        final = None
+        try:
+            async for event, data in pipeline:
+                if event == "done":
+                    final = data
+                    data = {
+                        "sqlQuery": data["sql_query"],
+                        "results": data["results"],
+                        "columns": data["columns"],
+                        "truncated": data["truncated"],
+                        "resultId": data["result_id"],
+                        "answer": data["answer"],
+                        "cached": data["cached"],
+                        "chatId": str(session_id) if session_id else None
+                    }
+                yield _sse(event, data)
+        except PipelineTimeout as e:
+            # Headers are already sent; the deadline is reported in-stream
+            yield _sse("error", {"message": str(e)})
+            return
+
+        # Persist only after the full answer has been streamed
+        if session_id and final is not None:
+            await save_turn(db_uri, session_id, [("user", request.message), ("assistant", final["answer"])])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/api/results/{result_id}")
+async def get_result_page(result_id: str, offset: int = 0, limit: int = 0):
+    """
+    Further pages of a large query result. result_id comes from /api/chat
+    ("resultId"); handles expire after RESULT_HANDLE_TTL seconds.
+    """
+    handle = get_result_handles().get(result_id)
+    if handle is None:
+        raise HTTPException(status_code=404, detail="Result not found or expired")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+
+    db_uri, query = handle
+    limit = min(limit, max_result_rows()) if limit > 0 else max_result_rows()
+    try:
+        page = await asyncio.to_thread(fetch_page, get_engine(db_uri), query, offset, limit)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return FastJSONResponse({
+        "resultId": result_id,
+        "columns": page["columns"],
+        "results": page["rows"],
+        "offset": offset,
+        "nextOffset": offset + len(page["rows"]) if page["has_more"] else None
+    })
+
 @app.post("/init-db")
 async def initialize_database(request: InitDbRequest):
     try:
@@ -288,6 +504,7 @@ async def initialize_database(request: InitDbRequest):
              raise HTTPException(status_code=400, detail="Database URI is required")
              
         init_db(db_uri)
+        schema_cache.invalidate(db_uri)
         return {"status": "Database initialized and seeded successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
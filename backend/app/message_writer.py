@@ -0,0 +1,191 @@
+from app import async_database
+from app.history_cache import get_history_cache
+import asyncio
+import os
+import threading
+
+# Write-Behind Message Persistence
+# With MESSAGE_WRITE_BEHIND=true, chat turns are queued instead of written on
+# the request path. A background task inserts them in batches (multi-row
+# INSERTs of up to MESSAGE_BATCH_SIZE rows per database) every
+# MESSAGE_FLUSH_INTERVAL seconds, or sooner once MESSAGE_BATCH_SIZE messages
+# are waiting. A failed batch is retried session by session, so the rows of
+# a deleted session cannot hold back the others. The history cache is
+# updated at enqueue time, readers of a session flush its pending messages
+# first, and the FastAPI lifespan drains the queue on shutdown. Messages
+# still queued when the process dies are lost, so the interval bounds the
+# exposure.
+
+MAX_ATTEMPTS = 3
+
+class MessageWriter:
+    def __init__(self, batch_size: int, interval: float):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending = []  # (db_uri, session_id, role, content, attempts), in arrival order
+        self._inflight = []  # taken by the flush in progress
+        self._flush_lock = None
+        self._wakeup = None
+        self._task = None
+        self._stopping = False
+        self._stats = {"queued": 0, "written": 0, "batches": 0, "failures": 0, "dropped": 0}
+
+    def start(self):
+        """
+        Starts the background flusher; call from the running event loop.
+        """
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    @property
+    def running(self):
+        return self._task is not None
+
+    def enqueue(self, db_uri: str, session_id: int, messages):
+        """
+        Queues messages (role, content) of a session, in order.
+        """
+        cache = get_history_cache()
+        for role, content in messages:
+            self._pending.append((db_uri, session_id, role, content, 0))
+            cache.append(db_uri, session_id, [{"role": role, "content": content}])
+        self._stats["queued"] += len(messages)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def has_pending(self, db_uri: str, session_id: int = None):
+        return any(
+            item[0] == db_uri and (session_id is None or item[1] == session_id)
+            for item in self._pending + self._inflight
+        )
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        """
+        Writes everything queued so far. One flush at a time, so once this
+        returns, earlier enqueues are committed (or requeued after a failure).
+        """
+        if self._flush_lock is None:
+            return
+        async with self._flush_lock:
+            batch, self._pending = self._pending, []
+            if not batch:
+                return
+            self._inflight = batch
+            by_database = {}
+            for item in batch:
+                by_database.setdefault(item[0], []).append(item)
+
+            failed = []
+            for db_uri, items in by_database.items():
+                # At most batch_size rows per INSERT, within the drivers' bind parameter limits
+                for start in range(0, len(items), self.batch_size):
+                    failed.extend(await self._write(db_uri, items[start:start + self.batch_size]))
+            # Retry failed rows ahead of anything queued meanwhile
+            self._pending = failed + self._pending
+            self._inflight = []
+
+    async def _write(self, db_uri: str, items):
+        """
+        Inserts items and returns those to retry. When the multi-row INSERT
+        fails, each session's rows are inserted on their own, so a bad row
+        (say, of a session deleted meanwhile) only holds back its session.
+        """
+        sessions = {}
+        for item in items:
+            sessions.setdefault(item[1], []).append(item)
+        try:
+            await self._insert(db_uri, items)
+            return []
+        except Exception as e:
+            self._stats["failures"] += 1
+            if len(sessions) == 1:
+                return self._retry(items, e)
+            print(f"Message batch failed, writing its {len(sessions)} sessions separately: {e}")
+
+        failed = []
+        for session_items in sessions.values():
+            try:
+                await self._insert(db_uri, session_items)
+            except Exception as e:
+                self._stats["failures"] += 1
+                failed.extend(self._retry(session_items, e))
+        return failed
+
+    async def _insert(self, db_uri: str, items):
+        await async_database.insert_messages(db_uri, [item[1:4] for item in items])
+        self._stats["written"] += len(items)
+        self._stats["batches"] += 1
+
+    def _retry(self, items, error):
+        retry = [(*item[:4], item[4] + 1) for item in items if item[4] + 1 < MAX_ATTEMPTS]
+        self._stats["dropped"] += len(items) - len(retry)
+        print(f"Message write failed ({len(retry)} of {len(items)} messages will be retried): {error}")
+        return retry
+
+    async def drain(self):
+        """
+        Stops the background task and writes what is left.
+        """
+        if self._task is None:
+            return
+        # Let a flush in progress finish rather than cancelling it mid-insert
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        await self.flush()
+        if self._pending:
+            print(f"Shutdown: {len(self._pending)} queued messages could not be written")
+
+    def stats(self):
+        return {**self._stats, "pending": len(self._pending), "running": self.running}
+
+_writer = None
+_writer_lock = threading.Lock()
+
+def write_behind_enabled():
+    return os.getenv("MESSAGE_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+
+def get_message_writer():
+    """
+    Returns the process-wide writer, configured from MESSAGE_BATCH_SIZE and
+    MESSAGE_FLUSH_INTERVAL (seconds).
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = MessageWriter(
+                batch_size=int(os.getenv("MESSAGE_BATCH_SIZE", "100")),
+                interval=float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.5")),
+            )
+        return _writer
+
+async def save_turn(db_uri: str, session_id: int, messages):
+    """
+    Persists the messages (role, content) of one turn: queued when the
+    write-behind writer is running, otherwise one multi-row INSERT now.
+    """
+    writer = get_message_writer()
+    if writer.running:
+        writer.enqueue(db_uri, session_id, messages)
+    else:
+        await async_database.add_messages(db_uri, [(session_id, role, content) for role, content in messages])
+
+async def flush_session(db_uri: str, session_id: int = None):
+    """
+    Makes queued messages of a session (or database) visible to readers.
+    """
+    writer = get_message_writer()
+    if writer.running and writer.has_pending(db_uri, session_id):
+        await writer.flush()
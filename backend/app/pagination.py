@@ -0,0 +1,38 @@
+from datetime import datetime
+import base64
+import json
+import os
+
+# Keyset Pagination
+# Listings are ordered by (created_at, id) and a page continues strictly
+# after the last row of the previous one, so every page is an index range
+# scan no matter how deep the client pages. Cursors are opaque to clients:
+# base64 JSON of the last row's created_at and id.
+
+def page_size(limit: int = None):
+    """
+    The page size to use: limit if given, capped at PAGE_SIZE_MAX, else PAGE_SIZE.
+    """
+    max_size = int(os.getenv("PAGE_SIZE_MAX", "200"))
+    if limit is None or limit <= 0:
+        return min(int(os.getenv("PAGE_SIZE", "50")), max_size)
+    return min(limit, max_size)
+
+def encode_cursor(created_at, row_id: int):
+    # Drivers return datetimes (Postgres) or the stored text (SQLite); keep which
+    if isinstance(created_at, datetime):
+        value = {"t": created_at.isoformat(), "dt": True, "id": row_id}
+    else:
+        value = {"t": created_at, "id": row_id}
+    return base64.urlsafe_b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """
+    Returns (created_at, id) from a cursor. Raises ValueError if malformed.
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        created_at = datetime.fromisoformat(value["t"]) if value.get("dt") else value["t"]
+        return created_at, int(value["id"])
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
@@ -0,0 +1,99 @@
+from app.storage import store_file
+import os
+import uuid
+
+# Plot Post-Processing
+# Runs inside the sandbox workers, never in the API process. Figures are
+# bounded at save time (PLOT_MAX_DPI, PLOT_MAX_INCHES), then each saved
+# image is re-encoded (WebP, or optimized PNG) and given a small thumbnail
+# for the chat view. The full image is only fetched when the user opens it.
+# Plots are stored under their content hash (see app/storage.py).
+
+def plot_settings():
+    return {
+        "max_dpi": float(os.getenv("PLOT_MAX_DPI", "100")),
+        "max_inches": float(os.getenv("PLOT_MAX_INCHES", "12")),
+        "format": os.getenv("PLOT_FORMAT", "webp").lower(),
+        "quality": int(os.getenv("PLOT_WEBP_QUALITY", "80")),
+        "thumb_px": int(os.getenv("PLOT_THUMB_PX", "320")),
+    }
+
+def bound_savefig(max_dpi: float, max_inches: float):
+    """
+    Patches matplotlib's Figure.savefig (which plt.savefig calls) so no
+    figure is written above max_dpi or with a side longer than max_inches.
+    """
+    from matplotlib.figure import Figure
+
+    original = Figure.savefig
+
+    def savefig(self, *args, **kwargs):
+        dpi = kwargs.get("dpi")
+        if dpi is None or dpi == "figure":
+            dpi = self.dpi
+        kwargs["dpi"] = min(float(dpi), max_dpi)
+        width, height = self.get_size_inches()
+        if max(width, height) > max_inches:
+            scale = max_inches / max(width, height)
+            self.set_size_inches(width * scale, height * scale)
+        return original(self, *args, **kwargs)
+
+    Figure.savefig = savefig
+
+def _encode(image, path: str, fmt: str, quality: int):
+    if fmt == "webp":
+        image.save(path, "WEBP", quality=quality, method=4)
+    else:
+        image.save(path, "PNG", optimize=True)
+
+def output_format(requested: str):
+    # Fall back to PNG where Pillow was built without WebP
+    if requested == "webp":
+        from PIL import features
+        return "webp" if features.check("webp") else "png"
+    return "png"
+
+def process_plot(path: str, plots_dir: str, settings):
+    """
+    Re-encodes the image at path into plots_dir with a thumbnail and removes
+    the original. Returns {"url", "thumbnail", "width", "height", "bytes"}.
+    """
+    from PIL import Image
+
+    fmt = output_format(settings["format"])
+    with Image.open(path) as image:
+        image.load()
+    # Images written without savefig (e.g. by PIL) are bounded here instead
+    max_px = int(settings["max_dpi"] * settings["max_inches"])
+    if max(image.size) > max_px:
+        image.thumbnail((max_px, max_px))
+    if fmt == "webp" and image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    encoded = os.path.join(os.path.dirname(path), f"encoded_{uuid.uuid4()}.{fmt}")
+    _encode(image, encoded, fmt, settings["quality"])
+    # Lossy WebP is not worth it when it comes out larger than the PNG
+    if fmt == "webp" and os.path.getsize(encoded) >= os.path.getsize(path):
+        os.remove(encoded)
+        fmt = "png"
+        encoded = os.path.splitext(encoded)[0] + ".png"
+        _encode(image, encoded, fmt, settings["quality"])
+    os.remove(path)
+
+    name, created = store_file(encoded, plots_dir, f".{fmt}", prefix="plot_")
+    stem = name.rsplit(".", 1)[0]
+    thumb_path = os.path.join(plots_dir, f"{stem}_thumb.{fmt}")
+    if created or not os.path.exists(thumb_path):
+        thumb = image.copy()
+        thumb.thumbnail((settings["thumb_px"], settings["thumb_px"]))
+        partial = os.path.join(plots_dir, f".{uuid.uuid4()}.partial")
+        _encode(thumb, partial, fmt, settings["quality"])
+        os.replace(partial, thumb_path)
+
+    return {
+        "url": f"/static/plots/{name}",
+        "thumbnail": f"/static/plots/{stem}_thumb.{fmt}",
+        "width": image.width,
+        "height": image.height,
+        "bytes": os.path.getsize(os.path.join(plots_dir, name)),
+    }
@@ -0,0 +1,275 @@
+import json
+import math
+import os
+import numpy as np
+import pandas as pd
+from app import columnar
+from app.columnar import upload_source
+
+# Dataset Profiles
+# A per-column summary computed once at upload time and stored next to the
+# upload as <name>.profile.json. The EDA planner reads it instead of running
+# df.info()/df.head() every turn, and the frontend gets it from
+# /api/uploads/{filename}/profile.
+#
+# Profiles are built in one pass over the upload's Parquet row groups (or
+# CSV chunks), so memory stays flat whatever the file size. Counts, min, max,
+# mean and std are exact. Distinct counts, quantiles, histograms and top
+# categories are exact up to the sketch sizes below and estimates beyond:
+# distinct counts from the smallest value hashes (KMV), quantiles and
+# histograms from a uniform sample of each numeric column, top categories
+# from a bounded counter.
+
+PROFILE_VERSION = 1
+TOP_CATEGORIES = 5
+HISTOGRAM_BINS = 10
+QUANTILES = (0.25, 0.5, 0.75)
+SAMPLE_ROWS = 5
+BATCH_ROWS = 65536
+DISTINCT_SKETCH_SIZE = 8192
+NUMERIC_SAMPLE_SIZE = 16384
+CATEGORY_CAPACITY = 4096
+
+def profile_path(csv_path: str):
+    return os.path.splitext(csv_path)[0] + ".profile.json"
+
+def _json_value(value):
+    """Converts numpy/pandas scalars to JSON-safe Python values."""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return str(value)
+    return value
+
+def _is_numeric(dtype):
+    return pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+
+def _merge_dtype(first, second):
+    # The dtype one read of the whole column would have inferred
+    if first is None or first == second:
+        return second
+    if _is_numeric(first) and _is_numeric(second):
+        return np.dtype("float64")
+    return np.dtype(object)
+
+class ColumnProfiler:
+    """
+    Streaming summary of one column, fed one batch (a pd.Series) at a time.
+    With fixed_dtype=False (CSV chunks, whose inferred types can differ from
+    chunk to chunk) numbers are also counted as categories, in case a later
+    chunk turns the column into text.
+    """
+    def __init__(self, name, fixed_dtype: bool = True):
+        self.name = str(name)
+        self.fixed_dtype = fixed_dtype
+        self.dtype = None
+        self.null_count = 0
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.numbers = np.empty(0)
+        self.number_keys = np.empty(0)
+        self.categories = {}
+        self._rng = np.random.default_rng(0)
+
+    def update(self, series: pd.Series):
+        values = series.dropna()
+        self.null_count += len(series) - len(values)
+        if not len(values):
+            # An all-missing column still reports the dtype a reader gives it
+            if self.count == 0:
+                self.dtype = series.dtype
+            return
+        self.dtype = _merge_dtype(self.dtype if self.count else None, series.dtype)
+        self.count += len(values)
+
+        numeric = _is_numeric(series.dtype)
+        if numeric:
+            self._update_range(values)
+            self._update_numbers(values.to_numpy(dtype="float64"))
+        elif pd.api.types.is_datetime64_any_dtype(series.dtype):
+            self._update_range(values)
+        if not numeric or not self.fixed_dtype:
+            self._update_categories(values)
+        # Numbers hash alike whether a chunk read them as int or float
+        hashes = pd.util.hash_pandas_object(values.astype("float64" if numeric else str), index=False)
+        self.hashes = np.union1d(self.hashes, hashes.to_numpy())[:DISTINCT_SKETCH_SIZE]
+
+    def _update_range(self, values):
+        low, high = values.min(), values.max()
+        self.min = low if self.min is None or low < self.min else self.min
+        self.max = high if self.max is None or high > self.max else self.max
+
+    def _update_numbers(self, numbers):
+        # Chan et al.'s pairwise update of the running mean and sum of squares
+        seen, n = self.count - len(numbers), len(numbers)
+        batch_mean = numbers.mean()
+        delta = batch_mean - self.mean
+        self.mean += delta * n / self.count
+        self.m2 += ((numbers - batch_mean) ** 2).sum() + delta ** 2 * seen * n / self.count
+        # The values with the smallest random keys are a uniform sample of all seen so far
+        keys = np.concatenate([self.number_keys, self._rng.random(n)])
+        numbers = np.concatenate([self.numbers, numbers])
+        if len(keys) > NUMERIC_SAMPLE_SIZE:
+            keep = np.argpartition(keys, NUMERIC_SAMPLE_SIZE)[:NUMERIC_SAMPLE_SIZE]
+            keys, numbers = keys[keep], numbers[keep]
+        self.number_keys, self.numbers = keys, numbers
+
+    def _update_categories(self, values):
+        for value, count in values.astype(str).value_counts().items():
+            self.categories[value] = self.categories.get(value, 0) + int(count)
+        if len(self.categories) > CATEGORY_CAPACITY:
+            # Keep the most frequent half; counts of rarer values restart from zero
+            top = sorted(self.categories.items(), key=lambda item: item[1], reverse=True)
+            self.categories = dict(top[:CATEGORY_CAPACITY // 2])
+
+    def distinct(self):
+        if len(self.hashes) < DISTINCT_SKETCH_SIZE:
+            return len(self.hashes)
+        # The k-th smallest of the hashes, spread uniformly over [0, 2^64)
+        return int(round((DISTINCT_SKETCH_SIZE - 1) * 2.0 ** 64 / float(self.hashes[-1])))
+
+    def _histogram(self):
+        counts, edges = np.histogram(self.numbers, bins=HISTOGRAM_BINS, range=(float(self.min), float(self.max)))
+        if len(self.numbers) < self.count:
+            # Scale the sample's counts up to the column, keeping their sum exact
+            scaled = counts * self.count / len(self.numbers)
+            counts = np.floor(scaled).astype(int)
+            counts[np.argsort(counts - scaled)[:self.count - counts.sum()]] += 1
+        return counts, edges
+
+    def result(self):
+        profile = {
+            "name": self.name,
+            "dtype": str(self.dtype),
+            "null_count": self.null_count,
+            "distinct": self.distinct(),
+        }
+        if _is_numeric(self.dtype):
+            if self.count:
+                counts, edges = self._histogram()
+                profile.update({
+                    "min": _json_value(self.min),
+                    "max": _json_value(self.max),
+                    "mean": _json_value(self.mean),
+                    "std": _json_value(math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else None),
+                    "quantiles": {str(q): _json_value(np.quantile(self.numbers, q)) for q in QUANTILES},
+                    "histogram": {
+                        "bin_edges": [_json_value(edge) for edge in edges],
+                        "counts": [int(count) for count in counts],
+                    },
+                })
+        elif pd.api.types.is_datetime64_any_dtype(self.dtype):
+            if self.count:
+                profile.update({"min": _json_value(self.min), "max": _json_value(self.max)})
+        else:
+            top = sorted(self.categories.items(), key=lambda item: item[1], reverse=True)[:TOP_CATEGORIES]
+            profile["top_categories"] = [{"value": value, "count": count} for value, count in top]
+        return profile
+
+def profile_column(series: pd.Series):
+    profiler = ColumnProfiler(series.name)
+    profiler.update(series)
+    return profiler.result()
+
+def _batches(source: str):
+    if source.endswith(".parquet"):
+        for batch in columnar.pq.ParquetFile(source).iter_batches(batch_size=BATCH_ROWS):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(source, chunksize=BATCH_ROWS)
+
+def build_profile(csv_path: str):
+    """
+    Profiles an upload in one pass over its Parquet copy when available,
+    otherwise over the CSV in chunks. Returns a JSON-serialisable dict.
+    """
+    source = upload_source(csv_path)
+    parquet = source.endswith(".parquet")
+    if parquet:
+        head = columnar.pq.ParquetFile(source).schema_arrow.empty_table().to_pandas()
+    else:
+        head = pd.read_csv(source, nrows=0)
+    profilers = [ColumnProfiler(column, fixed_dtype=parquet) for column in head.columns]
+
+    row_count, samples = 0, []
+    for batch in _batches(source):
+        if row_count < SAMPLE_ROWS:
+            samples.append(batch.head(SAMPLE_ROWS - row_count))
+        row_count += len(batch)
+        for profiler, column in zip(profilers, batch.columns):
+            profiler.update(batch[column])
+    if samples:
+        head = pd.concat(samples)
+
+    columns = []
+    for profiler, column in zip(profilers, head.columns):
+        if profiler.dtype is None:
+            profiler.dtype = head[column].dtype
+        columns.append(profiler.result())
+
+    sample = head.astype(object).where(head.notna(), None)
+    return {
+        "version": PROFILE_VERSION,
+        "row_count": row_count,
+        "column_count": len(columns),
+        "columns": columns,
+        "sample": [{key: _json_value(value) for key, value in row.items()} for row in sample.to_dict(orient="records")],
+    }
+
+def save_profile(csv_path: str):
+    profile = build_profile(csv_path)
+    target = profile_path(csv_path)
+    with open(target + ".partial", "w") as f:
+        json.dump(profile, f)
+    os.replace(target + ".partial", target)
+    return profile
+
+def load_profile(csv_path: str):
+    """
+    Returns the stored profile, (re)building it for uploads that predate
+    profiling or whose CSV changed since.
+    """
+    target = profile_path(csv_path)
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(csv_path):
+        with open(target) as f:
+            profile = json.load(f)
+        if profile.get("version") == PROFILE_VERSION:
+            return profile
+    return save_profile(csv_path)
+
+def _format_number(value):
+    if isinstance(value, float):
+        return f"{value:.4g}"
+    return str(value)
+
+def format_profile(profile):
+    """
+    Renders a profile as compact text for the planner prompt.
+    """
+    lines = [f"Shape: ({profile['row_count']}, {profile['column_count']})", "", "Columns:"]
+    for column in profile["columns"]:
+        line = f"- {column['name']} ({column['dtype']}): {column['null_count']} nulls, {column['distinct']} distinct"
+        if "quantiles" in column:
+            quartiles = "/".join(_format_number(v) for v in column["quantiles"].values())
+            line += (
+                f", min {_format_number(column['min'])}, max {_format_number(column['max'])}"
+                f", mean {_format_number(column['mean'])}, p25/p50/p75 {quartiles}"
+            )
+        elif "min" in column:
+            line += f", min {column['min']}, max {column['max']}"
+        if column.get("top_categories"):
+            top = ", ".join(f"{c['value']} ({c['count']})" for c in column["top_categories"])
+            line += f", top: {top}"
+        lines.append(line)
+
+    if profile["sample"]:
+        lines += ["", "Head:", pd.DataFrame(profile["sample"]).to_string()]
+    return "\n".join(lines)
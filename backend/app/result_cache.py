@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from app.sql_results import dumps, is_read_only
+import os
+import re
+import threading
+import time
+
+# SQL Result Cache
+# Results of read-only statements run by the agent, keyed by database URI
+# and normalized SQL. Any other statement the agent runs on the same URI
+# clears that URI's entries; writes made outside the app are covered by a
+# TTL (RESULT_CACHE_TTL, with per-table overrides in RESULT_CACHE_TABLE_TTLS,
+# e.g. "orders=5,students=300").
+
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+(\"?[A-Za-z_][\w.\"]*)", re.IGNORECASE)
+# String literals and quoted identifiers, with doubled quotes as escapes
+QUOTED_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+def normalize_sql(query: str):
+    # Whitespace is collapsed outside quotes only: 'a  b' and 'a b' are different values
+    parts = QUOTED_PATTERN.split(query.strip())
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts)).rstrip(";").strip()
+
+def referenced_tables(query: str):
+    return {name.split(".")[-1].strip('"').lower() for name in TABLE_PATTERN.findall(query)}
+
+def _table_ttls():
+    ttls = {}
+    for item in os.getenv("RESULT_CACHE_TABLE_TTLS", "").split(","):
+        if "=" in item:
+            table, seconds = item.split("=", 1)
+            ttls[table.strip().lower()] = float(seconds)
+    return ttls
+
+class ResultCache:
+    def __init__(self, max_bytes: int, ttl: float, table_ttls: dict):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.table_ttls = table_ttls
+        self._entries = OrderedDict()  # (db_uri, sql) -> (expires_at, result, nbytes)
+        self._lock = threading.Lock()
+        self._total_bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def _entry_ttl(self, query: str):
+        # The shortest TTL among the tables the statement reads
+        ttls = [self.table_ttls[t] for t in referenced_tables(query) if t in self.table_ttls]
+        return min(ttls + [self.ttl])
+
+    def get(self, db_uri: str, query: str):
+        key = (db_uri, normalize_sql(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[0]:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1]
+            if entry is not None:
+                self._remove(key)
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, db_uri: str, query: str, result):
+        ttl = self._entry_ttl(query)
+        # Encoded size tracks the row data, unlike a shallow getsizeof
+        nbytes = len(dumps(result))
+        if ttl <= 0 or nbytes > self.max_bytes:
+            return
+        key = (db_uri, normalize_sql(query))
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + ttl, result, nbytes)
+            self._total_bytes += nbytes
+            while self._total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        _, _, nbytes = self._entries.pop(key)
+        self._total_bytes -= nbytes
+
+    def invalidate(self, db_uri: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == db_uri]:
+                self._remove(key)
+            self._stats["invalidations"] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_result_cache():
+    """
+    Returns the process-wide cache, configured from RESULT_CACHE_MAX_MB,
+    RESULT_CACHE_TTL and RESULT_CACHE_TABLE_TTLS.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache(
+                max_bytes=int(float(os.getenv("RESULT_CACHE_MAX_MB", "64")) * 1024 * 1024),
+                ttl=float(os.getenv("RESULT_CACHE_TTL", "60")),
+                table_ttls=_table_ttls(),
+            )
+        return _cache
@@ -0,0 +1,318 @@
+import multiprocessing
+import os
+import threading
+import time
+
+# EDA Sandbox Pool
+# Generated EDA code runs in a pool of warm worker processes instead of the
+# API process. Workers import pandas, numpy, seaborn and matplotlib (Agg)
+# once at startup and keep recently used DataFrames resident, so a session's
+# follow-up questions skip both the imports and the load. Each task runs in
+# its own temporary directory with a fresh namespace, and the plots it saves
+# are post-processed in the worker (app.plots). The parent enforces a
+# wall-clock timeout per task; a worker that overruns, crashes or exits is
+# killed and replaced, and the API keeps going.
+#
+# Memory: once its imports are done, each worker limits its own address
+# space (RLIMIT_AS) to its startup size plus SANDBOX_MEMORY_MB, so an
+# oversized allocation fails with MemoryError inside the task. The parent
+# also polls resident memory and kills a worker above SANDBOX_MEMORY_MB, as
+# a backstop where RLIMIT_AS is unavailable. The worker's DataFrame cache
+# (DF_CACHE_MAX_MB) lives inside that budget, together with the task's
+# private copy of its frame and whatever the code allocates, so keep
+# DF_CACHE_MAX_MB well under half of SANDBOX_MEMORY_MB.
+
+def _limit_address_space(memory_mb: float):
+    # Unix only; elsewhere the parent's RSS poll is the only limit
+    try:
+        import resource
+    except ImportError:
+        return
+    current = _status_mb(os.getpid(), "VmSize")
+    if current is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    limit = int((current + memory_mb) * 1024 * 1024)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+def _worker_main(conn, plots_dir: str, memory_mb: float):
+    """
+    Worker process loop: receives {"source", "code"}, replies with
+    {"stdout", "error", "plots", "plot_details", "frames"}.
+    """
+    import contextlib
+    import io
+    import tempfile
+    import traceback
+
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    import numpy as np
+    import pandas as pd
+    import seaborn as sns
+
+    from app.columnar import read_upload
+    from app.dataframe_cache import get_dataframe_cache
+    from app.plots import bound_savefig, plot_settings, process_plot
+
+    settings = plot_settings()
+    bound_savefig(settings["max_dpi"], settings["max_inches"])
+    # Sized from DF_CACHE_MAX_MB, per worker
+    frames = get_dataframe_cache()
+    home = os.getcwd()
+    # After the imports, so only what tasks allocate counts against the limit
+    _limit_address_space(memory_mb)
+    conn.send({"ready": True})
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+
+        results = {"stdout": "", "error": None, "plots": [], "plot_details": []}
+        output_buffer = io.StringIO()
+        with tempfile.TemporaryDirectory() as temp_dir:
+            try:
+                # Each task gets a private copy of the resident frame
+                df = frames.get(task["source"], loader=read_upload)
+                # The working directory belongs to this process alone
+                os.chdir(temp_dir)
+                with contextlib.redirect_stdout(output_buffer):
+                    namespace = {"df": df, "pd": pd, "plt": plt, "sns": sns, "np": np, "print": print}
+                    exec(task["code"], namespace)
+
+                for filename in sorted(os.listdir(temp_dir)):
+                    if filename.lower().endswith(".png"):
+                        plot = process_plot(os.path.join(temp_dir, filename), plots_dir, settings)
+                        results["plots"].append(plot["url"])
+                        results["plot_details"].append(plot)
+            except MemoryError:
+                results["error"] = f"Execution exceeded the {memory_mb:g} MB memory limit"
+                results["memory_exceeded"] = True
+            except Exception as e:
+                results["error"] = f"{str(e)}\n{traceback.format_exc()}"
+            finally:
+                os.chdir(home)
+                # Figures left open would leak into the next task
+                plt.close("all")
+        results["stdout"] = output_buffer.getvalue()
+        results["frames"] = frames.stats()
+        conn.send(results)
+
+def _status_mb(pid: int, field: str):
+    # A size from /proc/<pid>/status (Linux), e.g. VmRSS; None where unavailable
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith(f"{field}:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def _rss_mb(pid: int):
+    return _status_mb(pid, "VmRSS")
+
+class _Worker:
+    def __init__(self, context, plots_dir: str, memory_mb: float):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, plots_dir, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+        self.sources = []  # most recent last
+
+    def wait_ready(self, timeout: float):
+        if self.ready:
+            return True
+        if self.conn.poll(timeout):
+            try:
+                self.ready = self.conn.recv().get("ready", False)
+            except EOFError:
+                return False
+        return self.ready
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+class SandboxPool:
+    def __init__(self, size: int, timeout: float, memory_mb: float, plots_dir: str):
+        self.size = size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.plots_dir = os.path.abspath(plots_dir)
+        os.makedirs(self.plots_dir, exist_ok=True)
+        # spawn: never fork the API process with its threads and event loop
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = [self._spawn() for _ in range(size)]
+        self._busy = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {"completed": 0, "timeouts": 0, "memory_errors": 0, "memory_kills": 0, "crashes": 0}
+        self._frames = {}  # worker pid -> its DataFrame cache stats after the last task
+        # Lookup counters of replaced workers, so the totals don't go backwards
+        self._retired_frames = {"hits": 0, "misses": 0, "evictions": 0}
+
+    def _spawn(self):
+        return _Worker(self._context, self.plots_dir, self.memory_mb)
+
+    def _acquire(self, source: str):
+        with self._condition:
+            while not self._idle and not self._closed:
+                self._condition.wait()
+            if self._closed:
+                raise RuntimeError("Sandbox pool is shut down")
+            # Prefer a worker that already holds this session's frame
+            worker = next((w for w in self._idle if source in w.sources), self._idle[0])
+            self._idle.remove(worker)
+            self._busy += 1
+            return worker
+
+    def _release(self, worker):
+        with self._condition:
+            self._busy -= 1
+            if self._closed:
+                worker.kill()
+            else:
+                self._idle.append(worker)
+            self._condition.notify()
+
+    def _replace(self, worker, stat: str):
+        worker.kill()
+        with self._condition:
+            self._stats[stat] += 1
+            frames = self._frames.pop(worker.process.pid, None)
+            if frames is not None:
+                for counter in self._retired_frames:
+                    self._retired_frames[counter] += frames[counter]
+        return self._spawn()
+
+    def run(self, source: str, code: str):
+        """
+        Runs code against the DataFrame loaded from source (see
+        columnar.upload_source) in a worker. Returns {"stdout", "error",
+        "plots", "plot_details"}; limits and crashes are reported in "error".
+        """
+        source = os.path.abspath(source)
+        worker = self._acquire(source)
+        try:
+            # A freshly replaced worker may still be importing
+            if not worker.wait_ready(timeout=120):
+                worker = self._replace(worker, "crashes")
+                return {"stdout": "", "error": "Sandbox worker failed to start", "plots": [], "plot_details": []}
+
+            worker.conn.send({"source": source, "code": code})
+            deadline = time.monotonic() + self.timeout
+            results = None
+            while results is None:
+                exited = False
+                if worker.conn.poll(0.1):
+                    try:
+                        results = worker.conn.recv()
+                        continue
+                    except EOFError:
+                        exited = True
+                if exited or not worker.process.is_alive():
+                    worker = self._replace(worker, "crashes")
+                    return {"stdout": "", "error": "Sandbox worker exited while running the code", "plots": [], "plot_details": []}
+                if time.monotonic() > deadline:
+                    worker = self._replace(worker, "timeouts")
+                    return {"stdout": "", "error": f"Execution timed out after {self.timeout:g}s", "plots": [], "plot_details": []}
+                rss = _rss_mb(worker.process.pid)
+                if rss is not None and rss > self.memory_mb:
+                    worker = self._replace(worker, "memory_kills")
+                    return {"stdout": "", "error": f"Execution exceeded the {self.memory_mb:g} MB memory limit", "plots": [], "plot_details": []}
+
+            worker.sources = [s for s in worker.sources if s != source] + [source]
+            with self._condition:
+                self._frames[worker.process.pid] = results.pop("frames")
+                self._stats["completed"] += 1
+                if results.pop("memory_exceeded", False):
+                    self._stats["memory_errors"] += 1
+            return results
+        finally:
+            self._release(worker)
+
+    def warm(self, timeout: float):
+        """
+        Waits until the idle workers have finished starting (imports, font
+        cache). Returns how many are ready.
+        """
+        with self._condition:
+            workers, self._idle = self._idle, []
+            self._busy += len(workers)
+        ready = 0
+        try:
+            for worker in workers:
+                ready += worker.wait_ready(timeout)
+        finally:
+            for worker in workers:
+                self._release(worker)
+        return ready
+
+    def stats(self):
+        with self._condition:
+            frames = list(self._frames.values())
+            lookups = {counter: total + sum(f[counter] for f in frames) for counter, total in self._retired_frames.items()}
+            requests = lookups["hits"] + lookups["misses"]
+            return {
+                **self._stats,
+                "workers": self.size,
+                "busy": self._busy,
+                "resident_frames": sum(f["entries"] for f in frames),
+                "resident_mb": round(sum(f["bytes"] for f in frames) / 1024 / 1024, 1),
+                **lookups,
+                "hit_rate": round(lookups["hits"] / requests, 3) if requests else 0.0,
+            }
+
+    def shutdown(self):
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._condition.notify_all()
+        for worker in idle:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            worker.kill()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_sandbox_pool():
+    """
+    Returns the process-wide pool, started on first use and configured from
+    SANDBOX_WORKERS, SANDBOX_TIMEOUT (seconds) and SANDBOX_MEMORY_MB.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(
+                size=int(os.getenv("SANDBOX_WORKERS", "2")),
+                timeout=float(os.getenv("SANDBOX_TIMEOUT", "60")),
+                memory_mb=float(os.getenv("SANDBOX_MEMORY_MB", "2048")),
+                plots_dir="workspace/plots",
+            )
+        return _pool
+
+def sandbox_stats():
+    # None until the first EDA request starts the pool
+    return _pool.stats() if _pool is not None else None
+
+def shutdown_sandbox_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
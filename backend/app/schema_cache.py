@@ -0,0 +1,72 @@
+from collections import OrderedDict
+import os
+import re
+import threading
+import time
+
+# Schema Cache
+# Reflection results keyed by database URI, shared by the SQL planner and
+# /api/schema. Entries expire after SCHEMA_CACHE_TTL seconds and are dropped
+# as soon as the agent runs DDL against the same URI. Pruned table_info is
+# keyed by table set, so the cache is an LRU capped at
+# SCHEMA_CACHE_MAX_ENTRIES and expired entries are swept on every write.
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+DDL_PATTERN = re.compile(r"^\s*(CREATE|ALTER|DROP|RENAME|COMMENT)\b", re.IGNORECASE)
+
+def _ttl():
+    return float(os.getenv("SCHEMA_CACHE_TTL", "300"))
+
+def _max_entries():
+    return int(os.getenv("SCHEMA_CACHE_MAX_ENTRIES", "256"))
+
+def get_cached(db_uri: str, kind: str):
+    """
+    Returns the cached value for (db_uri, kind), or None if missing or expired.
+    """
+    with _cache_lock:
+        entry = _cache.get((db_uri, kind))
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if time.monotonic() >= expires_at:
+            del _cache[(db_uri, kind)]
+            return None
+        _cache.move_to_end((db_uri, kind))
+        return value
+
+def set_cached(db_uri: str, kind: str, value):
+    now = time.monotonic()
+    with _cache_lock:
+        for key in [key for key, (expires_at, _) in _cache.items() if expires_at <= now]:
+            del _cache[key]
+        _cache[(db_uri, kind)] = (now + _ttl(), value)
+        _cache.move_to_end((db_uri, kind))
+        while len(_cache) > _max_entries():
+            _cache.popitem(last=False)
+    return value
+
+def get_or_load(db_uri: str, kind: str, loader):
+    """
+    Returns the cached value, calling loader() to fill the cache on a miss.
+    """
+    value = get_cached(db_uri, kind)
+    if value is None:
+        value = set_cached(db_uri, kind, loader())
+    return value
+
+def invalidate(db_uri: str = None):
+    """
+    Drops every cached entry for db_uri (or the whole cache if None).
+    """
+    with _cache_lock:
+        if db_uri is None:
+            _cache.clear()
+            return
+        for key in [key for key in _cache if key[0] == db_uri]:
+            del _cache[key]
+
+def is_ddl(query: str):
+    return bool(DDL_PATTERN.match(query))
@@ -0,0 +1,147 @@
+from sqlalchemy import inspect
+from collections import Counter
+import math
+import os
+import re
+
+# Schema Index
+# A local BM25 index over table names, column names and comments, used to
+# send the planner only the tables relevant to a question (plus their
+# foreign-key neighbours) instead of the whole database.
+
+K1 = 1.5
+B = 0.75
+
+# Rough prompt cost of one table in get_table_info() output:
+# CREATE TABLE header + one line per column + sample rows
+TABLE_BASE_TOKENS = 20
+COLUMN_TOKENS = 12
+
+def pruning_settings():
+    return {
+        "enabled": os.getenv("SCHEMA_PRUNING", "true").lower() in ("1", "true", "yes"),
+        "top_k": int(os.getenv("SCHEMA_TOP_K", "8")),
+        "token_budget": int(os.getenv("SCHEMA_TOKEN_BUDGET", "4000")),
+    }
+
+def tokenize(text: str):
+    """
+    Splits identifiers and prose into lowercase terms:
+    'studentMarks', 'student_marks' and 'Student marks' all give ['student', 'mark'].
+    """
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text or "")
+    terms = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        # Crude plural folding so 'students' matches 'student'
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+class SchemaIndex:
+    def __init__(self, tables):
+        """
+        tables: {name: {"columns": [...], "comment": str, "column_comments": [...], "references": set}}
+        """
+        self.tables = tables
+        self.neighbours = {name: set() for name in tables}
+        for name, info in tables.items():
+            for target in info["references"]:
+                if target in self.neighbours:
+                    self.neighbours[name].add(target)
+                    self.neighbours[target].add(name)
+
+        self.documents = {}
+        for name, info in tables.items():
+            # Table name terms are repeated to weight them above column names
+            terms = tokenize(name) * 3
+            for column in info["columns"]:
+                terms += tokenize(column)
+            terms += tokenize(info["comment"])
+            for comment in info["column_comments"]:
+                terms += tokenize(comment)
+            self.documents[name] = Counter(terms)
+
+        self.doc_lengths = {name: sum(doc.values()) for name, doc in self.documents.items()}
+        self.avg_length = (sum(self.doc_lengths.values()) / len(self.documents)) if self.documents else 0
+        document_frequency = Counter()
+        for doc in self.documents.values():
+            document_frequency.update(doc.keys())
+        n = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def rank(self, query: str):
+        """
+        Returns [(table, score)] for tables matching the query, best first.
+        """
+        terms = tokenize(query)
+        scores = []
+        for name, doc in self.documents.items():
+            score = 0.0
+            length_norm = K1 * (1 - B + B * self.doc_lengths[name] / self.avg_length)
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (K1 + 1) / (tf + length_norm)
+            if score > 0:
+                scores.append((name, score))
+        scores.sort(key=lambda item: (-item[1], item[0]))
+        return scores
+
+    def table_tokens(self, name: str):
+        return TABLE_BASE_TOKENS + COLUMN_TOKENS * len(self.tables[name]["columns"])
+
+    def select_tables(self, query: str, top_k: int, token_budget: int):
+        """
+        Picks the top_k ranked tables, then tables one foreign key away from
+        them, stopping once the estimated prompt cost reaches token_budget.
+        Falls back to every table when nothing matches.
+        """
+        ranked = [name for name, _ in self.rank(query)][:top_k]
+        if not ranked:
+            return sorted(self.tables)
+
+        candidates = list(ranked)
+        for name in ranked:
+            for neighbour in sorted(self.neighbours[name]):
+                if neighbour not in candidates:
+                    candidates.append(neighbour)
+
+        selected = []
+        used = 0
+        for name in candidates:
+            cost = self.table_tokens(name)
+            # Always keep the best match, even if it alone is over budget
+            if selected and used + cost > token_budget:
+                continue
+            selected.append(name)
+            used += cost
+        return selected
+
+def build_schema_index(engine, ignore_tables=()):
+    """
+    Reflects names, columns, comments and foreign keys for every table using
+    SQLAlchemy's multi-table reflection (a handful of queries in total).
+    """
+    inspector = inspect(engine)
+    columns = inspector.get_multi_columns()
+    foreign_keys = inspector.get_multi_foreign_keys()
+    try:
+        comments = inspector.get_multi_table_comment()
+    except NotImplementedError:
+        comments = {}
+
+    tables = {}
+    for (schema, name), table_columns in columns.items():
+        if name in ignore_tables:
+            continue
+        tables[name] = {
+            "columns": [column["name"] for column in table_columns],
+            "column_comments": [column.get("comment") or "" for column in table_columns],
+            "comment": (comments.get((schema, name)) or {}).get("text") or "",
+            "references": {fk["referred_table"] for fk in foreign_keys.get((schema, name), [])},
+        }
+    return SchemaIndex(tables)
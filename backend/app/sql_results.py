@@ -0,0 +1,145 @@
+from sqlalchemy import text
+from collections import OrderedDict
+from decimal import Decimal
+import datetime
+import json
+import os
+import re
+import threading
+import time
+import uuid
+
+# Typed Result Sets
+# Agent queries run directly on the engine and keep native Python values
+# (column names + row lists) instead of SQLDatabase.run's repr() string.
+# dumps() encodes dates, decimals and UUIDs; orjson is used when installed.
+# Read-only queries run on server-side cursors and only the first page is
+# fetched; the rest of the result is reachable through a short-lived handle
+# that re-runs the statement one LIMIT/OFFSET page at a time.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+READ_ONLY_PATTERN = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+# SELECT ... INTO creates a table; locking reads and data-modifying CTEs write
+WRITE_PATTERN = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|INTO|FOR\s+UPDATE|FOR\s+SHARE)\b", re.IGNORECASE)
+
+def is_read_only(query: str):
+    return bool(READ_ONLY_PATTERN.match(query)) and not WRITE_PATTERN.search(query)
+
+def max_result_rows():
+    return int(os.getenv("RESULT_MAX_ROWS", "1000"))
+
+def _default(value):
+    if isinstance(value, Decimal):
+        # As a string so money and NUMERIC(38, x) values keep every digit
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    return str(value)
+
+def dumps(obj, indent: bool = False):
+    """
+    Serialises obj to a JSON string, handling dates, decimals and UUIDs.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        return orjson.dumps(obj, default=_default, option=option).decode("utf-8")
+    return json.dumps(obj, default=_default, indent=2 if indent else None)
+
+def _fetch(engine, query: str, max_rows: int):
+    # stream_results asks the driver for a server-side cursor, so only the
+    # rows we fetch are ever transferred (a no-op on SQLite, which is lazy
+    # anyway). psycopg2 opens those as DECLARE ... CURSOR FOR, which only
+    # takes a query, so other statements run on a plain cursor.
+    with engine.begin() as connection:
+        if is_read_only(query):
+            connection = connection.execution_options(stream_results=True, yield_per=max_rows + 1)
+        result = connection.execute(text(query))
+        if not result.returns_rows:
+            return [], []
+        columns = list(result.keys())
+        # One extra row tells us whether there is more to page through
+        rows = [list(row) for row in result.fetchmany(max_rows + 1)]
+        result.close()
+    return columns, rows
+
+def run_query(engine, query: str, max_rows: int = None):
+    """
+    Executes query in its own transaction. Returns the first page as a
+    result set dict: {"columns": [...], "rows": [[...], ...], "row_count": n,
+    "truncated": bool}, with at most max_rows rows fetched ("truncated"
+    means more rows exist); statements without rows give empty columns and rows.
+    """
+    max_rows = max_rows or max_result_rows()
+    columns, rows = _fetch(engine, query, max_rows)
+    truncated = len(rows) > max_rows
+    rows = rows[:max_rows]
+    return {"columns": columns, "rows": rows, "row_count": len(rows), "truncated": truncated}
+
+def fetch_page(engine, query: str, offset: int, limit: int):
+    """
+    One page of a read-only query's rows, re-executed with LIMIT/OFFSET.
+    Pages are only stable if the query has an ORDER BY.
+    """
+    # One extra row tells us whether another page follows
+    paged = f"SELECT * FROM ({query.strip().rstrip(';')}) AS result_page LIMIT {int(limit) + 1} OFFSET {int(offset)}"
+    columns, rows = _fetch(engine, paged, limit)
+    has_more = len(rows) > limit
+    return {"columns": columns, "rows": rows[:limit], "has_more": has_more}
+
+class ResultHandles:
+    """
+    Short-lived handles to large read-only results: result_id -> (db_uri, query).
+    Only the statement is kept, never the rows.
+    """
+    def __init__(self, ttl: float, max_handles: int):
+        self.ttl = ttl
+        self.max_handles = max_handles
+        self._handles = OrderedDict()  # result_id -> (expires_at, db_uri, query)
+        self._lock = threading.Lock()
+
+    def register(self, db_uri: str, query: str):
+        result_id = uuid.uuid4().hex
+        with self._lock:
+            self._handles[result_id] = (time.monotonic() + self.ttl, db_uri, query)
+            while len(self._handles) > self.max_handles:
+                self._handles.popitem(last=False)
+        return result_id
+
+    def get(self, result_id: str):
+        """
+        Returns (db_uri, query), or None if the handle is unknown or expired.
+        """
+        with self._lock:
+            entry = self._handles.get(result_id)
+            if entry is None:
+                return None
+            if time.monotonic() >= entry[0]:
+                del self._handles[result_id]
+                return None
+            return entry[1], entry[2]
+
+_handles = None
+_handles_lock = threading.Lock()
+
+def get_result_handles():
+    """
+    Returns the process-wide handle registry, configured from
+    RESULT_HANDLE_TTL (seconds) and RESULT_HANDLE_MAX.
+    """
+    global _handles
+    with _handles_lock:
+        if _handles is None:
+            _handles = ResultHandles(
+                ttl=float(os.getenv("RESULT_HANDLE_TTL", "600")),
+                max_handles=int(os.getenv("RESULT_HANDLE_MAX", "256")),
+            )
+        return _handles
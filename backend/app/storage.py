@@ -0,0 +1,245 @@
+import asyncio
+import glob
+import hashlib
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+# Workspace Storage
+# Uploads and plots are stored under the hash of their content, so the same
+# file uploaded (or plotted) twice is kept once. References come from the
+# database: chat_sessions.filename names an upload, and plot URLs appear in
+# the chat_messages of EDA sessions. A background collector deletes files
+# nothing refers to (once older than STORAGE_GC_GRACE, so a fresh upload is
+# safe until its session is created) and then evicts the least recently
+# used files until the workspace fits STORAGE_QUOTA_MB.
+#
+# A stored file and its derived files (an upload's Parquet copy and profile,
+# a plot's thumbnail) share a stem and are kept or deleted together. Each
+# partial write (.<uuid>.partial) is a unit of its own, removed once older
+# than the grace period and never evicted for quota before that.
+
+BLOCK_SIZE = 1024 * 1024
+PLOT_NAME_PATTERN = re.compile(r"/static/plots/([\w.-]+)")
+
+def storage_settings():
+    return {
+        "interval": float(os.getenv("STORAGE_GC_INTERVAL", "600")),
+        "grace": float(os.getenv("STORAGE_GC_GRACE", "3600")),
+        "quota_bytes": int(float(os.getenv("STORAGE_QUOTA_MB", "2048")) * 1024 * 1024),
+    }
+
+def _content_name(digest: str, ext: str, prefix: str):
+    return f"{prefix}{digest[:32]}{ext.lower()}"
+
+def _commit(partial: str, directory: str, name: str):
+    # An identical file is already stored: keep it and drop the new copy
+    target = os.path.join(directory, name)
+    if os.path.exists(target):
+        os.remove(partial)
+        _refresh(directory, name)
+        return name, False
+    os.replace(partial, target)
+    return name, True
+
+def store_stream(source, directory: str, ext: str, prefix: str = ""):
+    """
+    Copies a binary file object into directory under its content hash, in
+    fixed-size blocks. Returns (name, created); created is False when an
+    identical file was already stored.
+    """
+    digest = hashlib.sha256()
+    partial = os.path.join(directory, f".{uuid.uuid4()}.partial")
+    try:
+        with open(partial, "wb") as out:
+            for block in iter(lambda: source.read(BLOCK_SIZE), b""):
+                digest.update(block)
+                out.write(block)
+    except BaseException:
+        os.remove(partial)
+        raise
+    return _commit(partial, directory, _content_name(digest.hexdigest(), ext, prefix))
+
+def store_file(path: str, directory: str, ext: str, prefix: str = ""):
+    """
+    Moves the file at path into directory under its content hash.
+    Returns (name, created) like store_stream.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b""):
+            digest.update(block)
+    partial = os.path.join(directory, f".{uuid.uuid4()}.partial")
+    # path may be on another filesystem (a task's temporary directory)
+    shutil.move(path, partial)
+    return _commit(partial, directory, _content_name(digest.hexdigest(), ext, prefix))
+
+def mark_used(path: str):
+    # Last use is the access time; the modification time is left alone
+    # because upload_source and load_profile compare mtimes
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+def _refresh(directory: str, name: str):
+    # Stored again: restart the grace period of the file and its derived
+    # files. They all get the same time, so derived files stay as new as
+    # their source for upload_source and load_profile.
+    now = time.time()
+    stem = _stem(name)
+    for path in glob.glob(os.path.join(glob.escape(directory), glob.escape(stem) + "*")):
+        if _stem(os.path.basename(path)) == stem:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+def _stem(name: str):
+    # "abc.csv", "abc.parquet", "abc.profile.json" -> "abc";
+    # "plot_abc.webp", "plot_abc_thumb.webp" -> "plot_abc"
+    return name.split(".", 1)[0].removesuffix("_thumb")
+
+def _units(directory: str):
+    units = {}
+    for entry in os.scandir(directory):
+        partial = entry.name.startswith(".") and entry.name.endswith(".partial")
+        if not entry.is_file() or (entry.name.startswith(".") and not partial):
+            continue
+        stat = entry.stat()
+        # Partial writes (in progress, or left by a crash) are never referenced
+        key = entry.name if partial else _stem(entry.name)
+        unit = units.setdefault(key, {"paths": [], "bytes": 0, "created": stat.st_mtime, "used": 0, "partial": partial})
+        unit["paths"].append((entry.path, stat.st_size))
+        unit["bytes"] += stat.st_size
+        unit["created"] = min(unit["created"], stat.st_mtime)
+        unit["used"] = max(unit["used"], stat.st_atime, stat.st_mtime)
+    return units
+
+def referenced_names(filenames, contents):
+    """
+    Stems referenced by session filenames and by plot URLs in message contents.
+    """
+    stems = {_stem(name) for name in filenames if name}
+    for content in contents:
+        stems.update(_stem(name) for name in PLOT_NAME_PATTERN.findall(content or ""))
+    return stems
+
+def collect(directories, referenced, quota_bytes: int, grace: float, now: float = None):
+    """
+    Deletes unreferenced files older than grace seconds, then least
+    recently used files until the directories fit quota_bytes (0 = no
+    quota). referenced=None skips the first step. Returns counts.
+    """
+    now = now or time.time()
+    units = []
+    for directory in directories:
+        units.extend(_units(directory).items())
+
+    stats = {"unreferenced": 0, "evicted": 0, "freed_bytes": 0}
+    kept = []
+    for stem, unit in units:
+        if referenced is not None and stem not in referenced and now - unit["created"] > grace:
+            stats["unreferenced"] += 1
+            stats["freed_bytes"] += _delete(unit)
+        else:
+            kept.append(unit)
+
+    total = sum(unit["bytes"] for unit in kept)
+    if quota_bytes > 0 and total > quota_bytes:
+        for unit in sorted(kept, key=lambda u: u["used"]):
+            if total <= quota_bytes:
+                break
+            # A young partial is a write still in progress
+            if unit["partial"] and now - unit["created"] <= grace:
+                continue
+            total -= unit["bytes"]
+            stats["evicted"] += 1
+            stats["freed_bytes"] += _delete(unit)
+    stats["bytes"] = total
+    return stats
+
+def _delete(unit):
+    freed = 0
+    for path, size in unit["paths"]:
+        try:
+            os.remove(path)
+            freed += size
+        except FileNotFoundError:
+            pass
+    return freed
+
+class WorkspaceCollector:
+    def __init__(self, directories, interval: float, grace: float, quota_bytes: int):
+        self.directories = directories
+        self.interval = interval
+        self.grace = grace
+        self.quota_bytes = quota_bytes
+        self._task = None
+        self._stats = {"runs": 0, "unreferenced": 0, "evicted": 0, "freed_bytes": 0, "bytes": None, "last_error": None}
+
+    def start(self):
+        """
+        Starts the periodic collection; call from the running event loop.
+        """
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception as e:
+                self._stats["last_error"] = str(e)
+                print(f"Workspace collection failed: {e}")
+
+    async def run_once(self):
+        from app import async_database
+        from app.database import get_database_url
+        from app.message_writer import flush_session
+
+        db_uri = get_database_url()
+        referenced = None
+        # A failed reference lookup raises, so that run deletes nothing
+        if db_uri:
+            # Queued messages may hold the only reference to a new plot
+            await flush_session(db_uri)
+            filenames, contents = await async_database.get_workspace_references(db_uri)
+            referenced = referenced_names(filenames, contents)
+        result = await asyncio.to_thread(collect, self.directories, referenced, self.quota_bytes, self.grace)
+        self._stats["runs"] += 1
+        for key in ("unreferenced", "evicted", "freed_bytes"):
+            self._stats[key] += result[key]
+        self._stats["bytes"] = result["bytes"]
+        self._stats["last_error"] = None
+        return result
+
+    def stats(self):
+        return {**self._stats, "quota_bytes": self.quota_bytes, "running": self._task is not None}
+
+_collector = None
+_collector_lock = threading.Lock()
+
+def get_workspace_collector(directories=("workspace/uploads", "workspace/plots")):
+    """
+    Returns the process-wide collector, configured from STORAGE_GC_INTERVAL
+    and STORAGE_GC_GRACE (seconds) and STORAGE_QUOTA_MB (0 = no quota).
+    """
+    global _collector
+    with _collector_lock:
+        if _collector is None:
+            settings = storage_settings()
+            _collector = WorkspaceCollector(list(directories), settings["interval"], settings["grace"], settings["quota_bytes"])
+        return _collector
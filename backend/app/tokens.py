@@ -0,0 +1,7 @@
+# Token Estimates
+# Prompt sizes for the schema, history and context budgets, without
+# downloading a tokenizer.
+
+def estimate_tokens(text: str):
+    # ~4 characters per token for English/SQL; no tokenizer download needed
+    return len(text) // 4 + 1
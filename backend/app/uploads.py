@@ -0,0 +1,39 @@
+import os
+import numpy as np
+import pandas as pd
+
+# Upload Validation
+# Uploaded CSVs are checked in one streaming pass of fixed-size chunks, so
+# peak memory depends on UPLOAD_CHUNK_ROWS rather than on the file size.
+
+PREVIEW_ROWS = 5
+
+def _chunk_rows():
+    return int(os.getenv("UPLOAD_CHUNK_ROWS", "50000"))
+
+def scan_csv(file_path: str, chunksize: int = None):
+    """
+    Parses file_path chunk by chunk (raising on malformed input) and returns
+    the column names, a JSON-safe preview from the first chunk and the row count.
+    """
+    columns = None
+    preview = []
+    row_count = 0
+
+    with pd.read_csv(file_path, chunksize=chunksize or _chunk_rows()) as reader:
+        for chunk in reader:
+            if columns is None:
+                columns = list(chunk.columns)
+                # Replace NaN and Infinity with None for JSON compatibility
+                head = chunk.head(PREVIEW_ROWS).replace({np.nan: None, np.inf: None, -np.inf: None})
+                preview = head.to_dict(orient="records")
+            row_count += len(chunk)
+
+    if columns is None:
+        raise ValueError("CSV file has no header row")
+
+    return {
+        "columns": columns,
+        "preview": preview,
+        "row_count": row_count
+    }
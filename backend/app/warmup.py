@@ -0,0 +1,106 @@
+from sqlalchemy import text
+import asyncio
+import os
+import time
+
+# Warm-up
+# The heavy subsystems (langchain, pandas, pyarrow, matplotlib) are imported
+# on first use, so a worker process starts serving in under a second. With
+# WARMUP=true the lifespan also starts a background warm-up that pays those
+# costs before traffic arrives: imports, the matplotlib font cache, the
+# sandbox workers, the agent threads and a database connection. GET /ready
+# answers 503 until it has finished, for load balancer readiness checks;
+# without WARMUP the app is ready as soon as it starts.
+
+_state = {"enabled": False, "done": False, "seconds": None, "steps": {}, "errors": {}}
+_task = None
+
+def warmup_enabled():
+    return os.getenv("WARMUP", "false").lower() in ("1", "true", "yes")
+
+def _import_subsystems():
+    import app.eda_agent
+    import app.uploads
+    import app.profiling
+    import app.columnar
+    import langchain_google_genai
+    import langchain_community.utilities
+
+def _build_font_cache():
+    # The first matplotlib import in a fresh environment scans the system
+    # fonts; the result is cached on disk and shared with the sandbox workers
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib import font_manager
+    font_manager.findfont("DejaVu Sans")
+
+def _start_sandbox():
+    from app.sandbox import get_sandbox_pool
+    pool = get_sandbox_pool()
+    ready = pool.warm(timeout=60)
+    if ready < pool.size:
+        raise RuntimeError(f"{pool.size - ready} of {pool.size} sandbox workers failed to start")
+
+async def _connect_database():
+    from app import async_database
+    from app.database import get_database_url
+    async with async_database.get_async_engine(get_database_url()).connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+async def _step(name, fn):
+    from app.worker_pool import get_agent_pool
+    started = time.perf_counter()
+    try:
+        if asyncio.iscoroutinefunction(fn):
+            await fn()
+        else:
+            # On the agent pool, which starts its threads along the way
+            await get_agent_pool().run(fn)
+    except Exception as e:
+        _state["errors"][name] = str(e)
+        print(f"Warm-up step {name} failed: {e}")
+    _state["steps"][name] = round(time.perf_counter() - started, 3)
+
+async def run_warmup():
+    """
+    Runs the warm-up steps concurrently. A failed step is reported by
+    readiness() but does not stop the others or keep the app unready.
+    """
+    started = time.perf_counter()
+    steps = [("imports", _import_subsystems), ("font_cache", _build_font_cache), ("sandbox", _start_sandbox)]
+    # The steps are independent, so they run concurrently
+    await asyncio.gather(*(_step(name, fn) for name, fn in steps), _step("database", _connect_database))
+    _state["seconds"] = round(time.perf_counter() - started, 3)
+    _state["done"] = True
+    print(f"Warm-up finished in {_state['seconds']}s")
+
+def start_warmup():
+    """
+    Starts the warm-up in the background if WARMUP is set; call from the
+    running event loop.
+    """
+    global _task
+    _state["enabled"] = warmup_enabled()
+    if not _state["enabled"]:
+        _state["done"] = True
+        return
+    _task = asyncio.create_task(run_warmup())
+
+async def stop_warmup():
+    global _task
+    if _task is not None and not _task.done():
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+    _task = None
+
+def readiness():
+    return {
+        "ready": _state["done"],
+        "warmup": _state["enabled"],
+        "seconds": _state["seconds"],
+        "steps": dict(_state["steps"]),
+        "errors": dict(_state["errors"]),
+    }
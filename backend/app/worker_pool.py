@@ -0,0 +1,233 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import threading
+import time
+
+# Agent pipelines (two blocking LLM calls plus SQL or pandas work) run on a
+# bounded thread pool instead of the event loop. Requests beyond
+# workers + queue size are rejected immediately so callers can back off.
+# Streaming pipelines (stream) hold their worker until the stream ends.
+
+class PoolSaturated(Exception):
+    """Raised when the admission queue is full."""
+
+class PipelineTimeout(Exception):
+    """Raised when a pipeline misses its deadline (queued or running)."""
+
+_END = object()
+
+class AgentPool:
+    def __init__(self, max_workers: int, max_queue: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="agent")
+        self._lock = threading.Lock()
+        self._admitted = 0
+        self._running = 0
+        self._started = 0
+        # Every admitted run ends as exactly one of completed, failed or timed_out
+        self._stats = {
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+        }
+
+    def _admit(self):
+        with self._lock:
+            if self._admitted >= self.max_workers + self.max_queue:
+                self._stats["rejected"] += 1
+                raise PoolSaturated("Server is busy, please retry shortly.")
+            self._admitted += 1
+
+    def _start(self, submitted):
+        started = time.monotonic()
+        wait_ms = (started - submitted) * 1000
+        with self._lock:
+            self._running += 1
+            self._started += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+        return started
+
+    def _finish(self):
+        with self._lock:
+            self._running -= 1
+            self._admitted -= 1
+
+    def _settle(self, run, outcome: str):
+        # The first of the worker and the waiting caller to get here decides
+        # how the run is counted; returns the outcome that was recorded
+        with self._lock:
+            if run["outcome"] is None:
+                run["outcome"] = outcome
+                self._stats[outcome] += 1
+            return run["outcome"]
+
+    def _ended(self, run, error):
+        if isinstance(error, PipelineTimeout):
+            return self._settle(run, "timed_out")
+        return self._settle(run, "failed" if error is not None else "completed")
+
+    def _deadline_error(self):
+        return PipelineTimeout(f"Request exceeded the {self.timeout:g}s deadline.")
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Runs fn(*args, **kwargs) on the pool and awaits its result.
+        Raises PoolSaturated when the queue is full and PipelineTimeout
+        when the deadline passes.
+        """
+        self._admit()
+        submitted = time.monotonic()
+        deadline = submitted + self.timeout
+        run = {"outcome": None}
+
+        def task():
+            started = self._start(submitted)
+            error = None
+            try:
+                # Don't start work whose caller has already given up
+                if started >= deadline:
+                    raise PipelineTimeout("Request expired while waiting in queue.")
+                return fn(*args, **kwargs)
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                self._finish()
+                self._ended(run, error)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, task)
+        try:
+            # Shielded so a queued task is never cancelled out from under the
+            # admission counter; it runs, sees the expired deadline and exits.
+            return await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            if self._settle(run, "timed_out") == "timed_out":
+                # Nobody awaits the task any more; retrieve its exception so
+                # asyncio doesn't log "Future exception was never retrieved"
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                raise self._deadline_error()
+            # Finished just as the deadline passed
+            return await future
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Starts the generator fn(*args, **kwargs) on the pool and returns an
+        async iterator over what it yields. Raises PoolSaturated right away
+        when the queue is full; iterating raises PipelineTimeout once the
+        deadline passes. The worker is held until the generator finishes,
+        the deadline passes or the consumer stops iterating.
+        """
+        self._admit()
+        submitted = time.monotonic()
+        deadline = submitted + self.timeout
+        run = {"outcome": None}
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stop = threading.Event()
+
+        def put(item, error=None):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, (item, error))
+            except RuntimeError:
+                pass  # the event loop is gone, and with it the consumer
+
+        def task():
+            started = self._start(submitted)
+            error = None
+            try:
+                if started >= deadline:
+                    raise PipelineTimeout("Request expired while waiting in queue.")
+                generator = fn(*args, **kwargs)
+                try:
+                    for item in generator:
+                        put(item)
+                        # Free the worker once nobody is listening
+                        if stop.is_set():
+                            break
+                        if time.monotonic() >= deadline:
+                            raise self._deadline_error()
+                finally:
+                    generator.close()
+            except Exception as e:
+                error = e
+            finally:
+                self._finish()
+                self._ended(run, error)
+            put(_END, error)
+
+        # Submitted here, not on first iteration, so the admission is
+        # released even if the response is never iterated
+        self._executor.submit(task)
+        return self._iterate(run, items, stop, deadline)
+
+    async def _iterate(self, run, items, stop, deadline):
+        try:
+            while True:
+                try:
+                    item, error = await asyncio.wait_for(items.get(), timeout=max(deadline - time.monotonic(), 0))
+                except asyncio.TimeoutError:
+                    self._settle(run, "timed_out")
+                    raise self._deadline_error()
+                if item is _END:
+                    if error is not None:
+                        raise error
+                    return
+                yield item
+        finally:
+            stop.set()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            running = self._running
+            queued = self._admitted - self._running
+            started = self._started
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout_seconds": self.timeout,
+            "running": running,
+            "queue_depth": queued,
+            "completed": stats["completed"],
+            "failed": stats["failed"],
+            "rejected": stats["rejected"],
+            "timed_out": stats["timed_out"],
+            "avg_wait_ms": round(stats["total_wait_ms"] / started, 2) if started else 0.0,
+            "max_wait_ms": round(stats["max_wait_ms"], 2),
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_agent_pool():
+    """
+    Returns the process-wide pool, sized from AGENT_WORKERS,
+    AGENT_QUEUE_SIZE and AGENT_TIMEOUT.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = AgentPool(
+                max_workers=int(os.getenv("AGENT_WORKERS", "4")),
+                max_queue=int(os.getenv("AGENT_QUEUE_SIZE", "16")),
+                timeout=float(os.getenv("AGENT_TIMEOUT", "120")),
+            )
+        return _pool
+
+def shutdown_agent_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None
@@ -0,0 +1,69 @@
+"""
+Benchmark: CSV vs Parquet load time and resident memory for EDA uploads.
+
+Scales ../data.csv up to the requested number of rows, converts it with
+app.columnar.convert_to_parquet, then loads each file in a fresh subprocess
+so peak RSS reflects only that load.
+
+Usage: python bench_columnar.py [rows ...]   (default: 1000000 3000000)
+"""
+from app.columnar import convert_to_parquet, read_upload
+from memory_usage import peak_rss_mb
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SOURCE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data.csv")
+
+def scale_csv(target_path, rows):
+    with open(SOURCE_CSV, encoding="utf-8-sig") as f:
+        header, *body = f.read().splitlines()
+    with open(target_path, "w") as out:
+        out.write(header + "\n")
+        written = 0
+        while written < rows:
+            chunk = body[: rows - written]
+            out.write("\n".join(chunk) + "\n")
+            written += len(chunk)
+
+def measure_load(path):
+    """Runs in a subprocess: prints load seconds and RSS growth in MB."""
+    import pandas  # noqa: F401  (import cost excluded from the measurement)
+    import pyarrow.parquet  # noqa: F401
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    df = read_upload(path)
+    elapsed = time.perf_counter() - start
+    peak = peak_rss_mb()
+    print(f"{elapsed:.3f} {peak - before:.1f} {df.memory_usage(deep=True).sum() / 1024 / 1024:.1f}")
+
+def run_child(path):
+    output = subprocess.run(
+        [sys.executable, __file__, "--measure", path],
+        capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), float(output[1]), float(output[2])
+
+def main(row_counts):
+    print(f"{'rows':>10} {'format':<8} {'file MB':>8} {'load s':>8} {'peak RSS MB':>12} {'frame MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in row_counts:
+            csv_path = os.path.join(tmp, f"data_{rows}.csv")
+            scale_csv(csv_path, rows)
+            start = time.perf_counter()
+            parquet_path = convert_to_parquet(csv_path)
+            convert_seconds = time.perf_counter() - start
+
+            for label, path in (("csv", csv_path), ("parquet", parquet_path)):
+                seconds, rss_mb, frame_mb = run_child(path)
+                size_mb = os.path.getsize(path) / 1024 / 1024
+                print(f"{rows:>10} {label:<8} {size_mb:>8.1f} {seconds:>8.3f} {rss_mb:>12.1f} {frame_mb:>9.1f}")
+            print(f"{'':>10} (one-off conversion at upload: {convert_seconds:.2f}s)")
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "--measure":
+        measure_load(sys.argv[2])
+    else:
+        main([int(arg) for arg in sys.argv[1:]] or [1_000_000, 3_000_000])
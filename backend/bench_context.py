@@ -0,0 +1,90 @@
+"""
+Benchmark: planner history tokens, raw concatenation vs context_builder.
+
+For every turn of every session, compares the history block the planners
+used to build (each message appended verbatim) with
+build_history_context, summed over the session. Token counts use the same
+local estimate as the builder (tokens.estimate_tokens).
+
+Usage:
+  python bench_context.py                  # synthetic SQL and EDA sessions
+  python bench_context.py <database URI>   # sessions recorded in chat_messages
+"""
+from app.context_builder import build_history_context
+from app.tokens import estimate_tokens
+from sqlalchemy import create_engine, text
+import json
+import sys
+
+def raw_history_context(history):
+    # The planners' previous formatting
+    if not history:
+        return ""
+    context = "Previous conversation history:\n"
+    for msg in history:
+        role = "User" if msg["role"] == "user" else "Assistant"
+        context += f"{role}: {msg['content']}\n"
+    return context
+
+def synthetic_sessions():
+    def eda_turn(i):
+        return [
+            {"role": "user", "content": f"Show the distribution of column_{i} and summarize it"},
+            {"role": "assistant", "content": json.dumps({
+                "answer": f"The histogram of column_{i} is right-skewed with a median of {i * 3}. ![plot](/static/plots/{i:032x}.png)",
+                "code": f"plt.figure()\nsns.histplot(df['column_{i}'])\nprint(df['column_{i}'].describe())\nplt.savefig('hist.png')\nplt.clf()",
+                "stdout": df_describe(i) + ("\n" + "\n".join(f"{n}    {n * 0.37:.4f}" for n in range(120)) if i % 3 == 0 else ""),
+                "plots": [f"/static/plots/{i:032x}.png"],
+                "error": None if i % 4 else "Traceback (most recent call last):\n" + "".join(
+                    f'  File "/usr/lib/python3/site-packages/pandas/core/frame.py", line {n}, in __getitem__\n    indexer = self.columns.get_loc(key)\n'
+                    for n in range(12)
+                ) + f"KeyError: 'column_{i}'",
+            })},
+        ]
+
+    def sql_turn(i):
+        return [
+            {"role": "user", "content": f"Which students in section {chr(65 + i % 3)} scored above {50 + i}?"},
+            {"role": "assistant", "content": "| Name | Marks |\n|---|---|\n" + "".join(f"| Student {n} | {60 + n} |\n" for n in range(8))},
+        ]
+
+    sessions = {}
+    for turns in (5, 10, 20):
+        sessions[f"eda-{turns}-turns"] = [msg for i in range(turns) for msg in eda_turn(i)]
+        sessions[f"sql-{turns}-turns"] = [msg for i in range(turns) for msg in sql_turn(i)]
+    return sessions
+
+def df_describe(i):
+    return "\n".join(f"{stat:<6} {value:>10.3f}" for stat, value in (
+        ("count", 1000), ("mean", i * 3.1), ("std", i * 1.2), ("min", 0), ("25%", i), ("50%", i * 3), ("75%", i * 5), ("max", i * 9)
+    ))
+
+def recorded_sessions(db_uri):
+    engine = create_engine(db_uri)
+    sessions = {}
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT session_id, role, content FROM chat_messages ORDER BY session_id, created_at, id"
+        ))
+        for session_id, role, content in rows:
+            sessions.setdefault(f"session-{session_id}", []).append({"role": role, "content": content})
+    engine.dispose()
+    return sessions
+
+def main(sessions):
+    print(f"{'session':<16} {'turns':>5} {'raw tokens':>11} {'built tokens':>13} {'reduction':>10}")
+    total_raw = total_built = 0
+    for name, messages in sessions.items():
+        raw = built = 0
+        # The history each planner call sees: everything before the user's message
+        user_turns = [i for i, msg in enumerate(messages) if msg["role"] == "user"]
+        for i in user_turns:
+            raw += estimate_tokens(raw_history_context(messages[:i]))
+            built += estimate_tokens(build_history_context(messages[:i]))
+        total_raw += raw
+        total_built += built
+        print(f"{name:<16} {len(user_turns):>5} {raw:>11} {built:>13} {1 - built / raw if raw else 0:>10.1%}")
+    print(f"{'total':<16} {'':>5} {total_raw:>11} {total_built:>13} {1 - total_built / total_raw if total_raw else 0:>10.1%}")
+
+if __name__ == "__main__":
+    main(recorded_sessions(sys.argv[1]) if len(sys.argv) > 1 else synthetic_sessions())
@@ -0,0 +1,70 @@
+"""
+Benchmark: agent result handling, old string path vs typed result sets.
+
+Old: SQLDatabase.run -> repr string -> ast.literal_eval -> jsonable_encoder + json.dumps.
+New: sql_results.run_query (typed rows, no row cap here) -> sql_results.dumps.
+
+Rows hold an integer id, text, a float, a date and a decimal-like text
+column in a SQLite file. Timings are the best of three runs.
+
+Usage: python bench_result_serialization.py [rows ...]   (default: 10000 100000)
+"""
+from app.sql_results import run_query, dumps
+from fastapi.encoders import jsonable_encoder
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import create_engine, text
+import ast
+import json
+import os
+import sys
+import tempfile
+import time
+
+QUERY = "SELECT id, name, marks, enrolled_on, fee FROM students"
+
+def make_db(path, rows):
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, marks REAL, enrolled_on DATE, fee NUMERIC)"
+        ))
+        conn.execute(
+            text("INSERT INTO students (name, marks, enrolled_on, fee) VALUES (:name, :marks, :enrolled_on, :fee)"),
+            [
+                {"name": f"student_{i}", "marks": (i % 1000) / 10, "enrolled_on": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}", "fee": f"{1000 + i % 500}.50"}
+                for i in range(rows)
+            ]
+        )
+    return engine
+
+def old_path(db):
+    raw = db.run(QUERY)
+    rows = ast.literal_eval(raw)
+    return json.dumps(jsonable_encoder({"results": rows}))
+
+def new_path(engine, rows):
+    result = run_query(engine, QUERY, max_rows=rows)
+    return dumps({"results": result["rows"], "columns": result["columns"]})
+
+def best_of(fn, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(payload)
+
+def main(row_counts):
+    print(f"{'rows':>8} {'path':<6} {'seconds':>8} {'payload KB':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in row_counts:
+            engine = make_db(os.path.join(tmp, f"bench_{rows}.db"), rows)
+            db = SQLDatabase(engine, lazy_table_reflection=True)
+            old_seconds, old_size = best_of(lambda: old_path(db))
+            new_seconds, new_size = best_of(lambda: new_path(engine, rows))
+            print(f"{rows:>8} {'old':<6} {old_seconds:>8.3f} {old_size / 1024:>11.1f}")
+            print(f"{rows:>8} {'new':<6} {new_seconds:>8.3f} {new_size / 1024:>11.1f}   ({old_seconds / new_seconds:.1f}x faster)")
+            engine.dispose()
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
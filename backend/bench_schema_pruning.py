@@ -0,0 +1,103 @@
+"""
+Benchmark: planner prompt size and latency with and without schema pruning.
+
+Builds a synthetic SQLite warehouse with a few hundred tables, then runs
+get_schema_info + planner_stage for a set of questions. The LLM is a fake
+whose latency grows with prompt length (PER_1K_TOKENS_MS), so results are
+repeatable without network access.
+
+Usage: python bench_schema_pruning.py [num_tables]
+"""
+from app import schema_cache
+from app.agent import get_schema_info, planner_stage
+from app.database import get_engine, dispose_engines
+from app.tokens import estimate_tokens
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import text
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_LATENCY_MS = 50
+PER_1K_TOKENS_MS = 40
+
+DOMAINS = [
+    "customer", "purchase", "product", "invoice", "payment", "shipment", "supplier",
+    "employee", "department", "student", "course", "enrollment", "warehouse",
+    "inventory", "campaign", "lead", "ticket", "refund", "review", "store",
+]
+VARIANTS = [
+    "", "_history", "_archive", "_daily", "_monthly", "_summary", "_staging",
+    "_audit", "_snapshot", "_backup", "_log", "_metrics", "_events", "_tags", "_notes",
+]
+COLUMNS = ["name", "status", "amount", "created_at", "updated_at", "region", "category", "score", "marks", "notes"]
+
+QUESTIONS = [
+    "Top 5 students by marks",
+    "How many purchases did each customer make last month?",
+    "Total refund amount per store",
+    "List open tickets with their customer name",
+    "Average review score per product category",
+]
+
+class FakeLLM:
+    """Returns a fixed plan after a delay proportional to prompt size."""
+
+    class Response:
+        def __init__(self, content):
+            self.content = content
+
+    def invoke(self, prompt):
+        time.sleep((BASE_LATENCY_MS + PER_1K_TOKENS_MS * estimate_tokens(prompt) / 1000) / 1000)
+        return self.Response(json.dumps({"plan_description": "benchmark", "queries": ["SELECT 1"]}))
+
+def build_warehouse(path, num_tables):
+    engine = get_engine(f"sqlite:///{path}")
+    names = [f"{domain}{variant}" for variant in VARIANTS for domain in DOMAINS][:num_tables]
+    with engine.begin() as conn:
+        for i, name in enumerate(names):
+            domain = DOMAINS[i % len(DOMAINS)]
+            related = DOMAINS[(i + 1) % len(DOMAINS)]
+            columns = ", ".join(f"{domain}_{column} TEXT" for column in COLUMNS[: 4 + i % 6])
+            foreign_key = ""
+            if name != related and related in names:
+                foreign_key = f", {related}_id INTEGER REFERENCES {related}(id)"
+            conn.execute(text(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, {columns}{foreign_key})"))
+            conn.execute(text(f"INSERT INTO {name} (id) VALUES (1), (2), (3)"))
+
+def run(db_uri, pruning):
+    os.environ["SCHEMA_PRUNING"] = "true" if pruning else "false"
+    schema_cache.invalidate()
+    llm = FakeLLM()
+    sizes, latencies = [], []
+    for question in QUESTIONS:
+        db = SQLDatabase(get_engine(db_uri), lazy_table_reflection=True)
+        start = time.perf_counter()
+        schema_info = get_schema_info(db, db_uri, question)
+        # Uncached: every question pays for a planner call with its schema
+        planner_stage(llm, question, schema_info, use_cache=False)
+        latencies.append((time.perf_counter() - start) * 1000)
+        sizes.append(estimate_tokens(schema_info))
+    return sizes, latencies
+
+def main():
+    num_tables = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    # Keep the fake planner's answers out of the on-disk cache in workspace/
+    os.environ["LLM_CACHE_PATH"] = ""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = f"sqlite:///{tmp}/warehouse.db"
+        build_warehouse(f"{tmp}/warehouse.db", num_tables)
+
+        print(f"Warehouse: {num_tables} tables, {len(QUESTIONS)} questions (cold cache per mode)")
+        print(f"{'mode':<10} {'schema tokens (avg)':>20} {'max':>8} {'latency ms (avg)':>18} {'p95':>8}")
+        for label, pruning in (("full", False), ("pruned", True)):
+            sizes, latencies = run(db_uri, pruning)
+            p95 = sorted(latencies)[int(0.95 * (len(latencies) - 1))]
+            print(f"{label:<10} {statistics.mean(sizes):>20.0f} {max(sizes):>8} {statistics.mean(latencies):>18.1f} {p95:>8.1f}")
+        dispose_engines()
+
+if __name__ == "__main__":
+    main()
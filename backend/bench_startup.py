@@ -0,0 +1,78 @@
+"""
+Benchmark: cold start of the API, with and without WARMUP.
+
+Measures the import time of app.main in fresh interpreters, then starts
+uvicorn in a scratch workspace and times the first /health response, the
+first /ready response and the first CSV upload (which needs the EDA stack:
+pandas, pyarrow and the profiler). Database steps fail harmlessly when no
+database is reachable.
+
+Usage: python bench_startup.py [runs]   (default: 5 import runs)
+"""
+import httpx
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SOURCE_CSV = os.path.join(BACKEND_DIR, "..", "data.csv")
+
+def import_seconds():
+    output = subprocess.run(
+        [sys.executable, "-c", "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"],
+        capture_output=True, text=True, check=True, cwd=BACKEND_DIR
+    ).stdout
+    return float(output.split()[-1])
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_for(client, path, started, timeout=180):
+    while time.perf_counter() - started < timeout:
+        try:
+            if client.get(path).status_code == 200:
+                return time.perf_counter() - started
+        except httpx.TransportError:
+            pass
+        time.sleep(0.02)
+    raise TimeoutError(f"{path} not ready after {timeout}s")
+
+def cold_start(warmup: bool):
+    port = _free_port()
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, "WARMUP": "true" if warmup else "false"}
+    with tempfile.TemporaryDirectory() as workspace:
+        started = time.perf_counter()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)],
+            cwd=workspace, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=120) as client:
+                health = _wait_for(client, "/health", started)
+                ready = _wait_for(client, "/ready", started)
+                steps = client.get("/ready").json()["steps"]
+                upload_started = time.perf_counter()
+                with open(SOURCE_CSV, "rb") as f:
+                    client.post("/api/upload_csv", files={"file": ("data.csv", f)}).raise_for_status()
+                upload = time.perf_counter() - upload_started
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+    return health, ready, upload, steps
+
+def main(runs):
+    times = [import_seconds() for _ in range(runs)]
+    print(f"import app.main: median {statistics.median(times):.3f}s over {runs} runs")
+    print(f"{'WARMUP':<8} {'/health':>9} {'/ready':>9} {'first upload':>13}  steps")
+    for warmup in (False, True):
+        health, ready, upload, steps = cold_start(warmup)
+        print(f"{str(warmup).lower():<8} {health:>8.2f}s {ready:>8.2f}s {upload:>12.2f}s  {steps}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,118 @@
+import json
+import sqlite3
+import threading
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app import llm_cache, llm_clients
+
+# The chat tables and indexes as app.database.init_db creates them, in
+# SQLite syntax. Tests that need chat history start from the chat_db fixture
+# instead of keeping their own copy of the DDL.
+CHAT_SCHEMA = """
+    CREATE TABLE chat_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        title VARCHAR(200),
+        session_type VARCHAR(20) DEFAULT 'sql',
+        filename VARCHAR(255),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE chat_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id INTEGER REFERENCES chat_sessions(id) ON DELETE CASCADE,
+        role VARCHAR(20),
+        content TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE INDEX idx_chat_messages_session_created ON chat_messages (session_id, created_at);
+    CREATE INDEX idx_chat_sessions_type_created ON chat_sessions (session_type, created_at);
+"""
+
+@event.listens_for(Engine, "connect")
+def _enforce_foreign_keys(dbapi_connection, connection_record):
+    # SQLite checks REFERENCES (and cascades deletes) only when asked, per
+    # connection; Postgres always does. Covers pysqlite and aiosqlite engines.
+    if "sqlite" in type(dbapi_connection).__module__:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys = ON")
+        cursor.close()
+
+@pytest.fixture
+def chat_db(tmp_path):
+    """
+    Path of a fresh SQLite database holding the chat tables.
+    """
+    path = str(tmp_path / "chat.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(CHAT_SCHEMA)
+    conn.close()
+    return path
+
+# The students table the agent tests query, next to the chat tables, plus
+# the chat session their requests are saved to
+SCHOOL_SCHEMA = """
+    CREATE TABLE students (id INTEGER PRIMARY KEY, name TEXT, class TEXT, section TEXT, marks INTEGER);
+    INSERT INTO students (name, class, section, marks) VALUES
+        ('Jainam', 'Data Science', 'A', 90),
+        ('Jackie', 'Data Science', 'B', 100),
+        ('Saurabh', 'AI Engineering', 'A', 95);
+    INSERT INTO chat_sessions (title) VALUES ('Stream test');
+"""
+
+class FakeAgentLLM:
+    """
+    Builds fake chat models for the agent pipeline. The first call (planner)
+    gets plan; the responder streams answer back one word at a time.
+    """
+    plan = {
+        "plan_description": "Top students by marks",
+        "queries": ["SELECT name, marks FROM students ORDER BY marks DESC LIMIT 2"]
+    }
+    answer = "Jackie leads with 100 marks, followed by Saurabh with 95."
+
+    def __call__(self):
+        return GenericFakeChatModel(messages=iter([
+            AIMessage(content=json.dumps(self.plan)),
+            AIMessage(content=self.answer),
+        ]))
+
+@pytest.fixture
+def fake_llm():
+    return FakeAgentLLM()
+
+@pytest.fixture
+def school_db(chat_db):
+    """
+    chat_db with the students table and one chat session added.
+    """
+    conn = sqlite3.connect(chat_db)
+    conn.executescript(SCHOOL_SCHEMA)
+    conn.commit()
+    conn.close()
+    return chat_db
+
+@pytest.fixture
+def memory_llm_cache(monkeypatch):
+    """
+    Planner cache kept in memory, so completions stay out of workspace/.
+    """
+    cache = llm_cache.LLMCache(path="", max_entries=16, ttl=60, history_window=4)
+    monkeypatch.setattr(llm_cache, "_cache", cache)
+    return cache
+
+@pytest.fixture
+def llm_gate(monkeypatch, fake_llm):
+    """
+    Serves fake_llm models through the LLM registry, each only once the
+    returned event is set, so a test can hold pipelines mid-run.
+    """
+    gate = threading.Event()
+    def factory(api_key, model):
+        gate.wait(5)
+        return fake_llm()
+    monkeypatch.setattr(llm_clients, "_registry", llm_clients.LLMRegistry(max_clients=4, factory=factory))
+    return gate
@@ -0,0 +1,18 @@
+import resource
+
+# Shared by the ingest memory test and the columnar benchmark, which both
+# measure one step per fresh interpreter.
+
+def peak_rss_mb():
+    """
+    Peak resident memory of this process in MB. VmHWM is reset by exec,
+    unlike ru_maxrss, which a subprocess inherits from its parent.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,119 @@
+import json
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+from app import agent, llm_clients, worker_pool
+from app.database import dispose_engines
+from app.main import app
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_stream_agent_response_event_order(school_db, memory_llm_cache, fake_llm):
+    events = list(agent.stream_agent_response("Top 2 students", f"sqlite:///{school_db}", "unused", llm=fake_llm()))
+    dispose_engines()
+
+    names = [event for event, _ in events]
+    assert names[0] == "plan" and names[1] == "query" and names[-1] == "done"
+    assert set(names[2:-1]) == {"token"} and len(names[2:-1]) > 1
+
+    assert events[0][1] == fake_llm.plan
+    assert events[1][1]["status"] == "success"
+    assert events[1][1]["result"]["columns"] == ["name", "marks"]
+    assert events[1][1]["result"]["rows"][0] == ["Jackie", 100]
+
+    streamed = "".join(data["text"] for event, data in events if event == "token")
+    assert streamed == fake_llm.answer
+    assert events[-1][1]["answer"] == fake_llm.answer
+    assert events[-1][1]["results"] == [["Jackie", 100], ["Saurabh", 95]]
+    assert events[-1][1]["columns"] == ["name", "marks"] and events[-1][1]["truncated"] is False
+
+def test_chat_stream_endpoint_persists_after_completion(monkeypatch, school_db, memory_llm_cache, fake_llm):
+    monkeypatch.setattr(llm_clients, "_registry", llm_clients.LLMRegistry(max_clients=4, factory=lambda api_key, model: fake_llm()))
+    db_uri = f"sqlite:///{school_db}"
+
+    with TestClient(app) as client:
+        response = client.post("/api/chat/stream", json={
+            "message": "Top 2 students",
+            "db_uri": db_uri,
+            "google_api_key": "unused",
+            "session_id": 1
+        })
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_sse(response.text)
+    assert [e for e, _ in events][:2] == ["plan", "query"]
+    done = events[-1]
+    assert done[0] == "done"
+    assert done[1]["answer"] == fake_llm.answer and done[1]["chatId"] == "1"
+
+    conn = sqlite3.connect(school_db)
+    rows = conn.execute("SELECT role, content FROM chat_messages WHERE session_id = 1 ORDER BY id").fetchall()
+    conn.close()
+    assert rows == [("user", "Top 2 students"), ("assistant", fake_llm.answer)]
+
+def test_repeated_question_reuses_cached_plan(school_db, memory_llm_cache, fake_llm):
+    db_uri = f"sqlite:///{school_db}"
+    first = list(agent.stream_agent_response("Top 2 students?", db_uri, "unused", llm=fake_llm()))
+
+    # Only the responder reply is left: the plan must come from the cache
+    responder_only = GenericFakeChatModel(messages=iter([AIMessage(content=fake_llm.answer)]))
+    second = list(agent.stream_agent_response("  Top 2   students ", db_uri, "unused", llm=responder_only))
+    dispose_engines()
+
+    assert first[0] == second[0] == ("plan", fake_llm.plan)
+    assert second[-1][1]["answer"] == fake_llm.answer
+    stats = memory_llm_cache.stats()
+    assert stats["memory_hits"] == 1 and stats["misses"] == 1
+
+def test_chat_stream_holds_an_agent_pool_slot(monkeypatch, school_db, memory_llm_cache, llm_gate):
+    pool = worker_pool.AgentPool(max_workers=1, max_queue=0, timeout=10)
+    monkeypatch.setattr(worker_pool, "_pool", pool)
+    request = {"message": "Top 2 students", "db_uri": f"sqlite:///{school_db}", "google_api_key": "unused"}
+
+    with TestClient(app) as client:
+        with ThreadPoolExecutor(max_workers=1) as background:
+            first = background.submit(client.post, "/api/chat/stream", json=request)
+            waited = time.monotonic()
+            while pool.stats()["running"] == 0 and time.monotonic() - waited < 5:
+                time.sleep(0.01)
+            busy = client.post("/api/chat/stream", json=request)
+            llm_gate.set()
+            first = first.result()
+        stats = client.get("/api/pool_stats").json()
+
+    assert busy.status_code == 503 and busy.headers["retry-after"] == "1"
+    assert first.status_code == 200 and parse_sse(first.text)[-1][0] == "done"
+    assert stats["rejected"] == 1 and stats["completed"] == 1 and stats["running"] == 0
+
+def test_chat_stream_deadline(monkeypatch, school_db, memory_llm_cache, llm_gate):
+    pool = worker_pool.AgentPool(max_workers=1, max_queue=0, timeout=0.2)
+    monkeypatch.setattr(worker_pool, "_pool", pool)
+
+    with TestClient(app) as client:
+        response = client.post("/api/chat/stream", json={
+            "message": "Top 2 students", "db_uri": f"sqlite:///{school_db}", "google_api_key": "unused", "session_id": 1
+        })
+        llm_gate.set()
+        # The worker stops at its next event, and its slot is freed
+        waited = time.monotonic()
+        while pool.stats()["running"] and time.monotonic() - waited < 5:
+            time.sleep(0.01)
+
+    assert response.status_code == 200
+    assert parse_sse(response.text) == [("error", {"message": "Request exceeded the 0.2s deadline."})]
+    stats = pool.stats()
+    assert stats["timed_out"] == 1 and stats["running"] == 0 and stats["queue_depth"] == 0
+    conn = sqlite3.connect(school_db)
+    assert conn.execute("SELECT COUNT(*) FROM chat_messages").fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,39 @@
+import json
+
+from app.context_builder import build_history_context, compact_message
+
+def eda_reply(i):
+    return json.dumps({
+        "answer": f"Plot {i} shows the distribution. ![hist](http://localhost:8000/static/plots/{i}abc.png)",
+        "code": "plt.figure()\nsns.histplot(df['marks'])\nplt.savefig('hist.png')",
+        "stdout": "\n".join(f"row {n}: {n * 1.5}" for n in range(500)),
+        "plots": [f"/static/plots/{i}abc.png"],
+        "error": "Traceback (most recent call last):\n" + "  frame\n" * 200 + "KeyError: 'grade'",
+    })
+
+def test_compact_eda_message():
+    text = compact_message({"role": "assistant", "content": eda_reply(1)}, output_chars=200)
+    assert "/static/plots/" not in text and "[1 plot(s) generated]" in text
+    assert "sns.histplot" in text
+    assert "row 0:" in text and "row 499:" in text and "chars omitted" in text
+    # The tail of a traceback names the exception
+    assert "KeyError: 'grade'" in text
+    assert len(text) < 1000
+
+def test_older_turns_fold_into_summary(monkeypatch):
+    monkeypatch.setenv("CONTEXT_RECENT_MESSAGES", "2")
+    history = []
+    for i in range(10):
+        history.append({"role": "user", "content": f"Question {i}? Please plot marks."})
+        history.append({"role": "assistant", "content": eda_reply(i)})
+
+    raw = "".join(msg["content"] for msg in history)
+    context = build_history_context(history)
+    assert len(context) < len(raw) / 10
+    assert "- User asked: Question 0?" in context
+    assert "Recent messages:\nUser: Question 9? Please plot marks." in context
+    assert "/static/plots/" not in context
+
+    assert build_history_context([]) == ""
+    short = build_history_context([{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}])
+    assert short == "Previous conversation history:\nUser: Hi\nAssistant: Hello\n"
@@ -0,0 +1,65 @@
+import os
+
+import pandas as pd
+
+from app.dataframe_cache import DataFrameCache
+
+def write_csv(path, rows):
+    pd.DataFrame({"id": range(rows), "name": [f"row {i}" for i in range(rows)]}).to_csv(path, index=False)
+    return str(path)
+
+def frame_bytes(path):
+    return int(pd.read_csv(path).memory_usage(deep=True).sum())
+
+def test_least_recently_used_frame_is_evicted(tmp_path):
+    paths = [write_csv(tmp_path / f"{name}.csv", 100) for name in "abc"]
+    # Room for two of the three frames
+    cache = DataFrameCache(max_bytes=2 * frame_bytes(paths[0]) + 10)
+
+    cache.get(paths[0])
+    cache.get(paths[1])
+    cache.get(paths[0])  # b is now the least recently used
+    cache.get(paths[2])
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["bytes"] <= cache.max_bytes
+
+    cache.get(paths[0])
+    cache.get(paths[2])
+    assert cache.stats()["hits"] == 3
+    cache.get(paths[1])
+    assert cache.stats()["misses"] == 4
+
+def test_frame_larger_than_the_cache_is_not_kept(tmp_path):
+    path = write_csv(tmp_path / "big.csv", 1000)
+    cache = DataFrameCache(max_bytes=1024)
+    assert len(cache.get(path)) == 1000
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+def test_replaced_file_is_reloaded(tmp_path):
+    path = write_csv(tmp_path / "data.csv", 10)
+    cache = DataFrameCache(max_bytes=1024 * 1024)
+    assert len(cache.get(path)) == 10
+
+    write_csv(path, 20)
+    # Make sure the mtime moves even on coarse-grained filesystems
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert len(cache.get(path)) == 20
+    stats = cache.stats()
+    # The old version is dropped, not left to age out
+    assert stats["misses"] == 2 and stats["hits"] == 0 and stats["entries"] == 1
+
+def test_callers_cannot_change_the_cached_frame(tmp_path):
+    path = write_csv(tmp_path / "data.csv", 10)
+    cache = DataFrameCache(max_bytes=1024 * 1024)
+
+    first = cache.get(path)
+    first.loc[0, "id"] = -1
+    first["name"] = first["name"].str.upper()
+    first.drop(columns=["id"], inplace=True)
+
+    second = cache.get(path)
+    assert list(second.columns) == ["id", "name"]
+    assert second.loc[0, "id"] == 0 and second.loc[0, "name"] == "row 0"
+    assert cache.stats()["hits"] == 1
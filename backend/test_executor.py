@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+
+from sqlalchemy import event
+
+from app import agent, result_cache
+from app.database import get_engine, dispose_engines
+
+def make_engine(path):
+    db_uri = f"sqlite:///{path}"
+    engine = get_engine(db_uri)
+
+    @event.listens_for(engine, "connect")
+    def add_sleep(dbapi_connection, _):
+        # slow(seconds) stands in for an expensive query
+        dbapi_connection.create_function("slow", 1, lambda seconds: time.sleep(seconds) or 1)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.exec_driver_sql("INSERT INTO items (name) VALUES ('a'), ('b'), ('c')")
+    return db_uri
+
+def run_plan(db_uri, queries):
+    start = time.perf_counter()
+    log = agent.executor_stage(None, {"queries": queries}, db_uri, use_cache=False)
+    return log, time.perf_counter() - start
+
+def test_consecutive_reads_run_concurrently_in_plan_order(monkeypatch):
+    monkeypatch.setattr(result_cache, "_cache", result_cache.ResultCache(1024 * 1024, 60, {}))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = make_engine(os.path.join(tmp, "items.db"))
+        reads = [f"SELECT {i} AS n, slow(0.3) AS s" for i in range(4)]
+        log, elapsed = run_plan(db_uri, reads)
+        dispose_engines()
+
+    assert [entry["result"]["rows"][0][0] for entry in log] == [0, 1, 2, 3]
+    assert all(entry["elapsed_ms"] >= 300 for entry in log)
+    # Four 0.3s reads in sequence would take 1.2s
+    assert elapsed < 0.9
+
+def test_writes_stay_sequential_and_stop_on_error(monkeypatch):
+    monkeypatch.setattr(result_cache, "_cache", result_cache.ResultCache(1024 * 1024, 60, {}))
+    with tempfile.TemporaryDirectory() as tmp:
+        db_uri = make_engine(os.path.join(tmp, "items.db"))
+        log, _ = run_plan(db_uri, [
+            "SELECT COUNT(*) FROM items",
+            "INSERT INTO items (name) VALUES ('d')",
+            "SELECT COUNT(*) FROM items",
+            "SELECT * FROM missing_table",
+            "SELECT name FROM items",
+            "DELETE FROM items",
+        ])
+        remaining = agent.executor_stage(None, {"queries": ["SELECT COUNT(*) FROM items"]}, db_uri, use_cache=False)
+        dispose_engines()
+
+    assert [entry["status"] for entry in log] == ["success", "success", "success", "error"]
+    assert log[0]["result"]["rows"] == [[3]] and log[2]["result"]["rows"] == [[4]]
+    # The DELETE after the failed read never ran
+    assert remaining[0]["result"]["rows"] == [[4]]
@@ -0,0 +1,88 @@
+import sqlite3
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from app import database, history_cache
+from app.database import get_engine, dispose_engines
+from app.main import app
+
+def add_messages(path, messages):
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO chat_sessions (title) VALUES ('History')")
+    conn.executemany("INSERT INTO chat_messages (session_id, role, content) VALUES (1, ?, ?)", messages)
+    conn.commit()
+    conn.close()
+
+def count_selects(engine):
+    calls = []
+    @event.listens_for(engine, "before_cursor_execute")
+    def record(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith("SELECT"):
+            calls.append(statement)
+    return calls
+
+def test_history_limits_and_write_through(monkeypatch, chat_db):
+    monkeypatch.setattr(history_cache, "_cache", history_cache.HistoryCache(max_sessions=8, max_messages=10, ttl=60))
+    messages = [("user" if i % 2 == 0 else "assistant", f"message {i}") for i in range(6)]
+    add_messages(chat_db, messages)
+    db_uri = f"sqlite:///{chat_db}"
+    selects = count_selects(get_engine(db_uri))
+
+    full = database.get_chat_history(db_uri, 1)
+    assert [m["content"] for m in full] == [f"message {i}" for i in range(6)]
+    assert len(selects) == 1
+
+    # Later turns are answered from the cache, including the new message
+    database.add_message(db_uri, 1, "user", "message 6")
+    last_two = database.get_chat_history(db_uri, 1, limit=2)
+    assert [m["content"] for m in last_two] == ["message 5", "message 6"]
+    # "message N" is 9 characters: 3 estimated tokens each
+    budgeted = database.get_chat_history(db_uri, 1, token_budget=7)
+    assert [m["content"] for m in budgeted] == ["message 5", "message 6"]
+    assert len(selects) == 1
+    dispose_engines()
+
+def test_history_longer_than_cached_window(monkeypatch, chat_db):
+    monkeypatch.setattr(history_cache, "_cache", history_cache.HistoryCache(max_sessions=8, max_messages=4, ttl=60))
+    add_messages(chat_db, [("user", f"m{i}") for i in range(10)])
+    db_uri = f"sqlite:///{chat_db}"
+
+    assert [m["content"] for m in database.get_chat_history(db_uri, 1, limit=3)] == ["m7", "m8", "m9"]
+    # The cache only holds the newest four, so the full history comes from the database
+    assert len(database.get_chat_history(db_uri, 1)) == 10
+    assert history_cache.get_history_cache().get(db_uri, 1) is None
+    dispose_engines()
+
+def test_put_after_a_concurrent_append_is_skipped():
+    cache = history_cache.HistoryCache(max_sessions=8, max_messages=10, ttl=60)
+    # A reader takes the version, then queries; a turn is appended meanwhile
+    version = cache.version("db", 1)
+    cache.append("db", 1, [{"role": "user", "content": "new"}])
+    cache.put("db", 1, [{"role": "user", "content": "old"}], version=version)
+    assert cache.get("db", 1) is None
+
+    version = cache.version("db", 1)
+    cache.put("db", 1, [{"role": "user", "content": "new"}], version=version)
+    assert [m["content"] for m in cache.get("db", 1)] == ["new"]
+
+    version = cache.version("db", 1)
+    cache.invalidate("db")
+    cache.put("db", 1, [], version=version)
+    assert cache.get("db", 1) is None
+
+def test_message_listing_reads_the_database(monkeypatch, chat_db):
+    monkeypatch.setattr(history_cache, "_cache", history_cache.HistoryCache(max_sessions=8, max_messages=10, ttl=60))
+    add_messages(chat_db, [("user", "hello")])
+    db_uri = f"sqlite:///{chat_db}"
+    # Cached by a prompt build, then written to by another process
+    assert [m["content"] for m in database.get_chat_history(db_uri, 1)] == ["hello"]
+    conn = sqlite3.connect(chat_db)
+    conn.execute("INSERT INTO chat_messages (session_id, role, content) VALUES (1, 'assistant', 'hi')")
+    conn.commit()
+    conn.close()
+
+    with TestClient(app) as client:
+        listing = client.get(f"/api/sessions/1/messages?db_uri={db_uri}").json()
+    assert [m["content"] for m in listing["messages"]] == ["hello", "hi"]
+    dispose_engines()
@@ -0,0 +1,71 @@
+import json
+import os
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from app.database import dispose_engines
+from app.main import app, PLOTS_DIR
+
+def add_eda_session(path, turns=20):
+    # An EDA session as /api/eda_chat stores it: JSON answers with code,
+    # describe() output and plot links
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO chat_sessions (title, session_type, filename) VALUES ('Analysis: bank.csv', 'eda', 'bank.csv')")
+    for i in range(turns):
+        column = ["age", "balance", "duration", "campaign", "pdays"][i % 5]
+        stdout = "\n".join(f"{stat:<6} {value:>12.3f}" for stat, value in (
+            ("count", 11162), ("mean", 41.2 + i), ("std", 11.9), ("min", 18), ("25%", 32), ("50%", 39), ("75%", 49), ("max", 95)
+        ))
+        answer = {
+            "answer": f"The distribution of {column} is right-skewed with a median of {39 + i}. The histogram is shown below.",
+            "code": f"plt.figure(figsize=(10, 6))\nsns.histplot(df['{column}'], kde=True)\nprint(df['{column}'].describe())\nplt.savefig('plot_{i}.png')\nplt.clf()",
+            "stdout": stdout,
+            "plots": [f"/static/plots/plot_{i:032x}.webp"],
+            "plot_details": [{"url": f"/static/plots/plot_{i:032x}.webp", "thumbnail": f"/static/plots/plot_{i:032x}_thumb.webp", "width": 1000, "height": 600, "bytes": 11702}],
+            "error": None,
+        }
+        conn.execute("INSERT INTO chat_messages (session_id, role, content) VALUES (1, 'user', ?)", (f"Show the distribution of {column}",))
+        conn.execute("INSERT INTO chat_messages (session_id, role, content) VALUES (1, 'assistant', ?)", (json.dumps(answer),))
+    conn.commit()
+    conn.close()
+
+def test_compression_etags_and_immutable_plots(chat_db):
+    add_eda_session(chat_db)
+    db_uri = f"sqlite:///{chat_db}"
+    plot_name = ".test_http_cache.webp"
+    plot_path = os.path.join(PLOTS_DIR, plot_name)
+    with open(plot_path, "wb") as f:
+        f.write(b"RIFF" + b"\0" * 2048)
+
+    try:
+        with TestClient(app) as client:
+            url = f"/api/sessions/1/messages?db_uri={db_uri}"
+            plain = client.get(url, headers={"Accept-Encoding": "identity"})
+            compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+            assert plain.json() == compressed.json() and len(plain.json()["messages"]) == 40
+            assert compressed.headers["content-encoding"] == "gzip"
+            saved = 1 - compressed.num_bytes_downloaded / plain.num_bytes_downloaded
+            print(f"session history: {plain.num_bytes_downloaded} bytes -> {compressed.num_bytes_downloaded} gzip ({saved:.0%} saved)")
+            assert saved > 0.6
+
+            # Unchanged listings revalidate with an empty 304
+            sessions = client.get(f"/api/sessions?db_uri={db_uri}")
+            etag = sessions.headers["etag"]
+            again = client.get(f"/api/sessions?db_uri={db_uri}", headers={"If-None-Match": etag})
+            assert again.status_code == 304 and again.content == b""
+            assert client.get(url, headers={"If-None-Match": compressed.headers["etag"]}).status_code == 304
+            client.post("/api/sessions", json={"title": "Another", "db_uri": db_uri})
+            changed = client.get(f"/api/sessions?db_uri={db_uri}", headers={"If-None-Match": etag})
+            assert changed.status_code == 200 and len(changed.json()["sessions"]) == 2
+
+            # Small bodies are not worth compressing
+            assert "content-encoding" not in sessions.headers
+
+            plot = client.get(f"/static/plots/{plot_name}", headers={"Accept-Encoding": "gzip"})
+            assert plot.headers["cache-control"] == "public, max-age=31536000, immutable"
+            assert "content-encoding" not in plot.headers
+            assert client.get(f"/static/plots/{plot_name}", headers={"If-None-Match": plot.headers["etag"]}).status_code == 304
+    finally:
+        os.remove(plot_path)
+        dispose_engines()
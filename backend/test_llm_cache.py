@@ -0,0 +1,37 @@
+import sqlite3
+import time
+
+from app.llm_cache import LLMCache, normalize_text
+
+class Echo:
+    model = "echo"
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return type("Message", (), {"content": f"plan for {prompt}"})()
+
+def test_keys_keep_case_but_not_spacing(tmp_path):
+    assert normalize_text("  Orders  from\n'ACME'? ") == "Orders from 'ACME'"
+    cache = LLMCache(path="", max_entries=8, ttl=60, history_window=2)
+    llm = Echo()
+    key = cache.make_key(llm, "Orders from 'ACME'", "schema")
+    assert cache.make_key(llm, " Orders from  'ACME'?", "schema") == key
+    assert cache.make_key(llm, "Orders from 'acme'", "schema") != key
+
+def test_expired_rows_are_pruned(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = LLMCache(path=path, max_entries=8, ttl=60, history_window=2)
+    llm = Echo()
+    cache.invoke(llm, "old", "k-old")
+    cache.invoke(llm, "new", "k-new")
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("UPDATE llm_cache SET created_at = ? WHERE key = 'k-old'", (time.time() - 120,))
+
+    cache.prune()
+    assert [row[0] for row in conn.execute("SELECT key FROM llm_cache")] == ["k-new"]
+    conn.close()
+    # The fresh entry is still served from the cache
+    assert cache.invoke(llm, "new", "k-new") == "plan for new" and llm.calls == 2
@@ -0,0 +1,58 @@
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from app import llm_clients
+from app.database import dispose_engines
+from app.llm_clients import LLMRegistry, fake_factory
+from app.main import app
+
+def test_clients_are_shared_per_key_and_model(monkeypatch):
+    built = []
+    def factory(api_key, model):
+        built.append((api_key, model))
+        return object()
+
+    registry = LLMRegistry(max_clients=2, factory=factory)
+    first = registry.get("key-a", "model-1")
+    assert registry.get("key-a", "model-1") is first
+    assert registry.get("key-a", "model-2") is not first
+    assert registry.get("key-b", "model-1") is not first
+    # The least recently used client was evicted
+    assert registry.get("key-a", "model-1") is not first
+    assert built == [("key-a", "model-1"), ("key-a", "model-2"), ("key-b", "model-1"), ("key-a", "model-1")]
+    assert registry.stats()["evicted"] == 2
+
+    monkeypatch.setenv("LLM_ALLOWED_MODELS", "model-1")
+    try:
+        registry.get("key-a", "model-2")
+        assert False, "disallowed model was served"
+    except ValueError:
+        pass
+
+def test_chat_uses_the_requested_model(monkeypatch, school_db, memory_llm_cache, fake_llm):
+    monkeypatch.setenv("GEMINI_MODEL", "env-model")
+    models = []
+    fake = fake_factory([json.dumps(fake_llm.plan), fake_llm.answer])
+    def factory(api_key, model):
+        models.append(model)
+        return fake(api_key, model)
+    monkeypatch.setattr(llm_clients, "_registry", LLMRegistry(max_clients=4, factory=factory))
+
+    with TestClient(app) as client:
+        request = {"message": "Top 2 students", "db_uri": f"sqlite:///{school_db}", "google_api_key": "unused"}
+        first = client.post("/api/chat", json={**request, "model": "gemini-test"})
+        second = client.post("/api/chat", json={**request, "model": "gemini-test", "no_cache": True})
+        default = client.post("/api/chat", json={**request, "no_cache": True})
+        monkeypatch.setenv("LLM_ALLOWED_MODELS", "gemini-test")
+        rejected = client.post("/api/chat", json={**request, "model": "gemini-other"})
+    dispose_engines()
+
+    assert first.status_code == second.status_code == default.status_code == 200
+    assert first.json()["answer"] == second.json()["answer"] == fake_llm.answer
+    assert first.json()["results"] == [["Jackie", 100], ["Saurabh", 95]]
+    # One client per model, reused by the second request; no environment changes
+    assert models == ["gemini-test", llm_clients.DEFAULT_SQL_CHAT_MODEL]
+    assert os.environ["GEMINI_MODEL"] == "env-model"
+    assert rejected.status_code == 400
@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from app import async_database, history_cache, message_writer
+from app.main import app
+
+def add_sessions(path, count):
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO chat_sessions (title) VALUES (?)", [(f"Session {i}",) for i in range(count)])
+    conn.commit()
+    conn.close()
+
+def stored(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT session_id, role, content FROM chat_messages ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+def test_write_behind_batches_and_drains(monkeypatch, chat_db):
+    monkeypatch.setattr(history_cache, "_cache", history_cache.HistoryCache(max_sessions=8, max_messages=50, ttl=60))
+    writer = message_writer.MessageWriter(batch_size=100, interval=60)
+    monkeypatch.setattr(message_writer, "_writer", writer)
+
+    async def scenario(path):
+        db_uri = f"sqlite:///{path}"
+        writer.start()
+        await message_writer.save_turn(db_uri, 1, [("user", "q1"), ("assistant", "a1")])
+        await message_writer.save_turn(db_uri, 2, [("user", "q2"), ("assistant", "a2")])
+        # Queued, not yet written
+        assert stored(path) == []
+
+        # A reader of session 1 flushes everything pending first
+        await message_writer.flush_session(db_uri, 1)
+        history = await async_database.get_chat_history(db_uri, 1)
+        assert [m["content"] for m in history] == ["q1", "a1"]
+        assert writer.stats()["batches"] == 1
+
+        await message_writer.save_turn(db_uri, 1, [("user", "q3"), ("assistant", "a3")])
+        await writer.drain()
+        await async_database.dispose_async_engines()
+        return db_uri
+
+    add_sessions(chat_db, 2)
+    db_uri = asyncio.run(scenario(chat_db))
+    assert stored(chat_db) == [
+        (1, "user", "q1"), (1, "assistant", "a1"), (2, "user", "q2"), (2, "assistant", "a2"),
+        (1, "user", "q3"), (1, "assistant", "a3"),
+    ]
+    # The cache saw the last turn at enqueue time
+    assert [m["content"] for m in history_cache.get_history_cache().get(db_uri, 1)] == ["q1", "a1", "q3", "a3"]
+    assert not writer.running and writer.stats()["pending"] == 0
+
+def test_failed_batch_only_drops_the_bad_session(monkeypatch, chat_db):
+    monkeypatch.setattr(history_cache, "_cache", history_cache.HistoryCache(max_sessions=8, max_messages=50, ttl=60))
+    writer = message_writer.MessageWriter(batch_size=4, interval=60)
+    monkeypatch.setattr(message_writer, "_writer", writer)
+    inserts = []
+    insert_messages = async_database.insert_messages
+    async def counting_insert(db_uri, rows):
+        inserts.append(len(rows))
+        await insert_messages(db_uri, rows)
+    monkeypatch.setattr(async_database, "insert_messages", counting_insert)
+
+    async def scenario(db_uri):
+        writer.start()
+        for turn in range(3):
+            await message_writer.save_turn(db_uri, 1, [("user", f"q{turn}"), ("assistant", f"a{turn}")])
+        # Session 3 does not exist: its rows fail the foreign key
+        await message_writer.save_turn(db_uri, 3, [("user", "lost")])
+        await message_writer.save_turn(db_uri, 2, [("user", "q"), ("assistant", "a")])
+        for _ in range(message_writer.MAX_ATTEMPTS):
+            await writer.flush()
+        await writer.drain()
+        await async_database.dispose_async_engines()
+
+    add_sessions(chat_db, 2)
+    asyncio.run(scenario(f"sqlite:///{chat_db}"))
+    assert [row for row in stored(chat_db) if row[0] == 1] == [
+        (1, "user", "q0"), (1, "assistant", "a0"), (1, "user", "q1"), (1, "assistant", "a1"),
+        (1, "user", "q2"), (1, "assistant", "a2"),
+    ]
+    assert [row for row in stored(chat_db) if row[0] == 2] == [(2, "user", "q"), (2, "assistant", "a")]
+    stats = writer.stats()
+    assert stats["written"] == 8 and stats["dropped"] == 1 and stats["pending"] == 0
+    # No INSERT carried more than batch_size rows
+    assert max(inserts) == 4
+
+def test_new_session_flushes_before_retention(monkeypatch, chat_db):
+    monkeypatch.setenv("MESSAGE_WRITE_BEHIND", "true")
+    monkeypatch.setenv("SESSION_RETENTION", "1")
+    monkeypatch.setattr(history_cache, "_cache", history_cache.HistoryCache(max_sessions=8, max_messages=50, ttl=60))
+    writer = message_writer.MessageWriter(batch_size=100, interval=60)
+    monkeypatch.setattr(message_writer, "_writer", writer)
+    db_uri = f"sqlite:///{chat_db}"
+
+    with TestClient(app) as client:
+        assert client.post("/api/sessions", json={"title": "Old", "db_uri": db_uri}).json()["id"] == 1
+        writer.enqueue(db_uri, 1, [("user", "q"), ("assistant", "a")])
+        # Retention deletes session 1; its queued turn must be written first, not fail later
+        client.post("/api/sessions", json={"title": "New", "db_uri": db_uri})
+    stats = writer.stats()
+    assert stats["written"] == 2 and stats["failures"] == 0 and stats["dropped"] == 0
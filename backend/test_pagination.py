@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import async_database
+from app.main import app
+
+async def all_pages(fetch):
+    pages, cursor = [], None
+    while True:
+        page, cursor = await fetch(cursor)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+def test_retention_and_keyset_pages(monkeypatch, chat_db):
+    monkeypatch.setenv("SESSION_RETENTION", "3")
+
+    async def scenario(db_uri):
+        for i in range(7):
+            await async_database.create_session(db_uri, f"sql {i}", "sql")
+        await async_database.create_session(db_uri, "eda 0", "eda", "data.csv")
+        await async_database.add_messages(db_uri, [(7, "user" if i % 2 == 0 else "assistant", f"m{i}") for i in range(5)])
+
+        sessions = await all_pages(lambda cursor: async_database.get_sessions_page(db_uri, 2, cursor))
+        sql_only = await all_pages(lambda cursor: async_database.get_sessions_page(db_uri, 10, cursor, "sql"))
+        messages = await all_pages(lambda cursor: async_database.get_messages_page(db_uri, 7, 2, cursor))
+        with pytest.raises(ValueError):
+            await async_database.get_sessions_page(db_uri, 2, "not-a-cursor")
+        await async_database.dispose_async_engines()
+        return sessions, sql_only, messages
+
+    sessions, sql_only, messages = asyncio.run(scenario(f"sqlite:///{chat_db}"))
+
+    # Only the newest three "sql" sessions survive; other types are untouched
+    assert [[s["title"] for s in page] for page in sessions] == [["eda 0", "sql 6"], ["sql 5", "sql 4"]]
+    assert [s["title"] for s in sql_only[0]] == ["sql 6", "sql 5", "sql 4"]
+    # Newest page first, each page oldest first
+    assert [[m["content"] for m in page] for page in messages] == [["m3", "m4"], ["m1", "m2"], ["m0"]]
+
+def test_session_listing_is_unpaged_without_limit(monkeypatch, chat_db):
+    monkeypatch.setenv("SESSION_RETENTION", "0")
+    db_uri = f"sqlite:///{chat_db}"
+
+    async def create(count):
+        for i in range(count):
+            await async_database.create_session(db_uri, f"sql {i}", "sql")
+        await async_database.dispose_async_engines()
+    asyncio.run(create(60))
+
+    with TestClient(app) as client:
+        everything = client.get("/api/sessions", params={"db_uri": db_uri}).json()
+        first = client.get("/api/sessions", params={"db_uri": db_uri, "limit": 50}).json()
+        rest = client.get("/api/sessions", params={"db_uri": db_uri, "cursor": first["nextCursor"]}).json()
+
+    # More sessions than one page, none dropped from the sidebar listing
+    assert len(everything["sessions"]) == 60 and everything["nextCursor"] is None
+    assert everything["sessions"][0]["title"] == "sql 59" and everything["sessions"][-1]["title"] == "sql 0"
+    assert len(first["sessions"]) == 50 and len(rest["sessions"]) == 10 and rest["nextCursor"] is None
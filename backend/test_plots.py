@@ -0,0 +1,43 @@
+import os
+import tempfile
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from PIL import Image
+
+from app.plots import bound_savefig, process_plot
+
+def test_plots_are_bounded_reencoded_and_thumbnailed():
+    settings = {"max_dpi": 80, "max_inches": 10, "format": "webp", "quality": 80, "thumb_px": 200}
+    savefig = Figure.savefig
+    bound_savefig(settings["max_dpi"], settings["max_inches"])
+    with tempfile.TemporaryDirectory() as tmp:
+        plots_dir = os.path.join(tmp, "plots")
+        os.makedirs(plots_dir)
+        original = os.path.join(tmp, "scatter.png")
+        fig = plt.figure(figsize=(20, 10))
+        plt.scatter(range(5000), [i % 97 for i in range(5000)])
+        try:
+            plt.savefig(original, dpi=300)
+        finally:
+            Figure.savefig = savefig
+            plt.close(fig)
+        # 20x10 in at 300 dpi would be 6000x3000; bounded to 10x5 in at 80 dpi
+        with Image.open(original) as image:
+            assert image.size == (800, 400)
+        original_bytes = os.path.getsize(original)
+
+        plot = process_plot(original, plots_dir, settings)
+        assert not os.path.exists(original)
+        assert (plot["width"], plot["height"]) == (800, 400)
+        assert plot["bytes"] <= original_bytes
+        with Image.open(os.path.join(plots_dir, plot["thumbnail"].rsplit("/", 1)[1])) as thumb:
+            assert thumb.size == (200, 100)
+
+        # Images written without savefig are bounded too
+        big = os.path.join(tmp, "big.png")
+        Image.new("RGB", (3000, 1500), "white").save(big)
+        plot = process_plot(big, plots_dir, {**settings, "format": "png"})
+        assert plot["url"].endswith(".png") and (plot["width"], plot["height"]) == (800, 400)
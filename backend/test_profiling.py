@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+from app import main, profiling
+from app.columnar import convert_to_parquet
+from app.profiling import build_profile, format_profile
+
+def write_csv(path, rows=500):
+    rng = np.random.default_rng(7)
+    frame = pd.DataFrame({
+        "age": rng.integers(18, 90, rows),
+        "balance": rng.normal(1500, 800, rows).round(2),
+        "job": rng.choice(["admin", "technician", "services", "retired"], rows, p=[0.4, 0.3, 0.2, 0.1]),
+        "deposit": rng.choice([True, False], rows),
+    })
+    frame.loc[::50, "balance"] = np.nan
+    frame.to_csv(path, index=False)
+    return frame
+
+def by_name(profile):
+    return {column["name"]: column for column in profile["columns"]}
+
+def test_streamed_profile_matches_pandas(monkeypatch, tmp_path):
+    # Many small batches, and a sample smaller than the column
+    monkeypatch.setattr(profiling, "BATCH_ROWS", 64)
+    monkeypatch.setattr(profiling, "NUMERIC_SAMPLE_SIZE", 200)
+    path = str(tmp_path / "bank.csv")
+    frame = write_csv(path)
+
+    for source in ("csv", "parquet"):
+        if source == "parquet":
+            assert convert_to_parquet(path)
+        profile = build_profile(path)
+        assert profile["row_count"] == 500 and profile["column_count"] == 4
+        assert profile["sample"][0]["age"] == int(frame["age"][0]) and len(profile["sample"]) == 5
+        columns = by_name(profile)
+
+        age = columns["age"]
+        assert age["dtype"] == "int64" and age["null_count"] == 0
+        assert age["distinct"] == frame["age"].nunique()
+        assert (age["min"], age["max"]) == (frame["age"].min(), frame["age"].max())
+        assert abs(age["mean"] - frame["age"].mean()) < 1e-9 and abs(age["std"] - frame["age"].std()) < 1e-9
+        # Quantiles come from the sample: close, not exact
+        assert abs(age["quantiles"]["0.5"] - frame["age"].median()) < 5
+        assert sum(age["histogram"]["counts"]) == 500 and len(age["histogram"]["bin_edges"]) == 11
+
+        balance = columns["balance"]
+        assert balance["dtype"] == "float64" and balance["null_count"] == 10
+        assert abs(balance["mean"] - frame["balance"].mean()) < 1e-6
+
+        job = columns["job"]
+        counts = frame["job"].value_counts()
+        assert job["distinct"] == 4 and "quantiles" not in job
+        assert job["top_categories"][0] == {"value": counts.index[0], "count": int(counts.iloc[0])}
+        assert sum(c["count"] for c in job["top_categories"]) == 500
+        assert columns["deposit"]["distinct"] == 2 and len(columns["deposit"]["top_categories"]) == 2
+
+def test_distinct_count_estimate_beyond_sketch(monkeypatch):
+    monkeypatch.setattr(profiling, "DISTINCT_SKETCH_SIZE", 256)
+    profiler = profiling.ColumnProfiler("id")
+    for start in range(0, 20000, 1000):
+        profiler.update(pd.Series(np.arange(start, start + 1000)))
+    assert abs(profiler.distinct() - 20000) < 0.2 * 20000
+
+def test_format_profile(tmp_path):
+    path = str(tmp_path / "bank.csv")
+    write_csv(path)
+    text = format_profile(build_profile(path))
+    lines = text.splitlines()
+    assert lines[0] == "Shape: (500, 4)" and lines[2] == "Columns:"
+    assert lines[3].startswith("- age (int64): 0 nulls, 72 distinct, min 18, max 89, mean ")
+    assert "p25/p50/p75" in lines[3]
+    assert lines[5].startswith("- job (") and ", top: admin (" in lines[5]
+    assert text.split("Head:\n", 1)[1].splitlines()[0].split() == ["age", "balance", "job", "deposit"]
+
+def test_upload_profile_endpoint(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "UPLOADS_DIR", str(tmp_path))
+    source = str(tmp_path / "source.csv")
+    write_csv(source)
+
+    with TestClient(main.app) as client:
+        with open(source, "rb") as f:
+            upload = client.post("/api/upload_csv", files={"file": ("bank.csv", f)})
+        assert upload.status_code == 200
+        filename = upload.json()["filename"]
+
+        response = client.get(f"/api/uploads/{filename}/profile")
+        assert response.status_code == 200
+        profile = response.json()
+        assert profile["row_count"] == 500 and [c["name"] for c in profile["columns"]] == ["age", "balance", "job", "deposit"]
+        # Stored at upload time and served as is
+        assert profile == build_profile(str(tmp_path / filename))
+        assert client.get("/api/uploads/missing.csv/profile").status_code == 404
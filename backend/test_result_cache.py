@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import tempfile
+
+from app import agent, result_cache
+from app.database import dispose_engines
+from app.result_cache import ResultCache, normalize_sql
+
+def rows(*values):
+    return {"columns": ["v"], "rows": [[v] for v in values], "row_count": len(values), "truncated": False}
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("SELECT  *\n FROM t WHERE a = 1 ;") == "SELECT * FROM t WHERE a = 1"
+    assert normalize_sql("SELECT * FROM t WHERE name = 'a  b'") != normalize_sql("SELECT * FROM t WHERE name = 'a b'")
+    assert normalize_sql("SELECT  'it''s  here',  \"my  col\"") == "SELECT 'it''s  here', \"my  col\""
+
+def test_hits_misses_and_table_ttls(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: clock[0])
+    cache = ResultCache(max_bytes=1024 * 1024, ttl=60, table_ttls={"orders": 5, "audit": 0})
+
+    assert cache.get("db", "SELECT v FROM students") is None
+    cache.put("db", "SELECT v FROM students", rows(1))
+    assert cache.get("db", "SELECT  v\nFROM students;") == rows(1)
+    assert cache.get("other-db", "SELECT v FROM students") is None
+
+    # The shortest TTL among the tables read applies; 0 means never cached
+    cache.put("db", "SELECT v FROM students JOIN orders ON 1 = 1", rows(2))
+    cache.put("db", "SELECT v FROM audit", rows(3))
+    assert cache.get("db", "SELECT v FROM audit") is None
+    clock[0] += 10
+    assert cache.get("db", "SELECT v FROM students JOIN orders ON 1 = 1") is None
+    assert cache.get("db", "SELECT v FROM students") == rows(1)
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 4, 1)
+
+def test_byte_budget_evicts_least_recently_used():
+    size = len(result_cache.dumps(rows(*range(10))))
+    cache = ResultCache(max_bytes=3 * size, ttl=60, table_ttls={})
+    for i in range(3):
+        cache.put("db", f"SELECT v FROM t{i}", rows(*range(10)))
+    cache.get("db", "SELECT v FROM t0")
+    cache.put("db", "SELECT v FROM t3", rows(*range(10)))
+    assert cache.get("db", "SELECT v FROM t1") is None
+    assert cache.get("db", "SELECT v FROM t0") is not None
+    assert cache.stats()["evictions"] == 1 and cache.stats()["bytes"] == 3 * size
+    # Results larger than the whole budget are not cached
+    cache.put("db", "SELECT v FROM big", rows(*range(1000)))
+    assert cache.get("db", "SELECT v FROM big") is None
+
+def test_writes_through_the_executor_invalidate(monkeypatch):
+    cache = ResultCache(max_bytes=1024 * 1024, ttl=60, table_ttls={})
+    monkeypatch.setattr(result_cache, "_cache", cache)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "items.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+        conn.execute("INSERT INTO items (name) VALUES ('a')")
+        conn.commit()
+        conn.close()
+        db_uri = f"sqlite:///{path}"
+        count = {"queries": ["SELECT COUNT(*) FROM items"]}
+
+        first = agent.executor_stage(None, count, db_uri)
+        again = agent.executor_stage(None, count, db_uri)
+        agent.executor_stage(None, {"queries": ["INSERT INTO items (name) VALUES ('b')"]}, db_uri)
+        after = agent.executor_stage(None, count, db_uri)
+        dispose_engines()
+
+    assert not first[0]["cached"] and again[0]["cached"]
+    assert not after[0]["cached"] and after[0]["result"]["rows"] == [[2]]
+    assert cache.stats()["invalidations"] == 1
@@ -0,0 +1,73 @@
+import os
+import tempfile
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+from app import sandbox
+from app.columnar import convert_to_parquet
+from app.main import app
+from app.sandbox import SandboxPool
+
+def test_sandbox_runs_isolates_and_recovers():
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "data.csv")
+        with open(csv_path, "w") as f:
+            f.write("name,marks\n" + "".join(f"s{i},{i % 100}\n" for i in range(1000)))
+        plots_dir = os.path.join(tmp, "plots")
+        pool = SandboxPool(size=2, timeout=3, memory_mb=600, plots_dir=plots_dir)
+        try:
+            result = pool.run(csv_path, "df['marks'] += 1\nprint(df['marks'].max())\nplt.figure()\nplt.hist(df['marks'])\nplt.savefig('hist.png')")
+            assert result["error"] is None and result["stdout"].strip() == "100"
+            assert len(result["plots"]) == 1 and result["plot_details"][0]["url"] == result["plots"][0]
+            details = result["plot_details"][0]
+            assert sorted(os.listdir(plots_dir)) == sorted(p.rsplit("/", 1)[1] for p in (details["url"], details["thumbnail"]))
+            # The resident frame is not changed by the previous task
+            assert pool.run(csv_path, "print(df['marks'].max())")["stdout"].strip() == "99"
+
+            # Two slow tasks overlap on the two workers
+            results = []
+            def slow():
+                results.append(pool.run(csv_path, "import time; time.sleep(1); print(len(df))"))
+            threads = [threading.Thread(target=slow) for _ in range(2)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            assert time.perf_counter() - start < 1.8
+            assert [r["stdout"].strip() for r in results] == ["1000", "1000"]
+
+            assert "timed out" in pool.run(csv_path, "while True: pass")["error"]
+            assert "exited" in pool.run(csv_path, "import os; os._exit(1)")["error"]
+            # 800MB against a 600MB cap: refused inside the worker, which keeps serving
+            assert "memory limit" in pool.run(csv_path, "import time\nx = np.ones(100 * 1024 * 1024)\ntime.sleep(10)")["error"]
+            assert pool.run(csv_path, "x = np.ones(20 * 1024 * 1024)\nprint(len(df))")["stdout"].strip() == "1000"
+            assert "NameError" in pool.run(csv_path, "undefined_name")["error"]
+
+            # Parquet sources load under the limit too
+            parquet_path = convert_to_parquet(csv_path)
+            assert pool.run(parquet_path, "print(df['marks'].sum())")["stdout"].strip() == str(sum(i % 100 for i in range(1000)))
+
+            stats = pool.stats()
+            assert stats["timeouts"] == 1 and stats["crashes"] == 1
+            assert stats["memory_errors"] == 1 and stats["memory_kills"] == 0
+        finally:
+            pool.shutdown()
+
+def test_cache_stats_report_frame_lookups(monkeypatch, tmp_path):
+    csv_path = str(tmp_path / "data.csv")
+    with open(csv_path, "w") as f:
+        f.write("name,marks\n" + "".join(f"s{i},{i}\n" for i in range(100)))
+    pool = SandboxPool(size=1, timeout=30, memory_mb=600, plots_dir=str(tmp_path / "plots"))
+    monkeypatch.setattr(sandbox, "_pool", pool)
+    try:
+        assert pool.run(csv_path, "print(len(df))")["stdout"].strip() == "100"
+        assert pool.run(csv_path, "print(len(df))")["stdout"].strip() == "100"
+        with TestClient(app) as client:
+            frames = client.get("/api/cache_stats").json()["dataframes"]
+        assert (frames["hits"], frames["misses"], frames["evictions"]) == (1, 1, 0)
+        assert frames["hit_rate"] == 0.5 and frames["resident_frames"] == 1
+    finally:
+        pool.shutdown()
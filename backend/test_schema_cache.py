@@ -0,0 +1,29 @@
+import time
+
+from app import schema_cache
+
+def test_cache_is_bounded_and_least_recently_used_goes_first(monkeypatch):
+    monkeypatch.setattr(schema_cache, "_cache", schema_cache.OrderedDict())
+    monkeypatch.setenv("SCHEMA_CACHE_MAX_ENTRIES", "3")
+    db_uri = "sqlite:///bounded.db"
+
+    for tables in ("a", "b", "c"):
+        schema_cache.set_cached(db_uri, f"table_info:{tables}", tables)
+    assert schema_cache.get_cached(db_uri, "table_info:a") == "a"
+    schema_cache.set_cached(db_uri, "table_info:d", "d")
+
+    assert len(schema_cache._cache) == 3
+    assert schema_cache.get_cached(db_uri, "table_info:b") is None
+    assert [schema_cache.get_cached(db_uri, f"table_info:{t}") for t in "acd"] == ["a", "c", "d"]
+
+def test_expired_entries_are_swept_on_write(monkeypatch):
+    monkeypatch.setattr(schema_cache, "_cache", schema_cache.OrderedDict())
+    monkeypatch.setenv("SCHEMA_CACHE_TTL", "0.05")
+
+    schema_cache.set_cached("sqlite:///one.db", "table_info:a,b", "old")
+    schema_cache.set_cached("sqlite:///two.db", "schema", "old")
+    time.sleep(0.1)
+    schema_cache.set_cached("sqlite:///three.db", "schema", "new")
+
+    # Never looked up again, but gone all the same
+    assert list(schema_cache._cache) == [("sqlite:///three.db", "schema")]
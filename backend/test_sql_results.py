@@ -0,0 +1,79 @@
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import create_engine, event, text
+
+from app.sql_results import run_query, fetch_page, dumps, ResultHandles
+
+def make_engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE scores (id INTEGER PRIMARY KEY, name TEXT, marks REAL)"))
+        conn.execute(text("INSERT INTO scores (name, marks) VALUES ('Jainam', 90.5), ('Jackie', 100), ('Saurabh', 95)"))
+    return engine
+
+def test_run_query_returns_typed_rows_and_caps():
+    engine = make_engine()
+    result = run_query(engine, "SELECT id, name, marks FROM scores ORDER BY id", max_rows=2)
+    assert result["columns"] == ["id", "name", "marks"]
+    assert result["rows"] == [[1, "Jainam", 90.5], [2, "Jackie", 100.0]]
+    assert result["row_count"] == 2 and result["truncated"] is True
+
+    full = run_query(engine, "SELECT name FROM scores", max_rows=3)
+    assert full["truncated"] is False and full["row_count"] == 3
+
+    write = run_query(engine, "UPDATE scores SET marks = marks + 1")
+    assert write == {"columns": [], "rows": [], "row_count": 0, "truncated": False}
+    assert run_query(engine, "SELECT marks FROM scores WHERE id = 2")["rows"] == [[101.0]]
+
+def test_only_queries_ask_for_server_side_cursors():
+    engine = make_engine()
+    streamed = []
+    @event.listens_for(engine, "before_execute")
+    def record(conn, clauseelement, multiparams, params, execution_options):
+        streamed.append((str(clauseelement).split()[0], conn.get_execution_options().get("stream_results", False)))
+
+    run_query(engine, "SELECT name FROM scores")
+    run_query(engine, "WITH top AS (SELECT name FROM scores) SELECT * FROM top")
+    run_query(engine, "CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)")
+    run_query(engine, "INSERT INTO notes (body) VALUES ('a') RETURNING id")
+    run_query(engine, "UPDATE notes SET body = 'b'")
+    run_query(engine, "DELETE FROM notes")
+    # psycopg2 would run these through DECLARE ... CURSOR FOR, which rejects them
+    assert streamed == [
+        ("SELECT", True), ("WITH", True), ("CREATE", False), ("INSERT", False), ("UPDATE", False), ("DELETE", False)
+    ]
+
+def test_dumps_encodes_database_types():
+    value = uuid.UUID("12345678-1234-5678-1234-567812345678")
+    row = [datetime.date(2024, 5, 1), datetime.datetime(2024, 5, 1, 9, 30), Decimal("12.50"), value, None]
+    assert json.loads(dumps({"rows": [row]})) == {
+        "rows": [["2024-05-01", "2024-05-01T09:30:00", "12.50", str(value), None]]
+    }
+
+def test_large_result_pages_through_handle():
+    engine = make_engine()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO scores (name, marks) VALUES " + ", ".join(f"('s{i}', {i})" for i in range(2500))))
+
+    query = "SELECT id, name FROM scores ORDER BY id;"
+    first = run_query(engine, query, max_rows=1000)
+    assert first["row_count"] == 1000 and first["truncated"] is True
+
+    handles = ResultHandles(ttl=60, max_handles=4)
+    result_id = handles.register("sqlite://", query)
+    assert handles.get(result_id) == ("sqlite://", query)
+
+    ids, offset = [row[0] for row in first["rows"]], 1000
+    while True:
+        page = fetch_page(engine, query, offset, 1000)
+        ids += [row[0] for row in page["rows"]]
+        offset += len(page["rows"])
+        if not page["has_more"]:
+            break
+    assert ids == list(range(1, 2504)) and page["columns"] == ["id", "name"]
+
+    expired = ResultHandles(ttl=0, max_handles=4)
+    assert expired.get(expired.register("sqlite://", query)) is None
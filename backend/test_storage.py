@@ -0,0 +1,74 @@
+import io
+import os
+import tempfile
+import time
+
+from app.storage import collect, referenced_names, store_stream
+
+def _touch(path, data, age, now):
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, (now - age, now - age))
+
+def test_uploads_are_deduplicated_and_collected():
+    with tempfile.TemporaryDirectory() as tmp:
+        uploads = os.path.join(tmp, "uploads")
+        plots = os.path.join(tmp, "plots")
+        os.makedirs(uploads)
+        os.makedirs(plots)
+
+        first, created = store_stream(io.BytesIO(b"a,b\n1,2\n"), uploads, ".CSV")
+        again, created_again = store_stream(io.BytesIO(b"a,b\n1,2\n"), uploads, ".csv")
+        other, _ = store_stream(io.BytesIO(b"a,b\n3,4\n"), uploads, ".csv")
+        assert created and not created_again and first == again != other
+        assert sorted(os.listdir(uploads)) == sorted([first, other])
+
+        now = time.time()
+        stem = first.split(".")[0]
+        _touch(os.path.join(uploads, f"{stem}.parquet"), b"p" * 10, 7200, now)
+        _touch(os.path.join(plots, "plot_kept.webp"), b"k" * 100, 7200, now)
+        _touch(os.path.join(plots, "plot_kept_thumb.webp"), b"k" * 10, 7200, now)
+        _touch(os.path.join(plots, "plot_old.webp"), b"o" * 100, 7200, now)
+        _touch(os.path.join(plots, "plot_old_thumb.webp"), b"o" * 10, 7200, now)
+        _touch(os.path.join(plots, "plot_fresh.webp"), b"f" * 100, 60, now)
+        os.utime(os.path.join(uploads, first), (now - 7000, now - 7000))
+        os.utime(os.path.join(uploads, other), (now - 7200, now - 7200))
+
+        referenced = referenced_names(
+            [first, None],
+            ['{"answer": "see below", "plots": ["/static/plots/plot_kept.webp"]}', None],
+        )
+        stats = collect([uploads, plots], referenced, quota_bytes=0, grace=3600, now=now)
+        # The unreferenced upload and plot (with its thumbnail) go; recent files stay
+        assert stats["unreferenced"] == 2 and stats["evicted"] == 0
+        assert sorted(os.listdir(uploads)) == sorted([first, f"{stem}.parquet"])
+        assert sorted(os.listdir(plots)) == ["plot_fresh.webp", "plot_kept.webp", "plot_kept_thumb.webp"]
+
+        # Over quota, least recently used first, whether referenced or not
+        stats = collect([uploads, plots], referenced, quota_bytes=100, grace=3600, now=now)
+        assert stats["evicted"] == 2 and stats["bytes"] == 100
+        assert os.listdir(uploads) == [] and os.listdir(plots) == ["plot_fresh.webp"]
+
+def test_partials_and_stored_again_uploads_are_protected():
+    with tempfile.TemporaryDirectory() as uploads:
+        now = time.time()
+        _touch(os.path.join(uploads, ".old.partial"), b"x" * 100, 7200, now)
+        _touch(os.path.join(uploads, ".fresh.partial"), b"y" * 100, 60, now)
+
+        # Stored long ago with a Parquet copy, then uploaded again just now
+        name, _ = store_stream(io.BytesIO(b"a,b\n1,2\n"), uploads, ".csv")
+        stem = name.split(".")[0]
+        _touch(os.path.join(uploads, f"{stem}.parquet"), b"p" * 10, 7200, now)
+        os.utime(os.path.join(uploads, name), (now - 7200, now - 7200))
+        assert store_stream(io.BytesIO(b"a,b\n1,2\n"), uploads, ".csv") == (name, False)
+        csv_mtime = os.path.getmtime(os.path.join(uploads, name))
+        assert csv_mtime > now - 60 and os.path.getmtime(os.path.join(uploads, f"{stem}.parquet")) >= csv_mtime
+
+        # Each partial is its own unit: the old one goes, the one in progress stays
+        stats = collect([uploads], set(), quota_bytes=0, grace=3600, now=now + 1)
+        assert stats["unreferenced"] == 1
+        assert sorted(os.listdir(uploads)) == sorted([".fresh.partial", name, f"{stem}.parquet"])
+
+        # Nor is a partial in progress evicted for quota
+        stats = collect([uploads], None, quota_bytes=1, grace=3600, now=now + 1)
+        assert stats["evicted"] == 1 and os.listdir(uploads) == [".fresh.partial"]
@@ -0,0 +1,23 @@
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "matplotlib", "seaborn", "PIL", "langchain_google_genai", "langchain_community")
+
+def test_heavy_subsystems_load_on_first_use():
+    # A fresh interpreter: this test process may have imported them already
+    loaded = subprocess.run(
+        [sys.executable, "-c", f"import sys, app.main; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"],
+        capture_output=True, text=True, check=True
+    ).stdout.strip()
+    assert loaded == "[]"
+
+def test_ready_without_warmup(monkeypatch):
+    monkeypatch.delenv("WARMUP", raising=False)
+    with TestClient(app) as client:
+        status = client.get("/ready")
+    assert status.status_code == 200
+    assert status.json()["ready"] is True and status.json()["warmup"] is False
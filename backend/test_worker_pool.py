@@ -0,0 +1,102 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import worker_pool
+from app.main import app
+from app.worker_pool import AgentPool, PipelineTimeout, PoolSaturated
+
+def slow(seconds, result):
+    time.sleep(seconds)
+    return result
+
+async def outcomes(pool, *calls):
+    async def attempt(call):
+        try:
+            return await pool.run(*call)
+        except (PipelineTimeout, PoolSaturated) as e:
+            return type(e).__name__
+    async def staggered(i, call):
+        # Admit in order: first runs, second queues, third is turned away
+        await asyncio.sleep(0.02 * i)
+        return await attempt(call)
+    return await asyncio.gather(*(staggered(i, call) for i, call in enumerate(calls)))
+
+def wait_idle(pool):
+    waited = time.monotonic()
+    while pool.stats()["running"] and time.monotonic() - waited < 5:
+        time.sleep(0.01)
+
+def test_admission_queue_and_deadline():
+    pool = AgentPool(max_workers=1, max_queue=1, timeout=0.5)
+    ran = []
+    def work(name):
+        ran.append(name)
+        return slow(0.3, name)
+
+    results = asyncio.run(outcomes(pool, (work, "first"), (work, "second"), (work, "third")))
+    wait_idle(pool)
+
+    # The second waits 0.3s for the worker, then runs past its 0.5s deadline
+    assert results == ["first", "PipelineTimeout", "PoolSaturated"]
+    assert ran == ["first", "second"]
+    stats = pool.stats()
+    assert (stats["completed"], stats["timed_out"], stats["rejected"], stats["failed"]) == (1, 1, 1, 0)
+    assert stats["running"] == 0 and stats["queue_depth"] == 0
+    pool.shutdown()
+
+def test_expired_queue_entry_never_runs():
+    pool = AgentPool(max_workers=1, max_queue=1, timeout=0.2)
+    ran = []
+    def work(name):
+        ran.append(name)
+        return slow(0.4, name)
+
+    results = asyncio.run(outcomes(pool, (work, "first"), (work, "second")))
+    wait_idle(pool)
+
+    assert results == ["PipelineTimeout", "PipelineTimeout"]
+    assert ran == ["first"]
+    stats = pool.stats()
+    assert (stats["completed"], stats["timed_out"], stats["failed"]) == (0, 2, 0)
+    pool.shutdown()
+
+def test_failures_are_counted_apart_from_completions():
+    pool = AgentPool(max_workers=2, max_queue=0, timeout=5)
+    def broken():
+        raise ValueError("bad plan")
+
+    async def scenario():
+        assert await pool.run(slow, 0, "ok") == "ok"
+        with pytest.raises(ValueError, match="bad plan"):
+            await pool.run(broken)
+    asyncio.run(scenario())
+
+    stats = pool.stats()
+    assert (stats["completed"], stats["failed"], stats["timed_out"]) == (1, 1, 0)
+    assert stats["avg_wait_ms"] >= 0
+    pool.shutdown()
+
+def test_chat_endpoint_maps_saturation_and_deadline(monkeypatch, school_db, memory_llm_cache, llm_gate):
+    pool = AgentPool(max_workers=1, max_queue=0, timeout=0.5)
+    monkeypatch.setattr(worker_pool, "_pool", pool)
+    request = {"message": "Top 2 students", "db_uri": f"sqlite:///{school_db}", "google_api_key": "unused"}
+
+    with TestClient(app) as client:
+        with ThreadPoolExecutor(max_workers=1) as background:
+            first = background.submit(client.post, "/api/chat", json=request)
+            waited = time.monotonic()
+            while pool.stats()["running"] == 0 and time.monotonic() - waited < 5:
+                time.sleep(0.01)
+            busy = client.post("/api/chat", json=request)
+            first = first.result()
+        llm_gate.set()
+        wait_idle(pool)
+
+    assert busy.status_code == 503 and busy.headers["retry-after"] == "1"
+    assert first.status_code == 504 and first.json()["detail"] == "Request exceeded the 0.5s deadline."
+    stats = pool.stats()
+    assert (stats["rejected"], stats["timed_out"], stats["completed"]) == (1, 1, 0)
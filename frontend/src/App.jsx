@@ -171,7 +171,9 @@ function App() {
         role: 'assistant',
         content: response.data.answer,
         sqlQuery: response.data.sqlQuery,
-        results: response.data.results
+        results: response.data.results,
+        columns: response.data.columns,
+        truncated: response.data.truncated
       };
 
       setMessages(prev => [...prev, aiMsg]);
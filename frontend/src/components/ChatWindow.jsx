@@ -25,7 +25,7 @@ const ChatWindow = ({ messages, isLoading, isDark }) => {
                     </div>
                 ) : (
                     messages.map((msg, idx) => (
-                        <MessageItem key={idx} role={msg.role} content={msg.content} sqlQuery={msg.sqlQuery} results={msg.results} isDark={isDark} />
+                        <MessageItem key={idx} role={msg.role} content={msg.content} sqlQuery={msg.sqlQuery} results={msg.results} columns={msg.columns} truncated={msg.truncated} isDark={isDark} />
                     ))
                 )}
                 {isLoading && (
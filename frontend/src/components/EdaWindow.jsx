@@ -167,6 +167,7 @@ const EdaWindow = ({ isDark, session, initialMessages = [], onSessionCreate }) =
                 code: data.code,
                 stdout: data.stdout,
                 plots: data.plots,
+                plot_details: data.plot_details,
                 error: data.error
             };
 
@@ -300,8 +301,9 @@ const EdaWindow = ({ isDark, session, initialMessages = [], onSessionCreate }) =
                                                         onClick={() => setSelectedImage(`http://localhost:8000${plot}`)}
                                                     >
                                                         <img
-                                                            src={`http://localhost:8000${plot}`}
+                                                            src={`http://localhost:8000${msg.plot_details?.[i]?.thumbnail || plot}`}
                                                             alt="Plot Thumbnail"
+                                                            loading="lazy"
                                                             className="w-full h-full object-cover transition-transform group-hover:scale-110"
                                                         />
                                                     </div>
@@ -311,9 +313,14 @@ const EdaWindow = ({ isDark, session, initialMessages = [], onSessionCreate }) =
                                                         <span className={`text-sm font-medium ${isDark ? 'text-gray-200' : 'text-gray-700'}`}>
                                                             Generated Plot #{i + 1}
                                                         </span>
+                                                        {msg.plot_details?.[i] && (
+                                                            <span className={`text-xs ${isDark ? 'text-gray-400' : 'text-gray-500'}`}>
+                                                                {msg.plot_details[i].width} × {msg.plot_details[i].height} · {Math.ceil(msg.plot_details[i].bytes / 1024)} KB
+                                                            </span>
+                                                        )}
                                                         <a
                                                             href={`http://localhost:8000${plot}`}
-                                                            download={`plot-${i}.png`}
+                                                            download={`plot-${i}.${plot.split('.').pop()}`}
                                                             className={`text-xs flex items-center gap-1 mt-1 hover:underline ${isDark ? 'text-blue-400' : 'text-blue-600'}`}
                                                         >
                                                             <ImageIcon className="w-3 h-3" /> Download Image
@@ -7,7 +7,7 @@ import { Bot, User, Copy, Check, Terminal } from 'lucide-react';
 import clsx from 'clsx';
 import { motion } from 'framer-motion';
 
-const MessageItem = ({ role, content, sqlQuery, results, isDark }) => {
+const MessageItem = ({ role, content, sqlQuery, results, columns, truncated, isDark }) => {
     const isUser = role === 'user';
     const [copied, setCopied] = React.useState(false);
 
@@ -85,7 +85,7 @@ const MessageItem = ({ role, content, sqlQuery, results, isDark }) => {
                                 <table className="w-full text-sm text-left">
                                     <thead className={`text-xs uppercase font-semibold backdrop-blur-sm ${isDark ? 'bg-gray-900/60 text-gray-400' : 'bg-gray-200/60 text-gray-700'}`}>
                                         <tr>
-                                            {Object.keys(results[0]).map((key) => (
+                                            {(columns || Object.keys(results[0])).map((key) => (
                                                 <th key={key} className="px-4 py-2 whitespace-nowrap">{key}</th>
                                             ))}
                                         </tr>
@@ -103,6 +103,11 @@ const MessageItem = ({ role, content, sqlQuery, results, isDark }) => {
                                     </tbody>
                                 </table>
                             </div>
+                            {truncated && (
+                                <div className={`px-4 py-2 text-xs ${isDark ? 'text-gray-500' : 'text-gray-600'}`}>
+                                    Showing the first {results.length} rows
+                                </div>
+                            )}
                         </div>
                     )}
 